@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the request hot paths: utils.encode_protocol/decode_protocol, the JSON response path
+(server_handler.Message._package_response) and every DatabaseHandler method against seeded databases.
+
+Each benchmark times single calls with perf_counter; per-call setup (e.g. inserting the account delete_account removes)
+runs outside the timing. Results are in microseconds per call. bench_micro.json holds the committed baseline: compare
+a change against it, and refresh it with --save when a change is meant to move the numbers. Timings depend on the
+machine, so compare runs made on the same one.
+
+Usage (from src/):
+    python bench_micro.py                                   # run everything, compare with bench_micro.json
+    python bench_micro.py --filter encode_protocol          # only matching benchmarks
+    python bench_micro.py --sizes 1000 100000               # skip the 1M-message database
+    python bench_micro.py --save bench_micro.json           # write a new baseline
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import yaml
+import server_handler
+from database import DatabaseHandler
+from utils import OpCode, ResponseCode, encode_protocol, decode_protocol, database_setup
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+BASELINE = "bench_micro.json"
+DB_SIZES = [1_000, 100_000, 1_000_000] # Messages in each seeded database
+ACCOUNTS = 1_000 # Accounts in each seeded database; messages are spread evenly over them
+MAX_VIEW = config.get("max_view", 5)
+DB_METHODS = ["account_exists", "create_account", "delete_account", "login_account", "fetch_homepage", "list_accounts",
+              "insert_message", "delete_messages", "fetch_messages_delivered", "fetch_messages_undelivered", "count_messages"]
+
+class Benchmark:
+    """ One microbenchmark: call(*args) is timed, prepare(i) returns the arguments for call i untimed.
+
+    Methods:
+    - run(self, min_time, min_samples, max_samples): Time calls and return a summary in microseconds.
+    """
+    def __init__(self, name, call, prepare=lambda i: ()):
+        self.name = name
+        self.call = call
+        self.prepare = prepare
+
+    def run(self, min_time=0.5, min_samples=5, max_samples=100_000):
+        """Time calls until min_time seconds of calls and min_samples calls (or max_samples calls)."""
+        for i in range(min(3, min_samples)):
+            self.call(*self.prepare(-1 - i)) # Warm up
+        samples, total = [], 0.0
+        while len(samples) < max_samples and (total < min_time or len(samples) < min_samples):
+            args = self.prepare(len(samples))
+            start = time.perf_counter()
+            self.call(*args)
+            elapsed = time.perf_counter() - start
+            samples.append(elapsed)
+            total += elapsed
+        us = sorted(1e6 * s for s in samples)
+        return {"n": len(us), "min": us[0], "median": statistics.median(us), "mean": statistics.fmean(us),
+                "p95": us[min(len(us) - 1, int(0.95 * len(us)))]}
+
+def message_rows(n, content="Are we still on for lunch tomorrow? Let me know what time works."):
+    """n message rows as the database returns them: (id, sender, receiver, content, timestamp, delivered)."""
+    return [(i + 1, f"user{i % 7}", "alice", content, 1700000000 + i, 1) for i in range(n)]
+
+def protocol_benchmarks():
+    """encode_protocol/decode_protocol and the JSON response path on realistic payloads."""
+    payloads = {
+        "send_request": ["alice", "bob", "Are we still on for lunch tomorrow? Let me know what time works."],
+        "homepage": [3] + message_rows(MAX_VIEW),
+        "list_accounts": [(i, f"user{i}", f"Bio of user {i}") for i in range(100)],
+        "history_50": message_rows(50),
+    }
+    benchmarks = []
+    for name, payload in payloads.items():
+        encoded = encode_protocol(payload)
+        benchmarks.append(Benchmark(f"encode_protocol[{name}]", lambda p=payload: encode_protocol(p)))
+        benchmarks.append(Benchmark(f"decode_protocol[{name}]", lambda e=encoded: decode_protocol(e)))
+
+    # A server-side connection with a request header in place, as after process_header
+    message = server_handler.Message(None, None, ("127.0.0.1", 0), None)
+    message._header = {"content_encoding": "utf-8", "content_length": 0, "opcode": OpCode.HOMEPAGE.value}
+    for name in ("homepage", "history_50"):
+        response = {"status_code": ResponseCode.SUCCESS.value, "data": payloads[name]}
+        benchmarks.append(Benchmark(f"Message._package_response[{name}]", lambda r=response: message._package_response(r)))
+    return benchmarks
+
+def seed_database(path, n_messages, n_accounts=ACCOUNTS):
+    """Create a database with n_accounts accounts (user0...) and n_messages messages spread evenly over their
+    receivers, half of them delivered. Reuses the file if it was already seeded."""
+    if os.path.exists(path):
+        return path
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    database_setup(partial)
+    conn = sqlite3.connect(partial)
+    conn.executemany("INSERT INTO accounts (username, password, bio) VALUES (?, ?, ?)",
+                     ((f"user{i}", "password", f"Bio of user {i}") for i in range(n_accounts)))
+    conn.executemany("INSERT INTO messages (sender, receiver, content, timestamp, delivered) VALUES (?, ?, ?, ?, ?)",
+                     ((f"user{(i + 1) % n_accounts}", f"user{i % n_accounts}", f"Message number {i}", 1700000000 + i, i % 2)
+                      for i in range(n_messages)))
+    conn.commit()
+    conn.close()
+    os.rename(partial, path)
+    return path
+
+def database_benchmarks(path, size):
+    """Every DatabaseHandler method against a seeded database. Benchmarks that write set their own rows up in prepare,
+    so repeated calls see the same state."""
+    db = DatabaseHandler(path)
+    run_id = f"{os.getpid()}_{time.monotonic_ns()}"
+    conn = sqlite3.connect(path)
+
+    def insert_account(username):
+        conn.execute("INSERT INTO accounts (username, password, bio) VALUES (?, ?, ?)", (username, "password", ""))
+        conn.commit()
+        return username
+
+    def insert_undelivered(receiver, n):
+        conn.executemany("INSERT INTO messages (sender, receiver, content, timestamp, delivered) VALUES (?, ?, ?, ?, 0)",
+                         [("user1", receiver, "Unread message", 1800000000)] * n)
+        conn.commit()
+
+    def undelivered_ids(receiver, n):
+        insert_undelivered(receiver, n)
+        rows = conn.execute("SELECT id FROM messages WHERE receiver=? ORDER BY id DESC LIMIT ?", (receiver, n)).fetchall()
+        return [r[0] for r in rows]
+
+    def unread_page(receiver, n):
+        insert_undelivered(receiver, n)
+        return receiver, n
+
+    # method -> arguments for call i
+    cases = {
+        "account_exists": lambda i: ("user500",),
+        "create_account": lambda i: (f"new_{run_id}_{i}", "password", "A new bio"),
+        "delete_account": lambda i: (insert_account(f"del_{run_id}_{i}"), "password"),
+        "login_account": lambda i: ("user1", "password"),
+        "fetch_homepage": lambda i: ("user1",),
+        "list_accounts": lambda i: ("user99",),
+        "insert_message": lambda i: ("user1", "user2", "Benchmark message", 1800000000 + i, False),
+        "delete_messages": lambda i: ("user3", undelivered_ids("user3", MAX_VIEW)),
+        "fetch_messages_delivered": lambda i: ("user4", MAX_VIEW),
+        "fetch_messages_undelivered": lambda i: unread_page("user5", MAX_VIEW),
+        "count_messages": lambda i: ("user6", False),
+    }
+    return [Benchmark(f"DatabaseHandler.{name}[{size}]", getattr(db, name), cases[name]) for name in DB_METHODS], conn
+
+def compare(results, baseline, threshold):
+    """Print each benchmark's median against the baseline. Returns the names slower than threshold x baseline."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<55}{r['median']:>12.2f} us   (new)")
+            continue
+        ratio = r["median"] / base["median"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"{name:<55}{r['median']:>12.2f} us  {base['median']:>12.2f} us  x{ratio:.2f}{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks for protocol encoding and DatabaseHandler.")
+    parser.add_argument("--filter", help="Only run benchmarks whose name matches this regular expression")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DB_SIZES, help="Messages in each seeded database")
+    parser.add_argument("--db-dir", default=os.path.join(tempfile.gettempdir(), "bench_micro"), help="Where seeded databases are kept between runs")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds of timed calls per benchmark")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Median slowdown over the baseline reported as a regression")
+    parser.add_argument("--save", help="Write the results to this file (e.g. bench_micro.json to update the baseline)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    pattern = re.compile(args.filter) if args.filter else None
+    wanted = lambda name: pattern is None or pattern.search(name)
+
+    results = {}
+    for bench in protocol_benchmarks():
+        if wanted(bench.name):
+            results[bench.name] = bench.run(args.min_time)
+    os.makedirs(args.db_dir, exist_ok=True)
+    for size in args.sizes:
+        if not any(wanted(f"DatabaseHandler.{name}[{size}]") for name in DB_METHODS):
+            continue
+        # Benchmarks that write run on a copy, so every run starts from the same seeded state
+        seeded = seed_database(os.path.join(args.db_dir, f"messages_{size}.db"), size)
+        path = os.path.join(args.db_dir, f"messages_{size}.run.db")
+        shutil.copyfile(seeded, path)
+        benchmarks, conn = database_benchmarks(path, size)
+        for bench in benchmarks:
+            if wanted(bench.name):
+                results[bench.name] = bench.run(args.min_time)
+        conn.close()
+        os.remove(path)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print(f"{'benchmark':<55}{'median':>15}{'baseline':>15}")
+    regressions = compare(results, baseline, args.threshold)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                                   "processor": platform.processor() or platform.machine(), "sqlite": sqlite3.sqlite_version},
+                       "results": results}, f, indent=2)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than x{args.threshold} the baseline")
+        sys.exit(1)
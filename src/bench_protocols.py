@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Benchmark the three wire protocols: JSON (server.py --protocol 0), custom binary (server.py --protocol 1) and gRPC
+(server_grpc.py).
+
+For every operation in the workload it reports:
+- bytes_up / bytes_down: exact bytes on the wire per request and response, counted by a TCP proxy between one client
+  and the server (protocol framing included; for gRPC this includes HTTP/2 frames, but not the connection preface,
+  settings and other per-connection traffic, which is counted once in "connection")
+- latency mean/p50/p95/p99 (ms) and requests/sec, from --clients concurrent clients connected straight to the server
+
+Every run uses fresh account names, so it can be pointed at an existing database.
+
+Usage (from src/):
+    python bench_protocols.py                                   # all protocols, default workload
+    python bench_protocols.py --protocols json grpc --requests 500 --json results.json
+    python bench_protocols.py --ops create_account send_message homepage --message-size 1000
+    python bench_protocols.py --no-spawn --protocols custom --custom-port 65432
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+import grpc
+import yaml
+import client_handler
+import compression
+import handler_pb2
+import handler_pb2_grpc
+import tls
+from bench_tls import summarize, wait_for_port
+from utils import OpCode
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+PASSWORD = "benchmark-password"
+BIO = "Created by bench_protocols.py"
+PROTOCOLS = {"json": 0, "custom": 1, "grpc": None}
+
+class Workload:
+    """ Arguments for one request of each operation. Each client works on its own accounts, named after the run prefix.
+
+    Operations map to (opcode, args(i)) where i is the request number; send_message sends to a sink account that never
+    logs in, so no pushes interleave with responses, and the read operations page through the sink's messages.
+    """
+    def __init__(self, prefix, client, message_size, page_size):
+        self.prefix = prefix
+        self.user = lambda i: f"{prefix}_{client}_{i}"
+        self.sink = f"{prefix}_sink"
+        self.content = ("benchmark message " * (message_size // 18 + 1))[:message_size]
+        self.operations = {
+            "create_account": (OpCode.CREATE_ACCOUNT, lambda i: [self.user(i), PASSWORD, BIO]),
+            "account_exists": (OpCode.ACCOUNT_EXISTS, lambda i: [self.user(i)]),
+            "login": (OpCode.LOGIN_ACCOUNT, lambda i: [self.user(i), PASSWORD]),
+            "send_message": (OpCode.SEND_MSG, lambda i: [self.user(i), self.sink, self.content]),
+            "homepage": (OpCode.HOMEPAGE, lambda i: [self.user(i)]),
+            "read_unread": (OpCode.READ_MSG_UNDELIVERED, lambda i: [self.sink, page_size]),
+            "read_delivered": (OpCode.READ_MSG_DELIVERED, lambda i: [self.sink, page_size]),
+            "list_accounts": (OpCode.LIST_ACCOUNTS, lambda i: [f"{prefix}_{client}_"]),
+        }
+
+OPERATIONS = list(Workload("", 0, 0, 0).operations)
+
+# gRPC method and request for each opcode, from the router's argument list
+GRPC_CALLS = {
+    OpCode.CREATE_ACCOUNT: ("CreateAccount", lambda a: handler_pb2.CreateAccountRequest(username=a[0], password=a[1], bio=a[2])),
+    OpCode.ACCOUNT_EXISTS: ("CheckAccountExists", lambda a: handler_pb2.AccountExistsRequest(username=a[0])),
+    OpCode.LOGIN_ACCOUNT: ("LoginAccount", lambda a: handler_pb2.LoginAccountRequest(username=a[0], password=a[1])),
+    OpCode.SEND_MSG: ("SendMessage", lambda a: handler_pb2.SendMessageRequest(sender=a[0], receiver=a[1], content=a[2])),
+    OpCode.HOMEPAGE: ("FetchHomepage", lambda a: handler_pb2.FetchHomepageRequest(username=a[0])),
+    OpCode.READ_MSG_UNDELIVERED: ("FetchMessageUnread", lambda a: handler_pb2.FetchMessagesUnreadRequest(username=a[0], num=a[1])),
+    OpCode.READ_MSG_DELIVERED: ("FetchMessageRead", lambda a: handler_pb2.FetchMessagesReadRequest(username=a[0], num=a[1])),
+    OpCode.LIST_ACCOUNTS: ("ListAccount", lambda a: handler_pb2.ListAccountRequest(pattern=a[0])),
+}
+
+class SocketClient:
+    """ Blocking client for server.py, framing requests with the client_handler stubs.
+
+    Methods:
+    - call(self, opcode, args): Send one request and return the response's status code.
+    - close(self): Close the connection.
+    """
+    def __init__(self, host, port, protocol):
+        stub_class = client_handler.Message if protocol == 0 else client_handler.MessageCustom
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.incoming = queue.Queue()
+        self.stub = stub_class(None, self.sock, (host, port), None, self.incoming)
+
+    def call(self, opcode, args):
+        self.sock.sendall(self.stub._package_request({"content_encoding": "utf-8", "content": {"args": args}, "opcode": opcode.value}))
+        while True:
+            while self.incoming.empty():
+                data = self.sock.recv(65536)
+                if not data:
+                    raise ConnectionError("Server closed the connection")
+                self.stub._recv_buffer += data
+                self.stub._drain_frames()
+            response = self.incoming.get()
+            # Skip server pings and pushes
+            if response["opcode"] == opcode.value:
+                return response["status_code"]
+
+    def close(self):
+        self.sock.close()
+
+class GrpcClient:
+    """ Blocking client for server_grpc.py's Handler service.
+
+    Methods:
+    - call(self, opcode, args): Send one request and return the response's status code.
+    - close(self): Close the channel.
+    """
+    def __init__(self, host, port):
+        self.channel = tls.grpc_channel(f"{host}:{port}")
+        grpc.channel_ready_future(self.channel).result(timeout=10)
+        self.stub = handler_pb2_grpc.HandlerStub(self.channel)
+
+    def call(self, opcode, args):
+        method, request = GRPC_CALLS[opcode]
+        return getattr(self.stub, method)(request(args)).status_code
+
+    def close(self):
+        self.channel.close()
+
+def connect(protocol, host, port):
+    """Open a client for protocol ("json", "custom" or "grpc")."""
+    if PROTOCOLS[protocol] is None:
+        return GrpcClient(host, port)
+    return SocketClient(host, port, PROTOCOLS[protocol])
+
+class ByteCountingProxy:
+    """ TCP proxy on an ephemeral local port that forwards to one upstream address and counts the bytes each way.
+
+    Methods:
+    - start(self): Start forwarding in a daemon thread.
+    - counts(self): Return (bytes up, bytes down) so far, once the proxy is idle.
+    - stop(self): Stop forwarding and close every socket.
+    """
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.sel = selectors.DefaultSelector()
+        self.up = 0
+        self.down = 0
+        self._last_io = time.monotonic()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def counts(self, quiet=0.05, timeout=5):
+        """Wait until nothing has been forwarded for `quiet` seconds (so trailing frames, e.g. gRPC window updates,
+        are counted), then return (bytes up, bytes down)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() - self._last_io < quiet and time.monotonic() < deadline:
+            time.sleep(quiet / 5)
+        return self.up, self.down
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        for key in list(self.sel.get_map().values()):
+            key.fileobj.close()
+        self.sel.close()
+
+    def _run(self):
+        self.listener.setblocking(False)
+        self.sel.register(self.listener, selectors.EVENT_READ)
+        while not self._stopped.is_set():
+            for key, _ in self.sel.select(timeout=0.05):
+                if key.fileobj is self.listener:
+                    client, _ = self.listener.accept()
+                    server = socket.create_connection(self.upstream)
+                    for s in (client, server):
+                        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self.sel.register(client, selectors.EVENT_READ, data=(server, True))
+                    self.sel.register(server, selectors.EVENT_READ, data=(client, False))
+                    continue
+                peer, upstream = key.data
+                data = key.fileobj.recv(65536)
+                if not data:
+                    for s in (key.fileobj, peer):
+                        self.sel.unregister(s)
+                        s.close()
+                    continue
+                peer.sendall(data)
+                self._last_io = time.monotonic()
+                if upstream:
+                    self.up += len(data)
+                else:
+                    self.down += len(data)
+
+def measure_wire_sizes(protocol, host, port, workload, ops, samples):
+    """Run each operation `samples` times, one at a time through a ByteCountingProxy.
+    Returns {op: (bytes up, bytes down) per request}, plus the connection's own traffic under "connection"."""
+    proxy = ByteCountingProxy((host, port)).start()
+    try:
+        client = connect(protocol, "127.0.0.1", proxy.port)
+        sizes = {"connection": proxy.counts()}
+        for op in ops:
+            opcode, args = workload.operations[op]
+            before = proxy.counts()
+            for i in range(samples):
+                try:
+                    client.call(opcode, args(i))
+                except grpc.RpcError as e:
+                    # Failed calls still count: the latency pass reports the errors
+                    logging.debug(f"{op} failed: {e}")
+            after = proxy.counts()
+            sizes[op] = tuple((a - b) / samples for a, b in zip(after, before))
+        client.close()
+    finally:
+        proxy.stop()
+    return sizes
+
+def measure_latency(protocol, host, port, workloads, ops, requests):
+    """Run each operation `requests` times on every client concurrently, one operation after another.
+    Returns {op: {"samples": [...], "statuses": {status code or "error": count}, "seconds": wall time}}.
+    Only failed calls ("error") are left out of the samples; e.g. account_exists answers with ACCOUNT_EXISTS."""
+    clients = [connect(protocol, host, port) for _ in workloads]
+    results = {}
+    try:
+        for op in ops:
+            samples = [[] for _ in clients]
+            statuses = [Counter() for _ in clients]
+            barrier = threading.Barrier(len(clients) + 1)
+
+            def worker(n):
+                opcode, args = workloads[n].operations[op]
+                barrier.wait()
+                for i in range(requests):
+                    start = time.perf_counter()
+                    try:
+                        status = clients[n].call(opcode, args(i))
+                    except (grpc.RpcError, OSError) as e:
+                        logging.debug(f"{op} failed: {e}")
+                        statuses[n]["error"] += 1
+                        continue
+                    samples[n].append(time.perf_counter() - start)
+                    statuses[n][str(status)] += 1
+
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(len(clients))]
+            for t in threads:
+                t.start()
+            barrier.wait()
+            start = time.perf_counter()
+            for t in threads:
+                t.join()
+            results[op] = {"samples": [s for per_client in samples for s in per_client],
+                           "statuses": dict(sum(statuses, Counter())), "seconds": time.perf_counter() - start}
+    finally:
+        for client in clients:
+            client.close()
+    return results
+
+def run(protocol, host, port, ops, clients, requests, message_size, page_size):
+    """Benchmark one protocol. Returns {op: {requests, statuses, bytes_up, bytes_down, mean, p50, p95, p99, rps}}."""
+    prefix = f"bench{uuid.uuid4().hex[:8]}"
+    # The size pass and each latency client get their own accounts
+    sizing = Workload(prefix, "size", message_size, page_size)
+    workloads = [Workload(prefix, n, message_size, page_size) for n in range(clients)]
+    setup = connect(protocol, host, port)
+    setup.call(OpCode.CREATE_ACCOUNT, [sizing.sink, PASSWORD, BIO])
+    setup.close()
+
+    sizes = measure_wire_sizes(protocol, host, port, sizing, ops, min(requests, 20))
+    timings = measure_latency(protocol, host, port, workloads, ops, requests)
+    results = {"connection": {"bytes_up": sizes["connection"][0], "bytes_down": sizes["connection"][1]}}
+    for op in ops:
+        t = timings[op]
+        latency = summarize(t["samples"]) if t["samples"] else {}
+        latency.pop("n", None)
+        results[op] = {"requests": clients * requests, "statuses": t["statuses"],
+                       "bytes_up": sizes[op][0], "bytes_down": sizes[op][1],
+                       **latency, "rps": len(t["samples"]) / t["seconds"]}
+    return results
+
+def spawn(protocol, host, port):
+    """Start a server for protocol on host:port; gRPC uses config server 0's address."""
+    if PROTOCOLS[protocol] is None:
+        server_config = config["servers"][0]
+        for path in (server_config["log_path"], server_config["db_path"]):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        cmd = [sys.executable, "server_grpc.py", "0"]
+    else:
+        cmd = [sys.executable, "server.py", "--host", host, "--port", str(port), "--protocol", str(PROTOCOLS[protocol])]
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark wire size, latency and throughput of the JSON, custom and gRPC protocols.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--protocols", nargs="+", choices=list(PROTOCOLS), default=list(PROTOCOLS))
+    parser.add_argument("--json-port", type=int, default=61980, help="server.py --protocol 0 port")
+    parser.add_argument("--custom-port", type=int, default=61981, help="server.py --protocol 1 port")
+    parser.add_argument("--grpc-port", type=int, default=config["servers"][0]["port"], help="server_grpc.py port (spawned as server 0)")
+    parser.add_argument("--ops", nargs="+", choices=OPERATIONS, default=OPERATIONS, help="Operations to run, in order")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent clients in the latency pass")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per operation per client")
+    parser.add_argument("--message-size", type=int, default=100, help="Message content length in characters")
+    parser.add_argument("--page-size", type=int, default=config.get("max_view", 5), help="Messages per read request")
+    parser.add_argument("--no-compression", action="store_true", help="Don't announce compression codecs to the socket servers")
+    parser.add_argument("--no-spawn", action="store_true", help="Benchmark running servers instead of starting them")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.no_compression:
+        compression.ACCEPT_FLAGS = 0
+
+    ports = {"json": args.json_port, "custom": args.custom_port, "grpc": args.grpc_port}
+    results = {}
+    for protocol in args.protocols:
+        server = None if args.no_spawn else spawn(protocol, args.host, ports[protocol])
+        try:
+            wait_for_port(args.host, ports[protocol])
+            results[protocol] = run(protocol, args.host, ports[protocol], args.ops, args.clients, args.requests,
+                                    args.message_size, args.page_size)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    for protocol, ops in results.items():
+        print(f"{protocol} (connection setup: {ops['connection']['bytes_up']:.0f} B up, {ops['connection']['bytes_down']:.0f} B down)")
+        print(f"  {'operation':<16}{'up B':>8}{'down B':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}  statuses")
+        for op in args.ops:
+            r = ops[op]
+            print(f"  {op:<16}{r['bytes_up']:>8.0f}{r['bytes_down']:>8.0f}{r.get('p50', 0):>9.3f}{r.get('p95', 0):>9.3f}"
+                  f"{r.get('p99', 0):>9.3f}{r['rps']:>10.0f}  {r['statuses']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "json"}, "results": results}, f, indent=2)
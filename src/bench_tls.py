@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark TLS connection setup against server.py: full handshakes vs. resumed sessions.
+
+Each sample opens a connection, completes the handshake, sends a STARTING request and reads the response, which is
+the work a reconnecting client does before its first real request. "full" connects without a session, "resumed"
+presents the session saved from the previous connection.
+
+Usage (from src/, with a self-signed certificate at the config's tls_cert/tls_key):
+    python bench_tls.py --generate              # write the certificate and key
+    python bench_tls.py --connections 500       # start server.py --tls on --port and benchmark it
+    python bench_tls.py --no-spawn --port 65432 # benchmark a server that is already running with --tls
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import client_handler
+import tls
+from utils import OpCode
+
+def starting_request(protocol):
+    """Packaged STARTING request for the protocol."""
+    stub_class = client_handler.Message if protocol == 0 else client_handler.MessageCustom
+    stub = stub_class(None, None, None, None, queue.Queue())
+    return stub._package_request({"content_encoding": "utf-8", "content": {"args": []}, "opcode": OpCode.STARTING.value})
+
+def connect_once(host, port, request, protocol, sessions=None):
+    """Time one connection: handshake, request, response. Returns (seconds, resumed)."""
+    stub_class = client_handler.Message if protocol == 0 else client_handler.MessageCustom
+    incoming = queue.Queue()
+    start = time.perf_counter()
+    if sessions is None:
+        sock = tls.client_context().wrap_socket(socket.create_connection((host, port)), server_hostname=host)
+    else:
+        sock = sessions.connect(host, port)
+    with sock:
+        sock.sendall(request)
+        stub = stub_class(None, sock, (host, port), None, incoming)
+        while incoming.empty():
+            data = sock.recv(4096)
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            stub._recv_buffer += data
+            stub._drain_frames()
+        elapsed = time.perf_counter() - start
+        # TLS 1.3 tickets arrive after the handshake, so save the session once the response is in
+        if sessions is not None:
+            sessions.save(host, port, sock)
+        return elapsed, sock.session_reused
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    ms = sorted(1000 * s for s in samples)
+    cuts = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+    return {"n": len(ms), "mean": statistics.fmean(ms), "p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+def run(host, port, protocol, connections, warmup=10):
+    """Run both modes and return {mode: summary}."""
+    request = starting_request(protocol)
+    results = {}
+    for mode in ("full", "resumed"):
+        sessions = tls.SessionCache() if mode == "resumed" else None
+        for _ in range(warmup):
+            connect_once(host, port, request, protocol, sessions)
+        samples, resumed = [], 0
+        for _ in range(connections):
+            elapsed, reused = connect_once(host, port, request, protocol, sessions)
+            samples.append(elapsed)
+            resumed += reused
+        results[mode] = {**summarize(samples), "resumed": resumed}
+    return results
+
+def wait_for_port(host, port, timeout=10):
+    """Wait until a server accepts connections on host:port."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TLS connection setup: full handshakes vs. resumed sessions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=61990)
+    parser.add_argument("--protocol", type=int, choices=[0, 1], default=0, help="Protocol version (0: default, 1: custom)")
+    parser.add_argument("--connections", type=int, default=200, help="Connections per mode")
+    parser.add_argument("--no-spawn", action="store_true", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--generate", action="store_true", help="Write a self-signed certificate to tls_cert/tls_key and exit")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.generate or not os.path.exists(tls.TLS_CERT):
+        tls.generate_self_signed()
+        print(f"Wrote self-signed certificate {tls.TLS_CERT} and key {tls.TLS_KEY}")
+        if args.generate:
+            sys.exit(0)
+
+    server = None
+    if not args.no_spawn:
+        server = subprocess.Popen([sys.executable, "server.py", "--tls", "--host", args.host, "--port", str(args.port),
+                                   "--protocol", str(args.protocol)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.host, args.port)
+        results = run(args.host, args.port, args.protocol, args.connections)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    for mode, r in results.items():
+        print(f"{mode:>8}: {r['n']} connections, {r['resumed']} resumed, mean {r['mean']:.3f} ms, "
+              f"p50 {r['p50']:.3f} ms, p95 {r['p95']:.3f} ms, p99 {r['p99']:.3f} ms")
+    print(f"Resumption saves {results['full']['p50'] - results['resumed']['p50']:.3f} ms at p50")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"host": args.host, "protocol": args.protocol, "results": results}, f, indent=2)
@@ -12,6 +12,7 @@ import random
 import grpc
 import handler_pb2
 import handler_pb2_grpc
+import tls
 from grpc import RpcError
 import sys
 
@@ -27,6 +28,10 @@ LIVE_SERVERS = config['servers']
 LEADER_ID = int(sys.argv[1]) # initial leader
 
 POLL_INTERVAL = 3
+# Consistency of CheckAccountExists, ListAccount and FetchMessageRead: "leader" sends them to the leader, "read_index"
+# and "bounded_staleness" spread them across all replicas (see handler.proto ReadConsistency)
+READ_CONSISTENCY = handler_pb2.ReadConsistency.Value(config.get("read_consistency", "leader").upper())
+READ_TIMEOUT = config.get("read_timeout", 1.0) # Seconds before a read moves on to the next replica
 BG_COLOR = config['bg_color']
 BTN_TXT_COLOR = config['btn_txt_color']
 BTN_BG_COLOR = config['btn_bg_color']
@@ -39,14 +44,22 @@ MAX_VIEW = config["max_view"]
 # Background Thread: manages receiving messages
 # -----------------------------------------------------------------------------
 class GRPCClient:
-    def __init__(self, live_servers, leader_id):
+    def __init__(self, live_servers, leader_id, read_consistency=READ_CONSISTENCY):
         """Initialize the gRPC client and start a background thread for receiving messages."""
 
         self.live_servers = live_servers
         self.leader_id = leader_id
-        self.leader_addr = f"{live_servers[leader_id].host}:{live_servers[leader_id].port}"
+        self.host = live_servers[leader_id]["host"]
+        self.port = live_servers[leader_id]["port"]
+        self.leader_addr = f"{self.host}:{self.port}"
 
-        self.channel = grpc.insecure_channel(f"{self.host}:{self.port}")
+        # Reads that allow it are spread round-robin across every replica, each on its own channel
+        self.read_consistency = read_consistency
+        self.replicas = [f"{s['host']}:{s['port']}" for s in live_servers]
+        self.read_channels = {}
+        self.next_replica = random.randrange(len(self.replicas))
+
+        self.channel = tls.grpc_channel(f"{self.host}:{self.port}")
         self.stub = handler_pb2_grpc.HandlerStub(self.channel)
         self.username = None
 
@@ -76,12 +89,32 @@ class GRPCClient:
         except grpc.RpcError as e:
             return
         
+    def _read(self, method, request):
+        """Send a read RPC at the client's read consistency. LEADER reads go to the leader; other reads go to the
+        replicas in turn, starting with the next one round-robin, until one serves it (a replica that cannot meet the
+        consistency answers UNAVAILABLE). Raises the last error if none could"""
+        request.consistency = self.read_consistency
+        if self.read_consistency == handler_pb2.LEADER:
+            return getattr(self.stub, method)(request)
+        start = self.next_replica
+        self.next_replica = (start + 1) % len(self.replicas)
+        error = None
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica not in self.read_channels:
+                self.read_channels[replica] = tls.grpc_channel(replica)
+            try:
+                return getattr(handler_pb2_grpc.HandlerStub(self.read_channels[replica]), method)(request, timeout=READ_TIMEOUT)
+            except RpcError as e:
+                error = e
+        raise error
+
     def _failover_to_leader(self, new_leader_addr):
         """Connect to the new leader given that we are connected to the wrong server"""
 
         print(f"Failing over to new leader at {new_leader_addr}")
         self.channel.close()
-        self.channel = grpc.insecure_channel(f"{new_leader_addr[0]}:{new_leader_addr[1]}")
+        self.channel = tls.grpc_channel(f"{new_leader_addr[0]}:{new_leader_addr[1]}")
         self.stub = handler_pb2_grpc.HandlerStub(self.channel)
 
     def _find_new_leader(self):
@@ -158,11 +191,13 @@ class GRPCClient:
         _ = self.stub.Ending(handler_pb2.EndingRequest(username=self.username))
         self.stop_event.set()
         self.channel.close()
+        for channel in self.read_channels.values():
+            channel.close()
     
     def check_account(self, username):
         """Check if the account exists."""
         try: 
-            return self.stub.CheckAccountExists(handler_pb2.AccountExistsRequest(username=username))
+            return self._read("CheckAccountExists", handler_pb2.AccountExistsRequest(username=username))
         except:
             self._find_new_leader()
             self._failover_to_leader(f"{self.host}:{self.port}")
@@ -206,7 +241,7 @@ class GRPCClient:
     def list_accounts(self, pattern=None):
         """List all accounts matching the pattern."""
         try: 
-            return self.stub.ListAccount(handler_pb2.ListAccountRequest(pattern=pattern))
+            return self._read("ListAccount", handler_pb2.ListAccountRequest(pattern=pattern))
         except:
             self._find_new_leader()
             self._failover_to_leader(f"{self.host}:{self.port}")
@@ -242,7 +277,7 @@ class GRPCClient:
     def fetch_read_messages(self, username, num_msgs):
         """Fetch read messages."""
         try:
-            return self.stub.FetchMessageRead(handler_pb2.FetchMessagesReadRequest(username=username, num=num_msgs))
+            return self._read("FetchMessageRead", handler_pb2.FetchMessagesReadRequest(username=username, num=num_msgs))
         except:
             self._find_new_leader()
             self._failover_to_leader(f"{self.host}:{self.port}")
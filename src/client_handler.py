@@ -1,12 +1,13 @@
-import io
-import json
 import selectors
 import struct
 import yaml
 import hashlib
 import yaml
 import logging
-from utils import encode_protocol, decode_protocol
+from framing import FrameReader, pack_protoheader
+import compression
+from codec import DEFAULT_CODEC
+from utils import encode_protocol, decode_protocol, OpCode
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -18,12 +19,16 @@ with open(yaml_path, "r") as y:
 
 # Defaults
 VERSION = config["version"]
-DB_PATH = config["db_path"]
+DB_PATH = config.get("db_path", None)
 MIN_MESSAGE_LEN = config["min_message_len"]
 MAX_MESSAGE_LEN = config["max_message_len"]
 
-class Message:
+class Message(FrameReader):
     """ Message class for handling client-server communication using JSON encoding. Message is (fuzzily) equivalent to a client-stub.
+    Framing is handled by FrameReader, so responses and pushed messages that arrive in one read are all processed.
+    Requests announce the compression codecs the client accepts, and are compressed once the server's responses show
+    it accepts one too.
+    JSON goes through self.codec, which decodes response content straight from the receive buffer.
 
     Methods:
     - _set_selector_events_mask(self, mode): Set selector to listen for events: mode is 'r', 'w', or 'rw'.
@@ -32,27 +37,29 @@ class Message:
     - _json_encode(self, obj, encoding): Encode JSON object.
     - _json_decode(self, json_bytes, encoding): Decode JSON object.
     - _package_request(self, req): Package a request into a message.
-    - _process_response(self): Process received response data.
+    - _process_response(self, data): Process received response data.
     - _generate_action(self, opcode, status_code, data): Generate an action based on response data.
     - process_events(self, mask): Process events based on mask.
     - read(self): Read data from socket.
     - write(self): Write data to socket.
     - close(self): Close the connection.
     - queue_request(self): Queue a request for sending.
-    - process_protoheader(self): Process protoheader from received buffer.
-    - process_header(self): Process header from received buffer.
+    - _decode_header(self, header_bytes): Decode header bytes into a dict.
+    - _handle_frame(self, content_bytes): Process one complete response.
+    - _pong(self): Answer a server ping.
     - _hash_password(self, password): Hash a password using SHA-256.
     """
+    codec = DEFAULT_CODEC
+    _content_as_view = True
+
     def __init__(self, selector, sock, addr, request, incoming_queue=None):
+        super().__init__()
         self.selector = selector
         self.sock = sock
         self.addr = addr
         self.request = request # Request to send
-        self._recv_buffer = b""
         self._send_buffer = b""
         self._request_queued = False
-        self._header_len = None
-        self._header = None
         self.response = None # Response received
         # Incoming queue for processing responses, shared with client GUI
         self.incoming_queue = incoming_queue
@@ -98,16 +105,11 @@ class Message:
 
     def _json_encode(self, obj, encoding):
         """Encode JSON object."""
-        return json.dumps(obj, ensure_ascii=False).encode(encoding)
+        return self.codec.encode(obj, encoding)
 
     def _json_decode(self, json_bytes, encoding):
         """Decode JSON object."""
-        tiow = io.TextIOWrapper(
-            io.BytesIO(json_bytes), encoding=encoding, newline=""
-        )
-        obj = json.load(tiow)
-        tiow.close()
-        return obj
+        return self.codec.decode(json_bytes, encoding)
 
     def _package_request(
         self, req):
@@ -115,6 +117,7 @@ class Message:
         # Encode content
         encoding = req["content_encoding"]
         content_bytes = self._json_encode(req["content"], encoding)
+        codec, content_bytes = compression.compress(content_bytes, self._send_codec)
         # Encode header
         jsonheader = {
             # "byteorder": sys.byteorder,
@@ -125,26 +128,17 @@ class Message:
         }
         jsonheader_bytes = self._json_encode(jsonheader, encoding)
         # Encode protoheader and package message
-        message_hdr = struct.pack(">H", VERSION) + struct.pack(">H", len(jsonheader_bytes))
+        message_hdr = pack_protoheader(len(jsonheader_bytes), codec)
         message = message_hdr + jsonheader_bytes + content_bytes
 
         return message
     
-    def _process_response(self):
+    def _process_response(self, data):
         """Process received response data."""
-        # Check if request is fully received
-        content_len = self._header["content_length"]
-        if not len(self._recv_buffer) >= content_len: # TODO: exception
-            return
-        
-        # Save data from receive buffer
-        data = self._recv_buffer[:content_len]
-        self._recv_buffer = self._recv_buffer[content_len:]
-
         # Decode response data
         encoding = self._header["content_encoding"]
         self.response = self._json_decode(data, encoding)
-        print(f"Received response {self.response!r} from {self.addr}")
+        logging.info(f"Received response {self.response!r} from {self.addr}")
 
         # Get opcode, status code, and data from self._header and self.response
         opcode = self._header.get("opcode")
@@ -166,24 +160,9 @@ class Message:
             self.write()
 
     def read(self):
-        """Read and process data from socket."""
-        # Clear previous read data
-        self._header_len = None
-        self._header = None
-        self.response = None
-        self._request_queued = False
+        """Read data from socket and process every complete response."""
         self._read()
-
-        # Decode protoheader
-        if self._header_len is None:
-            self.process_protoheader()
-
-        # Decode header and content
-        if self._header_len is not None and self._header is None:
-            self.process_header()
-
-        if self._header and self.response is None:
-            self._process_response()
+        self._drain_frames()
 
     def write(self):
         """Write data to socket."""
@@ -211,41 +190,22 @@ class Message:
         self._send_buffer += message
         self._request_queued = True
         
-    def process_protoheader(self):
-        """Process protoheader from received buffer."""
-        hdrlen = 2
-        
-        if len(self._recv_buffer) >= hdrlen:
-            v = struct.unpack(
-                ">H", self._recv_buffer[:hdrlen]
-            )[0]
-            if v != VERSION: 
-                logging.error(f"Invalid protocol version: {v}")
-            self._recv_buffer = self._recv_buffer[hdrlen:]
-
-
-        if len(self._recv_buffer) >= hdrlen:
-            self._header_len = struct.unpack(
-                ">H", self._recv_buffer[:hdrlen]
-            )[0]
-            self._recv_buffer = self._recv_buffer[hdrlen:]
-
-    def process_header(self):
-        """Process header from received buffer."""
-        hdrlen = self._header_len
-        # Check if header is fully received
-        if len(self._recv_buffer) >= hdrlen:
-            self._header = self._json_decode(self._recv_buffer[:hdrlen], "utf-8")
-            self._recv_buffer = self._recv_buffer[hdrlen:]
-            # Validate header fields
-            for reqhdr in (
-                "content_length",
-                "content_encoding",
-                "opcode"
-            ):
-                if reqhdr not in self._header:
-                    logging.error(f"Missing required header '{reqhdr}'.")
-                
+    def _decode_header(self, header_bytes):
+        """Decode JSON header bytes."""
+        return self._json_decode(header_bytes, "utf-8")
+
+    def _handle_frame(self, content_bytes):
+        """Process one complete response. Server pings are answered here and not passed on."""
+        if self._header["opcode"] == OpCode.PING.value:
+            self._pong()
+            return
+        self._process_response(content_bytes)
+
+    def _pong(self):
+        """Answer a server ping so the server keeps the connection open."""
+        self._send_buffer += self._package_request({"content_encoding": "utf-8", "content": {"args": []}, "opcode": OpCode.PING.value})
+        self._set_selector_events_mask("rw")
+
     def _hash_password(self, password):
         # Hash a password using SHA-256
         return hashlib.sha256(password)
@@ -255,9 +215,11 @@ class MessageCustom(Message):
     
     Modified methods:
     - _package_request(self, req)
-    - _process_response(self)
-    - process_header(self)
+    - _process_response(self, data)
+    - _decode_header(self, header_bytes)
     """
+    _content_as_view = False # decode_protocol works on bytes
+
     def __init__(self, selector, sock, addr, request, incoming_queue=None):
         super().__init__(selector=selector, sock=sock, addr=addr, request=request, incoming_queue=incoming_queue)
 
@@ -265,26 +227,20 @@ class MessageCustom(Message):
         """Package a request into a custom format before sending."""
         encoding = req["content_encoding"]
         content_bytes = encode_protocol(req["content"]["args"])  # Serialize content
+        codec, content_bytes = compression.compress(content_bytes, self._send_codec)
 
         # Encode header
         header = [encoding, len(content_bytes), req["opcode"]]
         header_bytes = encode_protocol(header)  # Serialize header
 
         # Encode protoheader and package message
-        message_hdr = struct.pack(">H", VERSION) + struct.pack(">H", len(header_bytes))
+        message_hdr = pack_protoheader(len(header_bytes), codec)
         message = message_hdr + header_bytes + content_bytes
 
         return message
 
-    def _process_response(self):
+    def _process_response(self, data):
         """Process received response data."""
-        content_len = self._header["content_length"]
-        if len(self._recv_buffer) < content_len:
-            return  # Incomplete data
-
-        data = self._recv_buffer[:content_len]
-        self._recv_buffer = self._recv_buffer[content_len:]
-
         # Decode content using custom protocol
         decoded_data = decode_protocol(data)
         if not decoded_data:
@@ -298,26 +254,15 @@ class MessageCustom(Message):
         opcode = self._header.get("opcode")
         self._generate_action(opcode, status_code, response_data)
 
-    def process_header(self):
-        """Process message header from received buffer."""
-        hdrlen = self._header_len
-        if len(self._recv_buffer) >= hdrlen and hdrlen != 0:
-            # Read and decode header data
-            header_data = self._recv_buffer[:hdrlen]
-            self._recv_buffer = self._recv_buffer[hdrlen:]
-
-            decoded_header = decode_protocol(header_data)
-            if not decoded_header or len(decoded_header) < 3:
-                logging.error("Failed to decode header data.")
-                return
-
-            self._header = {
-                "content_encoding": decoded_header[0],
-                "content_length": decoded_header[1],
-                "opcode": decoded_header[2],
-            }
-
-            # Validate header fields
-            for reqhdr in ("content_encoding", "content_length", "opcode"):
-                if reqhdr not in self._header:
-                    logging.error(f"Missing required header '{reqhdr}'.")
\ No newline at end of file
+    def _decode_header(self, header_bytes):
+        """Decode custom header bytes."""
+        decoded_header = decode_protocol(header_bytes)
+        if not decoded_header or len(decoded_header) < 3:
+            logging.error("Failed to decode header data.")
+            raise ValueError("Failed to decode header data.")
+
+        return {
+            "content_encoding": decoded_header[0],
+            "content_length": decoded_header[1],
+            "opcode": decoded_header[2],
+        }
@@ -0,0 +1,69 @@
+import json
+import logging
+
+# Optional fast JSON backends, used when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Backends in order of preference
+BACKENDS = ("orjson", "msgspec", "json")
+
+def available_backends():
+    """Return the names of the installed JSON backends, fastest first."""
+    installed = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+    return [b for b in BACKENDS if installed[b]]
+
+class JSONCodec:
+    """ JSON codec for the JSON protocol. Decodes directly from bytes, bytearray or memoryview without wrapping the
+    payload in a text stream, and encodes to compact UTF-8 bytes.
+
+    Methods:
+    - encode(self, obj, encoding): Encode a Python object as JSON bytes.
+    - decode(self, data, encoding): Decode JSON bytes (or a memoryview) into a Python object.
+    """
+    def __init__(self, backend=None):
+        """ Initialize the codec with a backend name ('orjson', 'msgspec' or 'json'), defaulting to the fastest installed """
+        installed = available_backends()
+        if backend is None:
+            backend = installed[0]
+        elif backend not in installed:
+            raise ValueError(f"JSON backend {backend!r} is not installed.")
+        self.backend = backend
+
+        if backend == "orjson":
+            self._encode = orjson.dumps
+            self._decode = orjson.loads
+        elif backend == "msgspec":
+            self._encode = msgspec.json.Encoder().encode
+            self._decode = msgspec.json.Decoder().decode
+        else:
+            self._encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+            self._decode = json.loads
+        logging.info(f"Using {backend} JSON backend")
+
+    def encode(self, obj, encoding="utf-8"):
+        """Encode a Python object as JSON bytes."""
+        if self.backend == "json":
+            return self._encode(obj).encode(encoding)
+        data = self._encode(obj)
+        # Fast backends always produce UTF-8
+        if encoding.lower().replace("-", "") != "utf8":
+            data = data.decode("utf-8").encode(encoding)
+        return data
+
+    def decode(self, data, encoding="utf-8"):
+        """Decode JSON bytes, bytearray or memoryview into a Python object."""
+        if encoding.lower().replace("-", "") != "utf8":
+            return json.loads(bytes(data).decode(encoding))
+        if self.backend == "json" and isinstance(data, memoryview):
+            data = bytes(data)
+        return self._decode(data)
+
+# Shared codec instance
+DEFAULT_CODEC = JSONCodec()
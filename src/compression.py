@@ -0,0 +1,105 @@
+import zlib
+import yaml
+import logging
+
+# Optional zstd backend, used when installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+# Content codecs, stored in the low nibble of the protoheader flags
+NONE = 0
+DEFLATE = 1
+ZSTD = 2
+CODECS = {"deflate": DEFLATE, "zstd": ZSTD}
+CODEC_MASK = 0x0F
+# The high nibble of the flags lists the codecs the sender accepts, one bit per codec
+ACCEPT_SHIFT = 4
+
+# Defaults
+COMPRESSION = config.get("compression", ["zstd", "deflate"]) # Codecs to accept and use, preferred first
+THRESHOLD = config.get("compress_threshold", 512) # Send content smaller than this uncompressed
+LEVEL = config.get("compress_level", 3)
+# Largest frame content accepted, after decompression: the protocol's maximum frame size
+MAX_CONTENT_LEN = config.get("max_content_len", 16 << 20)
+
+def available_codecs():
+    """Return the codecs from the compression setting that are installed, preferred first."""
+    installed = {DEFLATE: True, ZSTD: zstandard is not None}
+    codecs = []
+    for name in COMPRESSION:
+        if name not in CODECS:
+            logging.error(f"Unknown compression codec {name!r}")
+            raise ValueError(f"Unknown compression codec {name!r}")
+        if installed[CODECS[name]]:
+            codecs.append(CODECS[name])
+    return codecs
+
+PREFERRED = available_codecs()
+# Flags announcing the codecs this side accepts
+ACCEPT_FLAGS = sum(1 << (codec - 1) for codec in PREFERRED) << ACCEPT_SHIFT
+
+if zstandard is not None:
+    _zstd_compressor = zstandard.ZstdCompressor(level=LEVEL)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+
+def negotiate(flags):
+    """Return the preferred local codec the peer accepts, given flags from one of its frames, or NONE."""
+    accepted = flags >> ACCEPT_SHIFT
+    for codec in PREFERRED:
+        if accepted & (1 << (codec - 1)):
+            return codec
+    return NONE
+
+def compress(content, codec, threshold=THRESHOLD):
+    """Compress frame content with codec. Returns (codec used, content). Content below the threshold, or that does
+    not shrink, is returned as-is with NONE."""
+    if codec == NONE or len(content) < threshold:
+        return NONE, content
+    if codec == ZSTD:
+        packed = _zstd_compressor.compress(content)
+    else:
+        packed = zlib.compress(content, LEVEL)
+    if len(packed) >= len(content):
+        return NONE, content
+    return codec, packed
+
+def decompress(content, flags, max_length=MAX_CONTENT_LEN):
+    """Decompress frame content according to the codec in the protoheader flags. Raises ValueError for corrupt content
+    or content that would inflate past max_length bytes, without inflating more than that."""
+    codec = flags & CODEC_MASK
+    if codec == NONE:
+        return content
+    if codec == DEFLATE:
+        inflater = zlib.decompressobj()
+        try:
+            data = inflater.decompress(content, max_length)
+        except zlib.error as e:
+            logging.error(f"Corrupt deflate content: {e}")
+            raise ValueError(f"Corrupt deflate content: {e}")
+        if inflater.unconsumed_tail or (not inflater.eof and len(data) == max_length):
+            logging.error(f"Compressed content inflates past {max_length} bytes")
+            raise ValueError(f"Compressed content inflates past {max_length} bytes")
+        if not inflater.eof:
+            logging.error("Truncated deflate content")
+            raise ValueError("Truncated deflate content")
+        return data
+    if codec == ZSTD and zstandard is not None:
+        try:
+            # max_output_size only bounds frames without a content size; the others are checked against it first
+            size = zstandard.frame_content_size(content)
+            if size > max_length:
+                logging.error(f"Compressed content inflates past {max_length} bytes")
+                raise ValueError(f"Compressed content inflates past {max_length} bytes")
+            return _zstd_decompressor.decompress(content, max_output_size=max_length)
+        except zstandard.ZstdError as e:
+            logging.error(f"Corrupt or oversize zstd content: {e}")
+            raise ValueError(f"Corrupt or oversize zstd content: {e}")
+    logging.error(f"Unsupported compression codec: {codec}")
+    raise ValueError(f"Unsupported compression codec: {codec}")
@@ -1,4 +1,5 @@
 import sqlite3
+from contextlib import contextmanager
 from utils import ResponseCode
 from typing import Union
 import yaml
@@ -38,25 +39,49 @@ class DatabaseHandler():
     - fetch_homepage(username): status_code, data[unread_count, messages]
     - list_accounts(pattern): status_code, data[accounts]
     - insert_message(sender, receiver, content, timestamp, delivered): status_code
+    - mark_undelivered(message_id): status_code
     - delete_messages(username, message_ids): status_code, data[unread_count, messages]
     - fetch_messages_delivered(username, n): status_code, data[messages]
     - fetch_messages_undelivered(username, n): status_code, data[unread_count, messages]
     - count_messages(username, delivered): count
     - account_exists(username): bool
+    - transaction(): context manager running every call inside it in one SQLite transaction
+    - last_applied(): int
+    - save_applied(index)
     - close()
     """
     def __init__(self, path):
         """ Initialize connection given database path """
         try:
             self.path = path
+            self._conn = None # Long-lived connection, opened by the first transaction()
+            self._tx = None   # Set inside transaction()
             # self.conn = sqlite3.connect(self.path)
             # self.cursor = self.conn.cursor()
         except sqlite3.Error as e:
             print(f"Database connection error: {e}")
 
     def get_connection(self):
+        if self._tx is not None:
+            return self._tx
         return sqlite3.connect(self.path, check_same_thread=False)
 
+    @contextmanager
+    def transaction(self):
+        """ Run every call made inside the block on one long-lived connection, committed once at the end (rolled back
+        if the block raises). Not reentrant, and a handler must not be used from another thread meanwhile """
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._tx = _Transaction(self._conn)
+        try:
+            yield
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        finally:
+            self._tx = None
+
     def create_account(self, username, password, bio) -> dict[int]:
         """ Given username and password, return account creation status """
         try:
@@ -180,6 +205,19 @@ class DatabaseHandler():
             logging.error(f"Database error: {e}")
             return {"status_code": ResponseCode.MESSAGE_SEND_FAILURE.value}
     
+    def mark_undelivered(self, message_id) -> dict[int]:
+        """ Given a message id, mark the message undelivered (e.g. a push to the receiver failed) """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("UPDATE messages SET delivered=0 WHERE id=?", (message_id,))
+            conn.commit()
+            conn.close()
+            return {"status_code": ResponseCode.SUCCESS.value}
+        except sqlite3.Error as e:
+            logging.error(f"Database error: {e}")
+            return {"status_code": ResponseCode.DATABASE_ERROR.value}
+
     def delete_messages(self, username, message_ids: list) -> dict[int, Union[int, list[tuple]]]:
         """ Given a list of message ids, return message deletion status and updated homepage data """
         try:
@@ -312,7 +350,49 @@ class DatabaseHandler():
             logging.error(f"Database error: {e}")
             return -1
     
+    def last_applied(self) -> int:
+        """ Return the last Raft log index applied to the database (0 if none was recorded) """
+        conn = self.get_connection()
+        try:
+            row = conn.cursor().execute("SELECT last_applied FROM raft_applied").fetchone()
+            return row[0] if row else 0
+        except sqlite3.Error as e:
+            logging.error(f"Database error: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def save_applied(self, index):
+        """ Record the last Raft log index applied to the database; inside transaction() it commits with the entries """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM raft_applied")
+            cursor.execute("INSERT INTO raft_applied (last_applied) VALUES (?)", (index,))
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Database error: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def close(self):
+        """ Close the connection kept by transaction() """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class _Transaction():
+    """ Connection handed out by get_connection() inside DatabaseHandler.transaction(): the methods' own commit() and
+    close() are deferred to the end of the transaction """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self):
+        return self.conn.cursor()
+
+    def commit(self):
+        pass
+
     def close(self):
-        # """ Close the database connection """
-        # self.conn.close()
         pass
\ No newline at end of file
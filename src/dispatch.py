@@ -0,0 +1,74 @@
+import socket
+import logging
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class RequestDispatcher:
+    """ Runs request handling on a thread pool for the selectors server and hands results back to the event loop.
+
+    Pool threads never touch sockets, the selector or send queues. Anything they need done on the loop (queueing a
+    response or a pushed message, finishing a request) goes through call_soon, which queues the callback and writes a
+    byte to a wakeup socketpair. The read end is registered with the selector, so the loop runs queued callbacks in
+    order when it wakes.
+
+    Methods:
+    - submit(self, fn, *args, done=None): Run fn(*args) on the pool, then done(future) on the event loop.
+    - call_soon(self, fn, *args): Queue fn(*args) to run on the event loop. Safe to call from any thread.
+    - on_loop_thread(self): Whether the caller is on the event loop thread.
+    - process_events(self, mask): Run every queued callback. Called by the server loop when the wakeup socket is readable.
+    - close(self): Shut down the pool and close the wakeup sockets.
+    """
+    def __init__(self, workers):
+        self.addr = "request dispatcher" # For the server loop's error messages
+        self.loop_thread = threading.current_thread() # Created by the thread that runs the event loop
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self._callbacks = deque() # (fn, args) to run on the event loop
+        self.sock, self._wakeup = socket.socketpair()
+        self.sock.setblocking(False)
+        self._wakeup.setblocking(False)
+
+    def submit(self, fn, *args, done=None):
+        """Run fn(*args) on the pool, then done(future) on the event loop."""
+        future = self.executor.submit(fn, *args)
+        if done is not None:
+            future.add_done_callback(lambda f: self.call_soon(done, f))
+        return future
+
+    def call_soon(self, fn, *args):
+        """Queue fn(*args) to run on the event loop and wake the loop. Safe to call from any thread."""
+        self._callbacks.append((fn, args))
+        try:
+            self._wakeup.send(b"\0")
+        except BlockingIOError:
+            # Socket buffer full of wakeups already; the loop is bound to wake
+            pass
+
+    def on_loop_thread(self):
+        """Whether the caller is on the event loop thread."""
+        return threading.current_thread() is self.loop_thread
+
+    def process_events(self, mask):
+        """Clear the wakeup socket and run every queued callback in order."""
+        try:
+            while self.sock.recv(4096):
+                pass
+        except BlockingIOError:
+            # Resource temporarily unavailable (errno EWOULDBLOCK)
+            pass
+        while self._callbacks:
+            fn, args = self._callbacks.popleft()
+            try:
+                fn(*args)
+            except Exception:
+                logging.error(f"Error in dispatched callback {fn!r}:\n{traceback.format_exc()}")
+
+    def close(self):
+        """Shut down the pool and close the wakeup sockets."""
+        self.executor.shutdown(wait=True)
+        self.sock.close()
+        self._wakeup.close()
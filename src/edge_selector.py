@@ -0,0 +1,93 @@
+import select
+import selectors
+from types import MappingProxyType
+
+if not hasattr(select, "epoll"):
+    raise ImportError("EdgeTriggeredSelector needs Linux epoll.")
+
+class EdgeTriggeredSelector(selectors.BaseSelector):
+    """ Linux epoll selector that registers every file object edge-triggered for both reads and writes.
+
+    Interest never changes after registration, so modify() only updates the key's data and makes no syscall. Events
+    are reported once per readiness edge: handlers must read until the socket would block (server_handler.Message
+    does when edge_triggered is set), accept until EAGAIN, and treat a write event as a chance to flush.
+
+    Methods:
+    - register(self, fileobj, events, data=None): Register for read and write edges, whatever events are asked for.
+    - unregister(self, fileobj): Stop watching a file object.
+    - modify(self, fileobj, events, data=None): Update the key's data. No syscall.
+    - select(self, timeout=None): Wait for readiness edges.
+    - get_key(self, fileobj): Return the key registered for a file object.
+    - get_map(self): Return a read-only mapping of file objects to keys.
+    - close(self): Close the epoll instance.
+    """
+    edge_triggered = True
+    _EPOLL_FLAGS = select.EPOLLIN | select.EPOLLOUT | select.EPOLLRDHUP | select.EPOLLET
+    _READ_EVENTS = select.EPOLLIN | select.EPOLLRDHUP | select.EPOLLHUP | select.EPOLLERR
+    _WRITE_EVENTS = select.EPOLLOUT | select.EPOLLHUP | select.EPOLLERR
+
+    def __init__(self):
+        self._epoll = select.epoll()
+        self._keys = {} # fd -> SelectorKey
+
+    @staticmethod
+    def _fileobj_fd(fileobj):
+        return fileobj if isinstance(fileobj, int) else fileobj.fileno()
+
+    def register(self, fileobj, events, data=None):
+        fd = self._fileobj_fd(fileobj)
+        if fd in self._keys:
+            raise KeyError(f"{fileobj!r} (fd {fd}) is already registered")
+        key = selectors.SelectorKey(fileobj, fd, selectors.EVENT_READ | selectors.EVENT_WRITE, data)
+        self._epoll.register(fd, self._EPOLL_FLAGS)
+        self._keys[fd] = key
+        return key
+
+    def unregister(self, fileobj):
+        key = self.get_key(fileobj)
+        del self._keys[key.fd]
+        try:
+            self._epoll.unregister(key.fd)
+        except OSError:
+            # Already closed; the kernel dropped it from the interest list
+            pass
+        return key
+
+    def modify(self, fileobj, events, data=None):
+        key = self.get_key(fileobj)
+        if data is not key.data:
+            key = key._replace(data=data)
+            self._keys[key.fd] = key
+        return key
+
+    def select(self, timeout=None):
+        timeout = -1 if timeout is None else max(timeout, 0)
+        try:
+            fd_events = self._epoll.poll(timeout, max(len(self._keys), 1))
+        except InterruptedError:
+            return []
+        ready = []
+        for fd, event in fd_events:
+            key = self._keys.get(fd)
+            if key is None:
+                continue
+            mask = 0
+            if event & self._READ_EVENTS:
+                mask |= selectors.EVENT_READ
+            if event & self._WRITE_EVENTS:
+                mask |= selectors.EVENT_WRITE
+            ready.append((key, mask))
+        return ready
+
+    def get_key(self, fileobj):
+        fd = self._fileobj_fd(fileobj)
+        if fd not in self._keys:
+            raise KeyError(f"{fileobj!r} is not registered")
+        return self._keys[fd]
+
+    def get_map(self):
+        return MappingProxyType({key.fileobj: key for key in self._keys.values()})
+
+    def close(self):
+        self._epoll.close()
+        self._keys.clear()
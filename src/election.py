@@ -0,0 +1,64 @@
+import os
+import json
+import random
+import yaml
+import logging
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+HEARTBEAT_LEN = config["heartbeat_len"]
+# A follower that hears nothing from a leader for a random time in this range starts an election. Randomizing it per
+# wait means one server usually times out first and wins before the others start competing elections
+TIMEOUT_MIN = config.get("election_timeout_min", HEARTBEAT_LEN)
+TIMEOUT_MAX = config.get("election_timeout_max", 2 * HEARTBEAT_LEN)
+FSYNC = config.get("wal_fsync", True) # Same durability as the Raft log
+
+def timeout():
+    """A fresh randomized election timeout, in seconds."""
+    return random.uniform(TIMEOUT_MIN, TIMEOUT_MAX)
+
+def log_up_to_date(cand_last_idx, cand_last_term, last_idx, last_term):
+    """True if a candidate whose log ends at (cand_last_idx, cand_last_term) is at least as up to date as a log ending
+    at (last_idx, last_term): a later last term wins, and with equal terms the longer log does. Voting only for such
+    candidates keeps every committed entry in the next leader's log."""
+    if cand_last_term != last_term:
+        return cand_last_term > last_term
+    return cand_last_idx >= last_idx
+
+class ElectionState:
+    """ The current term and the vote cast in it, which Raft needs to survive a restart: a server that forgets its vote
+    could vote twice in one term and let two leaders be elected.
+
+    Kept in a small JSON file, replaced atomically (written to a temporary file, fsynced and renamed over it).
+
+    Methods:
+    - save(self, term, voted_for): Persist both before returning.
+    """
+    def __init__(self, path, fsync=FSYNC):
+        self.path = path
+        self.fsync = fsync
+        self.term = 0
+        self.voted_for = None
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"[ELECTION] Unreadable election state | path: {path}, error: {e}")
+                raise
+            self.term, self.voted_for = state["term"], state["voted_for"]
+
+    def save(self, term, voted_for):
+        if (term, voted_for) == (self.term, self.voted_for):
+            return
+        partial = self.path + ".partial"
+        with open(partial, "w") as f:
+            json.dump({"term": term, "voted_for": voted_for}, f)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(partial, self.path)
+        self.term, self.voted_for = term, voted_for
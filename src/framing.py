@@ -0,0 +1,250 @@
+import os
+import struct
+import yaml
+import logging
+from collections import deque
+from itertools import islice
+import compression
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+# Defaults
+VERSION = config["version"]
+PROTOHEADER_FMT = ">BBH" # Flags + version + header length (wire-compatible with the old ">HH" version field)
+PROTOHEADER_LEN = struct.calcsize(PROTOHEADER_FMT)
+REQUIRED_HEADERS = ("content_encoding", "content_length", "opcode")
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX") # Max buffers per sendmsg call
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
+def pack_protoheader(header_len, codec=compression.NONE, announce=True):
+    """Pack the protoheader for a frame whose content was compressed with codec. With announce, the frame also lists
+    the codecs this side accepts, so the peer can start compressing its frames. Peers that announce nothing get no
+    flags at all, which keeps the frame readable with the old version-only protoheader."""
+    flags = compression.ACCEPT_FLAGS if announce else 0
+    return struct.pack(PROTOHEADER_FMT, flags | codec, VERSION, header_len)
+
+class FrameReader:
+    """ Incremental parser for the protoheader | header | content framing shared by the client and server stubs.
+
+    Received bytes are appended to a growable bytearray and consumed by advancing a read offset, so partially received
+    frames survive across reads and every complete frame in the buffer is drained per readiness event. The buffer is
+    compacted once per drain instead of once per field.
+
+    Subclasses that can decode straight from a memoryview set _content_as_view = True to receive frame content without
+    a copy. The view is released once _handle_frame returns.
+
+    The protoheader flags carry the content codec of the frame and the codecs the peer accepts. Compressed content is
+    decompressed before _handle_frame, and _send_codec tracks the codec to use for frames sent to the peer. Frame
+    content is limited to compression.MAX_CONTENT_LEN bytes, before and after decompression.
+
+    Subclasses implement:
+    - _decode_header(self, header_bytes): Decode header bytes into a dict with content_encoding, content_length and opcode.
+    - _handle_frame(self, content_bytes): Act on one complete frame. self._header holds the frame's header.
+    - _reject_frame(self, error): Act on a frame whose content failed to decompress (ValueError). Raises it by default.
+
+    Methods:
+    - _buffered(self): Number of received bytes not yet consumed.
+    - _consume(self, n): Consume and return the next n bytes.
+    - _consume_view(self, n): Consume the next n bytes and return them as a memoryview.
+    - _compact_recv_buffer(self): Drop consumed bytes from the front of the buffer.
+    - _drain_frames(self, max_frames=None): Parse and handle every complete frame in the buffer, or at most max_frames.
+    - process_protoheader(self): Process protoheader from received buffer.
+    - process_header(self): Process header from received buffer.
+    """
+    _content_as_view = False
+
+    def __init__(self):
+        super().__init__()
+        self._recv_buffer = bytearray()
+        self._recv_offset = 0
+        self._header_len = None
+        self._header = None
+        self._frame_flags = 0
+        self._peer_accepts = 0 # Accepted-codec bits from the peer's last frame
+        self._send_codec = compression.NONE # Codec for frames sent to the peer
+
+    def _buffered(self):
+        """Number of received bytes not yet consumed."""
+        return len(self._recv_buffer) - self._recv_offset
+
+    def _consume(self, n):
+        """Consume and return the next n bytes of the receive buffer."""
+        start = self._recv_offset
+        with memoryview(self._recv_buffer) as view:
+            data = bytes(view[start:start + n])
+        self._recv_offset += n
+        return data
+
+    def _consume_view(self, n):
+        """Consume the next n bytes of the receive buffer as a memoryview. Release it before the buffer is resized."""
+        start = self._recv_offset
+        with memoryview(self._recv_buffer) as view:
+            data = view[start:start + n]
+        self._recv_offset += n
+        return data
+
+    def _compact_recv_buffer(self):
+        """Drop consumed bytes from the front of the receive buffer."""
+        if self._recv_offset:
+            del self._recv_buffer[:self._recv_offset]
+            self._recv_offset = 0
+
+    def _drain_frames(self, max_frames=None):
+        """Parse and handle every complete frame in the receive buffer, or at most max_frames of them.
+        Returns the number of frames handled. The buffer is compacted once no complete frame is left."""
+        frames = 0
+        while max_frames is None or frames < max_frames:
+            # Decode protoheader
+            if self._header_len is None:
+                self.process_protoheader()
+                if self._header_len is None:
+                    break
+            # Decode header
+            if self._header is None:
+                self.process_header()
+                if self._header is None:
+                    break
+            # Wait for the rest of the content
+            content_len = self._header["content_length"]
+            if self._buffered() < content_len:
+                break
+            if self._frame_flags & compression.CODEC_MASK:
+                try:
+                    with self._consume_view(content_len) as content:
+                        content = compression.decompress(content, self._frame_flags, compression.MAX_CONTENT_LEN)
+                except ValueError as e:
+                    self._reject_frame(e)
+                else:
+                    self._handle_frame(content)
+            elif self._content_as_view:
+                with self._consume_view(content_len) as content:
+                    self._handle_frame(content)
+            else:
+                self._handle_frame(self._consume(content_len))
+            frames += 1
+            # Reset for the next frame
+            self._header_len = None
+            self._header = None
+        else:
+            # Stopped at max_frames; the next call compacts
+            return frames
+        self._compact_recv_buffer()
+        return frames
+
+    def process_protoheader(self):
+        """Process protoheader (flags, version, header length) from received buffer."""
+        if self._buffered() < PROTOHEADER_LEN:
+            return
+        flags, v, self._header_len = struct.unpack_from(PROTOHEADER_FMT, self._recv_buffer, self._recv_offset)
+        self._recv_offset += PROTOHEADER_LEN
+        if v != VERSION:
+            logging.error(f"Unsupported version: {v}")
+        self._frame_flags = flags
+        # Renegotiate only when the peer's accepted codecs change
+        accepts = flags >> compression.ACCEPT_SHIFT
+        if accepts != self._peer_accepts:
+            self._peer_accepts = accepts
+            self._send_codec = compression.negotiate(flags)
+
+    def process_header(self):
+        """Process message header from received buffer."""
+        hdrlen = self._header_len
+        if self._buffered() < hdrlen:
+            return
+        header = self._decode_header(self._consume(hdrlen))
+        # Check header data
+        for reqhdr in REQUIRED_HEADERS:
+            if reqhdr not in header:
+                logging.error(f"Missing required header '{reqhdr}'.")
+                raise ValueError(f"Missing required header '{reqhdr}'.")
+        if header["content_length"] > compression.MAX_CONTENT_LEN:
+            logging.error(f"Frame content of {header['content_length']} bytes exceeds {compression.MAX_CONTENT_LEN}.")
+            raise ValueError(f"Frame content of {header['content_length']} bytes exceeds {compression.MAX_CONTENT_LEN}.")
+        self._header = header
+
+    def _decode_header(self, header_bytes):
+        raise NotImplementedError
+
+    def _handle_frame(self, content_bytes):
+        raise NotImplementedError
+
+    def _reject_frame(self, error):
+        raise error
+
+class FrameWriter:
+    """ Outbound queue of packaged frames, flushed with scatter/gather sendmsg.
+
+    Frames are queued as-is and never concatenated or sliced. Progress through the first frame is tracked by an offset,
+    so a partial send costs no copies. All frames queued between flushes go out in a single syscall.
+
+    Subclasses can override _send_buffers for sockets without sendmsg (e.g. TLS) and set _write_chunk to cap the bytes
+    handed to one send call.
+
+    Methods:
+    - _queue_frame(self, frame): Queue a packaged frame for sending.
+    - _pending(self): Number of queued bytes not yet sent.
+    - _send_buffers(self, buffers): Send a list of buffers in one call. Returns the number of bytes sent.
+    - _flush(self): Send as much of the queue as the socket accepts. Returns the number of bytes sent.
+    """
+    _write_chunk = None # Max bytes per send call, None for up to IOV_MAX whole frames
+
+    def __init__(self):
+        super().__init__()
+        self._send_queue = deque()
+        self._send_offset = 0 # Bytes of _send_queue[0] already sent
+        self._send_pending = 0
+
+    def _queue_frame(self, frame):
+        """Queue a packaged frame for sending."""
+        if frame:
+            self._send_queue.append(frame)
+            self._send_pending += len(frame)
+
+    def _pending(self):
+        """Number of queued bytes not yet sent."""
+        return self._send_pending
+
+    def _send_buffers(self, buffers):
+        """Send a list of buffers with one sendmsg call."""
+        return self.sock.sendmsg(buffers)
+
+    def _flush(self):
+        """Send queued frames with sendmsg until the queue is empty or the socket would block."""
+        total = 0
+        while self._send_queue:
+            buffers = list(islice(self._send_queue, IOV_MAX))
+            if self._send_offset:
+                buffers[0] = memoryview(buffers[0])[self._send_offset:]
+            if self._write_chunk is not None:
+                # Whole frames up to the chunk size (at least one)
+                size = 0
+                for n, buffer in enumerate(buffers, 1):
+                    size += len(buffer)
+                    if size >= self._write_chunk:
+                        del buffers[n:]
+                        break
+            try:
+                # Should be ready to write
+                sent = self._send_buffers(buffers)
+            except BlockingIOError:
+                # Resource temporarily unavailable (errno EWOULDBLOCK)
+                break
+            total += sent
+            self._send_pending -= sent
+            short_write = sent < sum(len(b) for b in buffers)
+            # Drop fully sent frames and remember the offset into the first unsent one
+            sent += self._send_offset
+            while self._send_queue and sent >= len(self._send_queue[0]):
+                sent -= len(self._send_queue.popleft())
+            self._send_offset = sent
+            # The socket buffer is full
+            if short_write:
+                break
+        if total:
+            logging.debug(f"Sent {total} bytes to {self.addr}, {self._send_pending} pending")
+        return total
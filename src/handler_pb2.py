@@ -22,81 +22,96 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rhandler.proto\x1a\x1bgoogle/protobuf/empty.proto\"!\n\rEndingRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"%\n\x0e\x45ndingResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\"(\n\x14\x41\x63\x63ountExistsRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"<\n\x15\x41\x63\x63ountExistsResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\x0e\n\x06\x65xists\x18\x02 \x01(\x08\"G\n\x14\x43reateAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12\x0b\n\x03\x62io\x18\x03 \x01(\t\",\n\x15\x43reateAccountResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\"9\n\x13LoginAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"U\n\x14LoginAccountResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x19\n\x07msg_lst\x18\x03 \x03(\x0b\x32\x08.Message\"%\n\x12ListAccountRequest\x12\x0f\n\x07pattern\x18\x01 \x01(\t\"F\n\x13ListAccountResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\x1a\n\x08\x61\x63\x63t_lst\x18\x02 \x03(\x0b\x32\x08.Account\":\n\x14\x44\x65leteAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\",\n\x15\x44\x65leteAccountResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\"(\n\x14\x46\x65tchHomepageRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"V\n\x15\x46\x65tchHomepageResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x19\n\x07msg_lst\x18\x03 \x03(\x0b\x32\x08.Message\"9\n\x18\x46\x65tchMessagesReadRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x0b\n\x03num\x18\x02 \x01(\x05\"K\n\x19\x46\x65tchMessagesReadResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\x19\n\x07msg_lst\x18\x02 \x03(\x0b\x32\x08.Message\";\n\x1a\x46\x65tchMessagesUnreadRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x0b\n\x03num\x18\x02 \x01(\x05\"\\\n\x1b\x46\x65tchMessagesUnreadResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x19\n\x07msg_lst\x18\x03 \x03(\x0b\x32\x08.Message\"@\n\x14\x44\x65leteMessageRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x16\n\x0emessage_id_lst\x18\x02 \x03(\x05\"V\n\x15\x44\x65leteMessageResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x19\n\x07msg_lst\x18\x03 \x03(\x0b\x32\x08.Message\"Z\n\x12SendMessageRequest\x12\x0e\n\x06sender\x18\x01 \x01(\t\x12\x10\n\x08receiver\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x05\"*\n\x13SendMessageResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\")\n\x15ReceiveMessageRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"3\n\x16ReceiveMessageResponse\x12\x19\n\x07msg_lst\x18\x01 \x03(\x0b\x32\x08.Message\"n\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x10\n\x08receiver\x18\x03 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\x12\x11\n\tdelivered\x18\x06 \x01(\x08\"4\n\x07\x41\x63\x63ount\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x0b\n\x03\x62io\x18\x03 \x01(\t\"\x96\x04\n\x05\x45ntry\x12 \n\x06\x65nding\x18\x01 \x01(\x0b\x32\x0e.EndingRequestH\x00\x12+\n\nacc_exists\x18\x02 \x01(\x0b\x32\x15.AccountExistsRequestH\x00\x12+\n\ncreate_acc\x18\x03 \x01(\x0b\x32\x15.CreateAccountRequestH\x00\x12)\n\tlogin_acc\x18\x04 \x01(\x0b\x32\x14.LoginAccountRequestH\x00\x12+\n\ndelete_acc\x18\x05 \x01(\x0b\x32\x15.DeleteAccountRequestH\x00\x12/\n\x0e\x66\x65tch_homepage\x18\x06 \x01(\x0b\x32\x15.FetchHomepageRequestH\x00\x12\x33\n\x0c\x66\x65tch_unread\x18\x07 \x01(\x0b\x32\x1b.FetchMessagesUnreadRequestH\x00\x12/\n\nfetch_read\x18\x08 \x01(\x0b\x32\x19.FetchMessagesReadRequestH\x00\x12+\n\ndelete_msg\x18\t \x01(\x0b\x32\x15.DeleteMessageRequestH\x00\x12\'\n\x08send_msg\x18\n \x01(\x0b\x32\x13.SendMessageRequestH\x00\x12.\n\x0creceive_mesg\x18\x0b \x01(\x0b\x32\x16.ReceiveMessageRequestH\x00\x12\x11\n\x07\x63onnect\x18\x0c \x01(\tH\x00\x42\t\n\x07request\"^\n\x0bVoteRequest\x12\x0f\n\x07\x63\x61nd_id\x18\x01 \x01(\x05\x12\x11\n\tcand_term\x18\x02 \x01(\x05\x12\x14\n\x0cprev_log_idx\x18\x03 \x01(\x05\x12\x15\n\rprev_log_term\x18\x04 \x01(\x05\"-\n\x0cVoteResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\"\x8f\x01\n\x14\x41ppendEntriesRequest\x12\x13\n\x0bleader_addr\x18\x01 \x01(\t\x12\x0c\n\x04term\x18\x02 \x01(\x05\x12\x15\n\rprev_log_term\x18\x03 \x01(\x05\x12\x14\n\x0cprev_log_idx\x18\x04 \x01(\x05\x12\x17\n\x07\x65ntries\x18\x05 \x03(\x0b\x32\x06.Entry\x12\x0e\n\x06\x63ommit\x18\x06 \x01(\x05\"6\n\x15\x41ppendEntriesResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\"(\n\x11GetLeaderResponse\x12\x13\n\x0bleader_addr\x18\x01 \x01(\t2\x8b\x06\n\x07Handler\x12)\n\x06\x45nding\x12\x0e.EndingRequest\x1a\x0f.EndingResponse\x12\x43\n\x12\x43heckAccountExists\x12\x15.AccountExistsRequest\x1a\x16.AccountExistsResponse\x12>\n\rCreateAccount\x12\x15.CreateAccountRequest\x1a\x16.CreateAccountResponse\x12;\n\x0cLoginAccount\x12\x14.LoginAccountRequest\x1a\x15.LoginAccountResponse\x12\x38\n\x0bListAccount\x12\x13.ListAccountRequest\x1a\x14.ListAccountResponse\x12>\n\rDeleteAccount\x12\x15.DeleteAccountRequest\x1a\x16.DeleteAccountResponse\x12>\n\rFetchHomepage\x12\x15.FetchHomepageRequest\x1a\x16.FetchHomepageResponse\x12O\n\x12\x46\x65tchMessageUnread\x12\x1b.FetchMessagesUnreadRequest\x1a\x1c.FetchMessagesUnreadResponse\x12I\n\x10\x46\x65tchMessageRead\x12\x19.FetchMessagesReadRequest\x1a\x1a.FetchMessagesReadResponse\x12>\n\rDeleteMessage\x12\x15.DeleteMessageRequest\x1a\x16.DeleteMessageResponse\x12\x38\n\x0bSendMessage\x12\x13.SendMessageRequest\x1a\x14.SendMessageResponse\x12\x43\n\x0eReceiveMessage\x12\x16.ReceiveMessageRequest\x1a\x17.ReceiveMessageResponse0\x01\x32\xa4\x01\n\x04Raft\x12#\n\x04Vote\x12\x0c.VoteRequest\x1a\r.VoteResponse\x12>\n\rAppendEntries\x12\x15.AppendEntriesRequest\x1a\x16.AppendEntriesResponse\x12\x37\n\tGetLeader\x12\x16.google.protobuf.Empty\x1a\x12.GetLeaderResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rhandler.proto\x1a\x1bgoogle/protobuf/empty.proto\"\x07\n\x05\x45mpty\"8\n\x11NewLeaderResponse\x12\x15\n\rnew_leader_id\x18\x01 \x01(\x05\x12\x0c\n\x04role\x18\x02 \x01(\t\"@\n\x15\x63urrentLeaderResponse\x12\x19\n\x11\x63urrent_leader_id\x18\x01 \x01(\x05\x12\x0c\n\x04role\x18\x02 \x01(\t\"!\n\rEndingRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"%\n\x0e\x45ndingResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\"i\n\x14\x41\x63\x63ountExistsRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12%\n\x0b\x63onsistency\x18\x02 \x01(\x0e\x32\x10.ReadConsistency\x12\x18\n\x10max_staleness_ms\x18\x03 \x01(\x05\"<\n\x15\x41\x63\x63ountExistsResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\x0e\n\x06\x65xists\x18\x02 \x01(\x08\"G\n\x14\x43reateAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12\x0b\n\x03\x62io\x18\x03 \x01(\t\",\n\x15\x43reateAccountResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\"9\n\x13LoginAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"U\n\x14LoginAccountResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x19\n\x07msg_lst\x18\x03 \x03(\x0b\x32\x08.Message\"f\n\x12ListAccountRequest\x12\x0f\n\x07pattern\x18\x01 \x01(\t\x12%\n\x0b\x63onsistency\x18\x02 \x01(\x0e\x32\x10.ReadConsistency\x12\x18\n\x10max_staleness_ms\x18\x03 \x01(\x05\"F\n\x13ListAccountResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\x1a\n\x08\x61\x63\x63t_lst\x18\x02 \x03(\x0b\x32\x08.Account\":\n\x14\x44\x65leteAccountRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\",\n\x15\x44\x65leteAccountResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\"(\n\x14\x46\x65tchHomepageRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"V\n\x15\x46\x65tchHomepageResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x19\n\x07msg_lst\x18\x03 \x03(\x0b\x32\x08.Message\"z\n\x18\x46\x65tchMessagesReadRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x0b\n\x03num\x18\x02 \x01(\x05\x12%\n\x0b\x63onsistency\x18\x03 \x01(\x0e\x32\x10.ReadConsistency\x12\x18\n\x10max_staleness_ms\x18\x04 \x01(\x05\"K\n\x19\x46\x65tchMessagesReadResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\x19\n\x07msg_lst\x18\x02 \x03(\x0b\x32\x08.Message\";\n\x1a\x46\x65tchMessagesUnreadRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x0b\n\x03num\x18\x02 \x01(\x05\"\\\n\x1b\x46\x65tchMessagesUnreadResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x19\n\x07msg_lst\x18\x03 \x03(\x0b\x32\x08.Message\"@\n\x14\x44\x65leteMessageRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x16\n\x0emessage_id_lst\x18\x02 \x03(\x05\"V\n\x15\x44\x65leteMessageResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x19\n\x07msg_lst\x18\x03 \x03(\x0b\x32\x08.Message\"m\n\x12SendMessageRequest\x12\x0e\n\x06sender\x18\x01 \x01(\t\x12\x10\n\x08receiver\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x05\x12\x11\n\tdelivered\x18\x05 \x01(\x08\"*\n\x13SendMessageResponse\x12\x13\n\x0bstatus_code\x18\x01 \x01(\x05\")\n\x15ReceiveMessageRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"3\n\x16ReceiveMessageResponse\x12\x19\n\x07msg_lst\x18\x01 \x03(\x0b\x32\x08.Message\"n\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x10\n\x08receiver\x18\x03 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\x03\x12\x11\n\tdelivered\x18\x06 \x01(\x08\"4\n\x07\x41\x63\x63ount\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x0b\n\x03\x62io\x18\x03 \x01(\t\"\xa4\x04\n\x05\x45ntry\x12 \n\x06\x65nding\x18\x01 \x01(\x0b\x32\x0e.EndingRequestH\x00\x12+\n\nacc_exists\x18\x02 \x01(\x0b\x32\x15.AccountExistsRequestH\x00\x12+\n\ncreate_acc\x18\x03 \x01(\x0b\x32\x15.CreateAccountRequestH\x00\x12)\n\tlogin_acc\x18\x04 \x01(\x0b\x32\x14.LoginAccountRequestH\x00\x12+\n\ndelete_acc\x18\x05 \x01(\x0b\x32\x15.DeleteAccountRequestH\x00\x12/\n\x0e\x66\x65tch_homepage\x18\x06 \x01(\x0b\x32\x15.FetchHomepageRequestH\x00\x12\x33\n\x0c\x66\x65tch_unread\x18\x07 \x01(\x0b\x32\x1b.FetchMessagesUnreadRequestH\x00\x12/\n\nfetch_read\x18\x08 \x01(\x0b\x32\x19.FetchMessagesReadRequestH\x00\x12+\n\ndelete_msg\x18\t \x01(\x0b\x32\x15.DeleteMessageRequestH\x00\x12\'\n\x08send_msg\x18\n \x01(\x0b\x32\x13.SendMessageRequestH\x00\x12.\n\x0creceive_mesg\x18\x0b \x01(\x0b\x32\x16.ReceiveMessageRequestH\x00\x12\x11\n\x07\x63onnect\x18\x0c \x01(\tH\x00\x12\x0c\n\x04term\x18\r \x01(\x05\x42\t\n\x07request\"^\n\x0bVoteRequest\x12\x0f\n\x07\x63\x61nd_id\x18\x01 \x01(\x05\x12\x11\n\tcand_term\x18\x02 \x01(\x05\x12\x14\n\x0cprev_log_idx\x18\x03 \x01(\x05\x12\x15\n\rprev_log_term\x18\x04 \x01(\x05\"-\n\x0cVoteResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\"\x8f\x01\n\x14\x41ppendEntriesRequest\x12\x13\n\x0bleader_addr\x18\x01 \x01(\t\x12\x0c\n\x04term\x18\x02 \x01(\x05\x12\x15\n\rprev_log_term\x18\x03 \x01(\x05\x12\x14\n\x0cprev_log_idx\x18\x04 \x01(\x05\x12\x17\n\x07\x65ntries\x18\x05 \x03(\x0b\x32\x06.Entry\x12\x0e\n\x06\x63ommit\x18\x06 \x01(\x05\"v\n\x15\x41ppendEntriesResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x11\n\tmatch_idx\x18\x03 \x01(\x05\x12\x15\n\rconflict_term\x18\x04 \x01(\x05\x12\x14\n\x0c\x63onflict_idx\x18\x05 \x01(\x05\"\x8c\x01\n\x16InstallSnapshotRequest\x12\x13\n\x0bleader_addr\x18\x01 \x01(\t\x12\x0c\n\x04term\x18\x02 \x01(\x05\x12\x10\n\x08last_idx\x18\x03 \x01(\x05\x12\x11\n\tlast_term\x18\x04 \x01(\x05\x12\x0e\n\x06offset\x18\x05 \x01(\x03\x12\x0c\n\x04\x64\x61ta\x18\x06 \x01(\x0c\x12\x0c\n\x04\x64one\x18\x07 \x01(\x08\"8\n\x17InstallSnapshotResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\"(\n\x11GetLeaderResponse\x12\x13\n\x0bleader_addr\x18\x01 \x01(\t\"D\n\x11ReadIndexResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x10\n\x08read_idx\x18\x03 \x01(\x05*D\n\x0fReadConsistency\x12\n\n\x06LEADER\x10\x00\x12\x0e\n\nREAD_INDEX\x10\x01\x12\x15\n\x11\x42OUNDED_STALENESS\x10\x02\x32\xde\x06\n\x07Handler\x12(\n\x06Status\x12\x06.Empty\x1a\x16.currentLeaderResponse\x12)\n\x06\x45nding\x12\x0e.EndingRequest\x1a\x0f.EndingResponse\x12\'\n\tNewLeader\x12\x06.Empty\x1a\x12.NewLeaderResponse\x12\x43\n\x12\x43heckAccountExists\x12\x15.AccountExistsRequest\x1a\x16.AccountExistsResponse\x12>\n\rCreateAccount\x12\x15.CreateAccountRequest\x1a\x16.CreateAccountResponse\x12;\n\x0cLoginAccount\x12\x14.LoginAccountRequest\x1a\x15.LoginAccountResponse\x12\x38\n\x0bListAccount\x12\x13.ListAccountRequest\x1a\x14.ListAccountResponse\x12>\n\rDeleteAccount\x12\x15.DeleteAccountRequest\x1a\x16.DeleteAccountResponse\x12>\n\rFetchHomepage\x12\x15.FetchHomepageRequest\x1a\x16.FetchHomepageResponse\x12O\n\x12\x46\x65tchMessageUnread\x12\x1b.FetchMessagesUnreadRequest\x1a\x1c.FetchMessagesUnreadResponse\x12I\n\x10\x46\x65tchMessageRead\x12\x19.FetchMessagesReadRequest\x1a\x1a.FetchMessagesReadResponse\x12>\n\rDeleteMessage\x12\x15.DeleteMessageRequest\x1a\x16.DeleteMessageResponse\x12\x38\n\x0bSendMessage\x12\x13.SendMessageRequest\x1a\x14.SendMessageResponse\x12\x43\n\x0eReceiveMessage\x12\x16.ReceiveMessageRequest\x1a\x17.ReceiveMessageResponse0\x01\x32\xcd\x02\n\x04Raft\x12#\n\x04Vote\x12\x0c.VoteRequest\x1a\r.VoteResponse\x12&\n\x07PreVote\x12\x0c.VoteRequest\x1a\r.VoteResponse\x12>\n\rAppendEntries\x12\x15.AppendEntriesRequest\x1a\x16.AppendEntriesResponse\x12\x37\n\tGetLeader\x12\x16.google.protobuf.Empty\x1a\x12.GetLeaderResponse\x12\x46\n\x0fInstallSnapshot\x12\x17.InstallSnapshotRequest\x1a\x18.InstallSnapshotResponse(\x01\x12\x37\n\tReadIndex\x12\x16.google.protobuf.Empty\x1a\x12.ReadIndexResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'handler_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_ENDINGREQUEST']._serialized_start=46
-  _globals['_ENDINGREQUEST']._serialized_end=79
-  _globals['_ENDINGRESPONSE']._serialized_start=81
-  _globals['_ENDINGRESPONSE']._serialized_end=118
-  _globals['_ACCOUNTEXISTSREQUEST']._serialized_start=120
-  _globals['_ACCOUNTEXISTSREQUEST']._serialized_end=160
-  _globals['_ACCOUNTEXISTSRESPONSE']._serialized_start=162
-  _globals['_ACCOUNTEXISTSRESPONSE']._serialized_end=222
-  _globals['_CREATEACCOUNTREQUEST']._serialized_start=224
-  _globals['_CREATEACCOUNTREQUEST']._serialized_end=295
-  _globals['_CREATEACCOUNTRESPONSE']._serialized_start=297
-  _globals['_CREATEACCOUNTRESPONSE']._serialized_end=341
-  _globals['_LOGINACCOUNTREQUEST']._serialized_start=343
-  _globals['_LOGINACCOUNTREQUEST']._serialized_end=400
-  _globals['_LOGINACCOUNTRESPONSE']._serialized_start=402
-  _globals['_LOGINACCOUNTRESPONSE']._serialized_end=487
-  _globals['_LISTACCOUNTREQUEST']._serialized_start=489
-  _globals['_LISTACCOUNTREQUEST']._serialized_end=526
-  _globals['_LISTACCOUNTRESPONSE']._serialized_start=528
-  _globals['_LISTACCOUNTRESPONSE']._serialized_end=598
-  _globals['_DELETEACCOUNTREQUEST']._serialized_start=600
-  _globals['_DELETEACCOUNTREQUEST']._serialized_end=658
-  _globals['_DELETEACCOUNTRESPONSE']._serialized_start=660
-  _globals['_DELETEACCOUNTRESPONSE']._serialized_end=704
-  _globals['_FETCHHOMEPAGEREQUEST']._serialized_start=706
-  _globals['_FETCHHOMEPAGEREQUEST']._serialized_end=746
-  _globals['_FETCHHOMEPAGERESPONSE']._serialized_start=748
-  _globals['_FETCHHOMEPAGERESPONSE']._serialized_end=834
-  _globals['_FETCHMESSAGESREADREQUEST']._serialized_start=836
-  _globals['_FETCHMESSAGESREADREQUEST']._serialized_end=893
-  _globals['_FETCHMESSAGESREADRESPONSE']._serialized_start=895
-  _globals['_FETCHMESSAGESREADRESPONSE']._serialized_end=970
-  _globals['_FETCHMESSAGESUNREADREQUEST']._serialized_start=972
-  _globals['_FETCHMESSAGESUNREADREQUEST']._serialized_end=1031
-  _globals['_FETCHMESSAGESUNREADRESPONSE']._serialized_start=1033
-  _globals['_FETCHMESSAGESUNREADRESPONSE']._serialized_end=1125
-  _globals['_DELETEMESSAGEREQUEST']._serialized_start=1127
-  _globals['_DELETEMESSAGEREQUEST']._serialized_end=1191
-  _globals['_DELETEMESSAGERESPONSE']._serialized_start=1193
-  _globals['_DELETEMESSAGERESPONSE']._serialized_end=1279
-  _globals['_SENDMESSAGEREQUEST']._serialized_start=1281
-  _globals['_SENDMESSAGEREQUEST']._serialized_end=1371
-  _globals['_SENDMESSAGERESPONSE']._serialized_start=1373
-  _globals['_SENDMESSAGERESPONSE']._serialized_end=1415
-  _globals['_RECEIVEMESSAGEREQUEST']._serialized_start=1417
-  _globals['_RECEIVEMESSAGEREQUEST']._serialized_end=1458
-  _globals['_RECEIVEMESSAGERESPONSE']._serialized_start=1460
-  _globals['_RECEIVEMESSAGERESPONSE']._serialized_end=1511
-  _globals['_MESSAGE']._serialized_start=1513
-  _globals['_MESSAGE']._serialized_end=1623
-  _globals['_ACCOUNT']._serialized_start=1625
-  _globals['_ACCOUNT']._serialized_end=1677
-  _globals['_ENTRY']._serialized_start=1680
-  _globals['_ENTRY']._serialized_end=2214
-  _globals['_VOTEREQUEST']._serialized_start=2216
-  _globals['_VOTEREQUEST']._serialized_end=2310
-  _globals['_VOTERESPONSE']._serialized_start=2312
-  _globals['_VOTERESPONSE']._serialized_end=2357
-  _globals['_APPENDENTRIESREQUEST']._serialized_start=2360
-  _globals['_APPENDENTRIESREQUEST']._serialized_end=2503
-  _globals['_APPENDENTRIESRESPONSE']._serialized_start=2505
-  _globals['_APPENDENTRIESRESPONSE']._serialized_end=2559
-  _globals['_GETLEADERRESPONSE']._serialized_start=2561
-  _globals['_GETLEADERRESPONSE']._serialized_end=2601
-  _globals['_HANDLER']._serialized_start=2604
-  _globals['_HANDLER']._serialized_end=3383
-  _globals['_RAFT']._serialized_start=3386
-  _globals['_RAFT']._serialized_end=3550
+  _globals['_READCONSISTENCY']._serialized_start=3299
+  _globals['_READCONSISTENCY']._serialized_end=3367
+  _globals['_EMPTY']._serialized_start=46
+  _globals['_EMPTY']._serialized_end=53
+  _globals['_NEWLEADERRESPONSE']._serialized_start=55
+  _globals['_NEWLEADERRESPONSE']._serialized_end=111
+  _globals['_CURRENTLEADERRESPONSE']._serialized_start=113
+  _globals['_CURRENTLEADERRESPONSE']._serialized_end=177
+  _globals['_ENDINGREQUEST']._serialized_start=179
+  _globals['_ENDINGREQUEST']._serialized_end=212
+  _globals['_ENDINGRESPONSE']._serialized_start=214
+  _globals['_ENDINGRESPONSE']._serialized_end=251
+  _globals['_ACCOUNTEXISTSREQUEST']._serialized_start=253
+  _globals['_ACCOUNTEXISTSREQUEST']._serialized_end=358
+  _globals['_ACCOUNTEXISTSRESPONSE']._serialized_start=360
+  _globals['_ACCOUNTEXISTSRESPONSE']._serialized_end=420
+  _globals['_CREATEACCOUNTREQUEST']._serialized_start=422
+  _globals['_CREATEACCOUNTREQUEST']._serialized_end=493
+  _globals['_CREATEACCOUNTRESPONSE']._serialized_start=495
+  _globals['_CREATEACCOUNTRESPONSE']._serialized_end=539
+  _globals['_LOGINACCOUNTREQUEST']._serialized_start=541
+  _globals['_LOGINACCOUNTREQUEST']._serialized_end=598
+  _globals['_LOGINACCOUNTRESPONSE']._serialized_start=600
+  _globals['_LOGINACCOUNTRESPONSE']._serialized_end=685
+  _globals['_LISTACCOUNTREQUEST']._serialized_start=687
+  _globals['_LISTACCOUNTREQUEST']._serialized_end=789
+  _globals['_LISTACCOUNTRESPONSE']._serialized_start=791
+  _globals['_LISTACCOUNTRESPONSE']._serialized_end=861
+  _globals['_DELETEACCOUNTREQUEST']._serialized_start=863
+  _globals['_DELETEACCOUNTREQUEST']._serialized_end=921
+  _globals['_DELETEACCOUNTRESPONSE']._serialized_start=923
+  _globals['_DELETEACCOUNTRESPONSE']._serialized_end=967
+  _globals['_FETCHHOMEPAGEREQUEST']._serialized_start=969
+  _globals['_FETCHHOMEPAGEREQUEST']._serialized_end=1009
+  _globals['_FETCHHOMEPAGERESPONSE']._serialized_start=1011
+  _globals['_FETCHHOMEPAGERESPONSE']._serialized_end=1097
+  _globals['_FETCHMESSAGESREADREQUEST']._serialized_start=1099
+  _globals['_FETCHMESSAGESREADREQUEST']._serialized_end=1221
+  _globals['_FETCHMESSAGESREADRESPONSE']._serialized_start=1223
+  _globals['_FETCHMESSAGESREADRESPONSE']._serialized_end=1298
+  _globals['_FETCHMESSAGESUNREADREQUEST']._serialized_start=1300
+  _globals['_FETCHMESSAGESUNREADREQUEST']._serialized_end=1359
+  _globals['_FETCHMESSAGESUNREADRESPONSE']._serialized_start=1361
+  _globals['_FETCHMESSAGESUNREADRESPONSE']._serialized_end=1453
+  _globals['_DELETEMESSAGEREQUEST']._serialized_start=1455
+  _globals['_DELETEMESSAGEREQUEST']._serialized_end=1519
+  _globals['_DELETEMESSAGERESPONSE']._serialized_start=1521
+  _globals['_DELETEMESSAGERESPONSE']._serialized_end=1607
+  _globals['_SENDMESSAGEREQUEST']._serialized_start=1609
+  _globals['_SENDMESSAGEREQUEST']._serialized_end=1718
+  _globals['_SENDMESSAGERESPONSE']._serialized_start=1720
+  _globals['_SENDMESSAGERESPONSE']._serialized_end=1762
+  _globals['_RECEIVEMESSAGEREQUEST']._serialized_start=1764
+  _globals['_RECEIVEMESSAGEREQUEST']._serialized_end=1805
+  _globals['_RECEIVEMESSAGERESPONSE']._serialized_start=1807
+  _globals['_RECEIVEMESSAGERESPONSE']._serialized_end=1858
+  _globals['_MESSAGE']._serialized_start=1860
+  _globals['_MESSAGE']._serialized_end=1970
+  _globals['_ACCOUNT']._serialized_start=1972
+  _globals['_ACCOUNT']._serialized_end=2024
+  _globals['_ENTRY']._serialized_start=2027
+  _globals['_ENTRY']._serialized_end=2575
+  _globals['_VOTEREQUEST']._serialized_start=2577
+  _globals['_VOTEREQUEST']._serialized_end=2671
+  _globals['_VOTERESPONSE']._serialized_start=2673
+  _globals['_VOTERESPONSE']._serialized_end=2718
+  _globals['_APPENDENTRIESREQUEST']._serialized_start=2721
+  _globals['_APPENDENTRIESREQUEST']._serialized_end=2864
+  _globals['_APPENDENTRIESRESPONSE']._serialized_start=2866
+  _globals['_APPENDENTRIESRESPONSE']._serialized_end=2984
+  _globals['_INSTALLSNAPSHOTREQUEST']._serialized_start=2987
+  _globals['_INSTALLSNAPSHOTREQUEST']._serialized_end=3127
+  _globals['_INSTALLSNAPSHOTRESPONSE']._serialized_start=3129
+  _globals['_INSTALLSNAPSHOTRESPONSE']._serialized_end=3185
+  _globals['_GETLEADERRESPONSE']._serialized_start=3187
+  _globals['_GETLEADERRESPONSE']._serialized_end=3227
+  _globals['_READINDEXRESPONSE']._serialized_start=3229
+  _globals['_READINDEXRESPONSE']._serialized_end=3297
+  _globals['_HANDLER']._serialized_start=3370
+  _globals['_HANDLER']._serialized_end=4232
+  _globals['_RAFT']._serialized_start=4235
+  _globals['_RAFT']._serialized_end=4568
 # @@protoc_insertion_point(module_scope)
@@ -1,11 +1,41 @@
 from google.protobuf import empty_pb2 as _empty_pb2
 from google.protobuf.internal import containers as _containers
+from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
 from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
+class ReadConsistency(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = ()
+    LEADER: _ClassVar[ReadConsistency]
+    READ_INDEX: _ClassVar[ReadConsistency]
+    BOUNDED_STALENESS: _ClassVar[ReadConsistency]
+LEADER: ReadConsistency
+READ_INDEX: ReadConsistency
+BOUNDED_STALENESS: ReadConsistency
+
+class Empty(_message.Message):
+    __slots__ = ()
+    def __init__(self) -> None: ...
+
+class NewLeaderResponse(_message.Message):
+    __slots__ = ("new_leader_id", "role")
+    NEW_LEADER_ID_FIELD_NUMBER: _ClassVar[int]
+    ROLE_FIELD_NUMBER: _ClassVar[int]
+    new_leader_id: int
+    role: str
+    def __init__(self, new_leader_id: _Optional[int] = ..., role: _Optional[str] = ...) -> None: ...
+
+class currentLeaderResponse(_message.Message):
+    __slots__ = ("current_leader_id", "role")
+    CURRENT_LEADER_ID_FIELD_NUMBER: _ClassVar[int]
+    ROLE_FIELD_NUMBER: _ClassVar[int]
+    current_leader_id: int
+    role: str
+    def __init__(self, current_leader_id: _Optional[int] = ..., role: _Optional[str] = ...) -> None: ...
+
 class EndingRequest(_message.Message):
     __slots__ = ("username",)
     USERNAME_FIELD_NUMBER: _ClassVar[int]
@@ -19,10 +49,14 @@ class EndingResponse(_message.Message):
     def __init__(self, status_code: _Optional[int] = ...) -> None: ...
 
 class AccountExistsRequest(_message.Message):
-    __slots__ = ("username",)
+    __slots__ = ("username", "consistency", "max_staleness_ms")
     USERNAME_FIELD_NUMBER: _ClassVar[int]
+    CONSISTENCY_FIELD_NUMBER: _ClassVar[int]
+    MAX_STALENESS_MS_FIELD_NUMBER: _ClassVar[int]
     username: str
-    def __init__(self, username: _Optional[str] = ...) -> None: ...
+    consistency: ReadConsistency
+    max_staleness_ms: int
+    def __init__(self, username: _Optional[str] = ..., consistency: _Optional[_Union[ReadConsistency, str]] = ..., max_staleness_ms: _Optional[int] = ...) -> None: ...
 
 class AccountExistsResponse(_message.Message):
     __slots__ = ("status_code", "exists")
@@ -67,10 +101,14 @@ class LoginAccountResponse(_message.Message):
     def __init__(self, status_code: _Optional[int] = ..., count: _Optional[int] = ..., msg_lst: _Optional[_Iterable[_Union[Message, _Mapping]]] = ...) -> None: ...
 
 class ListAccountRequest(_message.Message):
-    __slots__ = ("pattern",)
+    __slots__ = ("pattern", "consistency", "max_staleness_ms")
     PATTERN_FIELD_NUMBER: _ClassVar[int]
+    CONSISTENCY_FIELD_NUMBER: _ClassVar[int]
+    MAX_STALENESS_MS_FIELD_NUMBER: _ClassVar[int]
     pattern: str
-    def __init__(self, pattern: _Optional[str] = ...) -> None: ...
+    consistency: ReadConsistency
+    max_staleness_ms: int
+    def __init__(self, pattern: _Optional[str] = ..., consistency: _Optional[_Union[ReadConsistency, str]] = ..., max_staleness_ms: _Optional[int] = ...) -> None: ...
 
 class ListAccountResponse(_message.Message):
     __slots__ = ("status_code", "acct_lst")
@@ -111,12 +149,16 @@ class FetchHomepageResponse(_message.Message):
     def __init__(self, status_code: _Optional[int] = ..., count: _Optional[int] = ..., msg_lst: _Optional[_Iterable[_Union[Message, _Mapping]]] = ...) -> None: ...
 
 class FetchMessagesReadRequest(_message.Message):
-    __slots__ = ("username", "num")
+    __slots__ = ("username", "num", "consistency", "max_staleness_ms")
     USERNAME_FIELD_NUMBER: _ClassVar[int]
     NUM_FIELD_NUMBER: _ClassVar[int]
+    CONSISTENCY_FIELD_NUMBER: _ClassVar[int]
+    MAX_STALENESS_MS_FIELD_NUMBER: _ClassVar[int]
     username: str
     num: int
-    def __init__(self, username: _Optional[str] = ..., num: _Optional[int] = ...) -> None: ...
+    consistency: ReadConsistency
+    max_staleness_ms: int
+    def __init__(self, username: _Optional[str] = ..., num: _Optional[int] = ..., consistency: _Optional[_Union[ReadConsistency, str]] = ..., max_staleness_ms: _Optional[int] = ...) -> None: ...
 
 class FetchMessagesReadResponse(_message.Message):
     __slots__ = ("status_code", "msg_lst")
@@ -163,16 +205,18 @@ class DeleteMessageResponse(_message.Message):
     def __init__(self, status_code: _Optional[int] = ..., count: _Optional[int] = ..., msg_lst: _Optional[_Iterable[_Union[Message, _Mapping]]] = ...) -> None: ...
 
 class SendMessageRequest(_message.Message):
-    __slots__ = ("sender", "receiver", "content", "timestamp")
+    __slots__ = ("sender", "receiver", "content", "timestamp", "delivered")
     SENDER_FIELD_NUMBER: _ClassVar[int]
     RECEIVER_FIELD_NUMBER: _ClassVar[int]
     CONTENT_FIELD_NUMBER: _ClassVar[int]
     TIMESTAMP_FIELD_NUMBER: _ClassVar[int]
+    DELIVERED_FIELD_NUMBER: _ClassVar[int]
     sender: str
     receiver: str
     content: str
     timestamp: int
-    def __init__(self, sender: _Optional[str] = ..., receiver: _Optional[str] = ..., content: _Optional[str] = ..., timestamp: _Optional[int] = ...) -> None: ...
+    delivered: bool
+    def __init__(self, sender: _Optional[str] = ..., receiver: _Optional[str] = ..., content: _Optional[str] = ..., timestamp: _Optional[int] = ..., delivered: bool = ...) -> None: ...
 
 class SendMessageResponse(_message.Message):
     __slots__ = ("status_code",)
@@ -219,7 +263,7 @@ class Account(_message.Message):
     def __init__(self, id: _Optional[int] = ..., username: _Optional[str] = ..., bio: _Optional[str] = ...) -> None: ...
 
 class Entry(_message.Message):
-    __slots__ = ("ending", "acc_exists", "create_acc", "login_acc", "delete_acc", "fetch_homepage", "fetch_unread", "fetch_read", "delete_msg", "send_msg", "receive_mesg", "connect")
+    __slots__ = ("ending", "acc_exists", "create_acc", "login_acc", "delete_acc", "fetch_homepage", "fetch_unread", "fetch_read", "delete_msg", "send_msg", "receive_mesg", "connect", "term")
     ENDING_FIELD_NUMBER: _ClassVar[int]
     ACC_EXISTS_FIELD_NUMBER: _ClassVar[int]
     CREATE_ACC_FIELD_NUMBER: _ClassVar[int]
@@ -232,6 +276,7 @@ class Entry(_message.Message):
     SEND_MSG_FIELD_NUMBER: _ClassVar[int]
     RECEIVE_MESG_FIELD_NUMBER: _ClassVar[int]
     CONNECT_FIELD_NUMBER: _ClassVar[int]
+    TERM_FIELD_NUMBER: _ClassVar[int]
     ending: EndingRequest
     acc_exists: AccountExistsRequest
     create_acc: CreateAccountRequest
@@ -244,7 +289,8 @@ class Entry(_message.Message):
     send_msg: SendMessageRequest
     receive_mesg: ReceiveMessageRequest
     connect: str
-    def __init__(self, ending: _Optional[_Union[EndingRequest, _Mapping]] = ..., acc_exists: _Optional[_Union[AccountExistsRequest, _Mapping]] = ..., create_acc: _Optional[_Union[CreateAccountRequest, _Mapping]] = ..., login_acc: _Optional[_Union[LoginAccountRequest, _Mapping]] = ..., delete_acc: _Optional[_Union[DeleteAccountRequest, _Mapping]] = ..., fetch_homepage: _Optional[_Union[FetchHomepageRequest, _Mapping]] = ..., fetch_unread: _Optional[_Union[FetchMessagesUnreadRequest, _Mapping]] = ..., fetch_read: _Optional[_Union[FetchMessagesReadRequest, _Mapping]] = ..., delete_msg: _Optional[_Union[DeleteMessageRequest, _Mapping]] = ..., send_msg: _Optional[_Union[SendMessageRequest, _Mapping]] = ..., receive_mesg: _Optional[_Union[ReceiveMessageRequest, _Mapping]] = ..., connect: _Optional[str] = ...) -> None: ...
+    term: int
+    def __init__(self, ending: _Optional[_Union[EndingRequest, _Mapping]] = ..., acc_exists: _Optional[_Union[AccountExistsRequest, _Mapping]] = ..., create_acc: _Optional[_Union[CreateAccountRequest, _Mapping]] = ..., login_acc: _Optional[_Union[LoginAccountRequest, _Mapping]] = ..., delete_acc: _Optional[_Union[DeleteAccountRequest, _Mapping]] = ..., fetch_homepage: _Optional[_Union[FetchHomepageRequest, _Mapping]] = ..., fetch_unread: _Optional[_Union[FetchMessagesUnreadRequest, _Mapping]] = ..., fetch_read: _Optional[_Union[FetchMessagesReadRequest, _Mapping]] = ..., delete_msg: _Optional[_Union[DeleteMessageRequest, _Mapping]] = ..., send_msg: _Optional[_Union[SendMessageRequest, _Mapping]] = ..., receive_mesg: _Optional[_Union[ReceiveMessageRequest, _Mapping]] = ..., connect: _Optional[str] = ..., term: _Optional[int] = ...) -> None: ...
 
 class VoteRequest(_message.Message):
     __slots__ = ("cand_id", "cand_term", "prev_log_idx", "prev_log_term")
@@ -283,6 +329,38 @@ class AppendEntriesRequest(_message.Message):
     def __init__(self, leader_addr: _Optional[str] = ..., term: _Optional[int] = ..., prev_log_term: _Optional[int] = ..., prev_log_idx: _Optional[int] = ..., entries: _Optional[_Iterable[_Union[Entry, _Mapping]]] = ..., commit: _Optional[int] = ...) -> None: ...
 
 class AppendEntriesResponse(_message.Message):
+    __slots__ = ("term", "success", "match_idx", "conflict_term", "conflict_idx")
+    TERM_FIELD_NUMBER: _ClassVar[int]
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    MATCH_IDX_FIELD_NUMBER: _ClassVar[int]
+    CONFLICT_TERM_FIELD_NUMBER: _ClassVar[int]
+    CONFLICT_IDX_FIELD_NUMBER: _ClassVar[int]
+    term: int
+    success: bool
+    match_idx: int
+    conflict_term: int
+    conflict_idx: int
+    def __init__(self, term: _Optional[int] = ..., success: bool = ..., match_idx: _Optional[int] = ..., conflict_term: _Optional[int] = ..., conflict_idx: _Optional[int] = ...) -> None: ...
+
+class InstallSnapshotRequest(_message.Message):
+    __slots__ = ("leader_addr", "term", "last_idx", "last_term", "offset", "data", "done")
+    LEADER_ADDR_FIELD_NUMBER: _ClassVar[int]
+    TERM_FIELD_NUMBER: _ClassVar[int]
+    LAST_IDX_FIELD_NUMBER: _ClassVar[int]
+    LAST_TERM_FIELD_NUMBER: _ClassVar[int]
+    OFFSET_FIELD_NUMBER: _ClassVar[int]
+    DATA_FIELD_NUMBER: _ClassVar[int]
+    DONE_FIELD_NUMBER: _ClassVar[int]
+    leader_addr: str
+    term: int
+    last_idx: int
+    last_term: int
+    offset: int
+    data: bytes
+    done: bool
+    def __init__(self, leader_addr: _Optional[str] = ..., term: _Optional[int] = ..., last_idx: _Optional[int] = ..., last_term: _Optional[int] = ..., offset: _Optional[int] = ..., data: _Optional[bytes] = ..., done: bool = ...) -> None: ...
+
+class InstallSnapshotResponse(_message.Message):
     __slots__ = ("term", "success")
     TERM_FIELD_NUMBER: _ClassVar[int]
     SUCCESS_FIELD_NUMBER: _ClassVar[int]
@@ -295,3 +373,13 @@ class GetLeaderResponse(_message.Message):
     LEADER_ADDR_FIELD_NUMBER: _ClassVar[int]
     leader_addr: str
     def __init__(self, leader_addr: _Optional[str] = ...) -> None: ...
+
+class ReadIndexResponse(_message.Message):
+    __slots__ = ("term", "success", "read_idx")
+    TERM_FIELD_NUMBER: _ClassVar[int]
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    READ_IDX_FIELD_NUMBER: _ClassVar[int]
+    term: int
+    success: bool
+    read_idx: int
+    def __init__(self, term: _Optional[int] = ..., success: bool = ..., read_idx: _Optional[int] = ...) -> None: ...
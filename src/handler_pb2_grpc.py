@@ -675,6 +675,11 @@ class RaftStub(object):
                 request_serializer=handler__pb2.VoteRequest.SerializeToString,
                 response_deserializer=handler__pb2.VoteResponse.FromString,
                 _registered_method=True)
+        self.PreVote = channel.unary_unary(
+                '/Raft/PreVote',
+                request_serializer=handler__pb2.VoteRequest.SerializeToString,
+                response_deserializer=handler__pb2.VoteResponse.FromString,
+                _registered_method=True)
         self.AppendEntries = channel.unary_unary(
                 '/Raft/AppendEntries',
                 request_serializer=handler__pb2.AppendEntriesRequest.SerializeToString,
@@ -685,6 +690,16 @@ class RaftStub(object):
                 request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
                 response_deserializer=handler__pb2.GetLeaderResponse.FromString,
                 _registered_method=True)
+        self.InstallSnapshot = channel.stream_unary(
+                '/Raft/InstallSnapshot',
+                request_serializer=handler__pb2.InstallSnapshotRequest.SerializeToString,
+                response_deserializer=handler__pb2.InstallSnapshotResponse.FromString,
+                _registered_method=True)
+        self.ReadIndex = channel.unary_unary(
+                '/Raft/ReadIndex',
+                request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+                response_deserializer=handler__pb2.ReadIndexResponse.FromString,
+                _registered_method=True)
 
 
 class RaftServicer(object):
@@ -697,6 +712,13 @@ class RaftServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def PreVote(self, request, context):
+        """Would the peer vote for cand_term (the candidate's term + 1)? Changes no state
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def AppendEntries(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -709,6 +731,18 @@ class RaftServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def InstallSnapshot(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReadIndex(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RaftServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -717,6 +751,11 @@ def add_RaftServicer_to_server(servicer, server):
                     request_deserializer=handler__pb2.VoteRequest.FromString,
                     response_serializer=handler__pb2.VoteResponse.SerializeToString,
             ),
+            'PreVote': grpc.unary_unary_rpc_method_handler(
+                    servicer.PreVote,
+                    request_deserializer=handler__pb2.VoteRequest.FromString,
+                    response_serializer=handler__pb2.VoteResponse.SerializeToString,
+            ),
             'AppendEntries': grpc.unary_unary_rpc_method_handler(
                     servicer.AppendEntries,
                     request_deserializer=handler__pb2.AppendEntriesRequest.FromString,
@@ -727,6 +766,16 @@ def add_RaftServicer_to_server(servicer, server):
                     request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
                     response_serializer=handler__pb2.GetLeaderResponse.SerializeToString,
             ),
+            'InstallSnapshot': grpc.stream_unary_rpc_method_handler(
+                    servicer.InstallSnapshot,
+                    request_deserializer=handler__pb2.InstallSnapshotRequest.FromString,
+                    response_serializer=handler__pb2.InstallSnapshotResponse.SerializeToString,
+            ),
+            'ReadIndex': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReadIndex,
+                    request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+                    response_serializer=handler__pb2.ReadIndexResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'Raft', rpc_method_handlers)
@@ -766,6 +815,33 @@ class Raft(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def PreVote(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/Raft/PreVote',
+            handler__pb2.VoteRequest.SerializeToString,
+            handler__pb2.VoteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def AppendEntries(request,
             target,
@@ -819,3 +895,57 @@ class Raft(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def InstallSnapshot(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/Raft/InstallSnapshot',
+            handler__pb2.InstallSnapshotRequest.SerializeToString,
+            handler__pb2.InstallSnapshotResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReadIndex(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/Raft/ReadIndex',
+            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            handler__pb2.ReadIndexResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
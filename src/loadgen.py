@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Headless load generator: simulates many concurrent chat users against a running server.
+
+Each user creates an account, logs in and holds its connection open to receive pushed messages: the socket protocols
+push on the login connection, gRPC users hold a ReceiveMessage stream. During the run every user sends messages to
+random online users at --rate messages/sec and reads its history at --read-rate reads/sec. Message content carries the
+send time, so receivers measure send-to-push delivery latency.
+
+Reports latency distributions (ms) for login, send (request to response), history reads and delivery, throughput, and
+how many sent messages were pushed before the end of the run (the rest were stored for a later read, e.g. because the
+receiver's connection fell behind).
+
+Usage (from src/, against a running server):
+    python loadgen.py --protocol json --port 65432 --users 1000 --rate 0.5 --duration 30
+    python loadgen.py --protocol grpc --port 65432 --users 200 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import resource
+import time
+import uuid
+import grpc
+import yaml
+import client_handler
+import handler_pb2
+import handler_pb2_grpc
+import tls
+from bench_tls import summarize
+from utils import OpCode, ResponseCode
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+# Defaults
+DEFAULT_HOST = config.get("host", "127.0.0.1")
+DEFAULT_PORT = config.get("port", 65432)
+PASSWORD = "loadgen-password"
+MARKER = "lg:" # Prefix of generated message content, followed by the send time
+
+PROTOCOLS = {"json": 0, "custom": 1, "grpc": None}
+
+class Stats:
+    """ Latency samples (seconds) and counters shared by every simulated user.
+
+    Methods:
+    - record(self, name, seconds): Add a latency sample.
+    - report(self, elapsed): Return {latency name: summary, "counts": {...}, "throughput": {...}}.
+    """
+    def __init__(self):
+        self.samples = {"login": [], "send": [], "read": [], "delivery": []}
+        self.counts = {"sent": 0, "delivered": 0, "reads": 0, "errors": 0}
+
+    def record(self, name, seconds):
+        self.samples[name].append(seconds)
+
+    def delivered(self, content, now):
+        """Count a pushed message, recording its delivery latency if it was sent by this run."""
+        if content.startswith(MARKER):
+            self.counts["delivered"] += 1
+            self.record("delivery", now - float(content[len(MARKER):].split(" ", 1)[0]))
+
+    def report(self, elapsed):
+        report = {name: summarize(s) for name, s in self.samples.items() if s}
+        report["counts"] = dict(self.counts)
+        report["throughput"] = {"sent_per_sec": self.counts["sent"] / elapsed,
+                                "delivered_per_sec": self.counts["delivered"] / elapsed}
+        return report
+
+def message_content(size):
+    """Message content carrying the current time, padded to size characters."""
+    stamp = f"{MARKER}{time.time():.6f} "
+    return stamp + "x" * max(0, size - len(stamp))
+
+class _StreamStub:
+    """Mixin for client_handler stubs driven by an asyncio stream: server pings are answered on the stream writer."""
+    writer = None
+
+    def _pong(self):
+        self.writer.write(self._package_request({"content_encoding": "utf-8", "content": {"args": []}, "opcode": OpCode.PING.value}))
+
+class StreamMessage(_StreamStub, client_handler.Message):
+    pass
+
+class StreamMessageCustom(_StreamStub, client_handler.MessageCustom):
+    pass
+
+class SocketUser:
+    """ A simulated user on server.py / server_async.py, framing requests with the client_handler stubs.
+
+    One reader task routes frames from the connection: pushed messages are counted as deliveries and every other
+    response resolves the pending request (users send one request at a time, like the GUI).
+
+    Methods:
+    - connect(self): Open the connection and start the reader.
+    - call(self, opcode, args): Send a request and wait for its response.
+    - close(self): Close the connection.
+    """
+    def __init__(self, name, host, port, protocol, stats):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.stub = (StreamMessage if protocol == 0 else StreamMessageCustom)(None, None, (host, port), None, self)
+        self._pending = None
+        self._lock = asyncio.Lock()
+        self._reader_task = None
+
+    async def connect(self):
+        reader, self.stub.writer = await asyncio.open_connection(self.host, self.port)
+        self._reader_task = asyncio.create_task(self._read(reader))
+
+    async def _read(self, reader):
+        while data := await reader.read(65536):
+            self.stub._recv_buffer += data
+            self.stub._drain_frames()
+        if self._pending is not None and not self._pending.done():
+            self._pending.set_exception(ConnectionError("Server closed the connection"))
+
+    def put(self, response):
+        """Called by the stub for every decoded response (the stub's incoming queue)."""
+        if response["opcode"] == OpCode.RECEIVE_MSG.value:
+            now = time.time()
+            for msg in response["data"] or []:
+                self.stats.delivered(msg[3], now)
+        elif self._pending is not None and not self._pending.done():
+            self._pending.set_result(response)
+
+    async def call(self, opcode, args):
+        async with self._lock:
+            self._pending = asyncio.get_running_loop().create_future()
+            self.stub.writer.write(self.stub._package_request({"content_encoding": "utf-8", "content": {"args": args}, "opcode": opcode.value}))
+            response = await self._pending
+            return response["status_code"]
+
+    async def create(self):
+        return await self.call(OpCode.CREATE_ACCOUNT, [self.name, PASSWORD, ""])
+
+    async def login(self):
+        return await self.call(OpCode.LOGIN_ACCOUNT, [self.name, PASSWORD])
+
+    async def send(self, receiver, content):
+        return await self.call(OpCode.SEND_MSG, [self.name, receiver, content])
+
+    async def read_history(self, n):
+        return await self.call(OpCode.READ_MSG_DELIVERED, [self.name, n])
+
+    async def close(self):
+        if self.stub.writer is not None:
+            self.stub.writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+class GrpcUser:
+    """ A simulated user on server_grpc.py: unary calls on a shared channel, plus a ReceiveMessage stream after login.
+
+    Methods:
+    - connect(self): No-op, channels are shared and connect lazily.
+    - close(self): Cancel the ReceiveMessage stream.
+    """
+    def __init__(self, name, channel, stats):
+        self.name = name
+        self.stub = handler_pb2_grpc.HandlerStub(channel)
+        self.stats = stats
+        self._stream = None
+        self._stream_task = None
+
+    async def connect(self):
+        pass
+
+    async def create(self):
+        return (await self.stub.CreateAccount(handler_pb2.CreateAccountRequest(username=self.name, password=PASSWORD))).status_code
+
+    async def login(self):
+        status = (await self.stub.LoginAccount(handler_pb2.LoginAccountRequest(username=self.name, password=PASSWORD))).status_code
+        if status == ResponseCode.SUCCESS.value:
+            self._stream = self.stub.ReceiveMessage(handler_pb2.ReceiveMessageRequest(username=self.name))
+            self._stream_task = asyncio.create_task(self._receive())
+        return status
+
+    async def _receive(self):
+        try:
+            async for response in self._stream:
+                now = time.time()
+                for msg in response.msg_lst:
+                    self.stats.delivered(msg.content, now)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.CANCELLED:
+                logging.error(f"ReceiveMessage stream for {self.name} failed: {e.code()}")
+                self.stats.counts["errors"] += 1
+
+    async def send(self, receiver, content):
+        request = handler_pb2.SendMessageRequest(sender=self.name, receiver=receiver, content=content)
+        return (await self.stub.SendMessage(request)).status_code
+
+    async def read_history(self, n):
+        request = handler_pb2.FetchMessagesReadRequest(username=self.name, num=n)
+        return (await self.stub.FetchMessageRead(request)).status_code
+
+    async def close(self):
+        if self._stream is not None:
+            self._stream.cancel()
+        if self._stream_task is not None:
+            await asyncio.gather(self._stream_task, return_exceptions=True)
+
+async def timed(stats, name, call):
+    """Await call, recording its latency under name. Returns True on a SUCCESS response."""
+    start = time.perf_counter()
+    try:
+        status = await call
+    except (grpc.RpcError, OSError) as e:
+        logging.debug(f"{name} failed: {e}")
+        stats.counts["errors"] += 1
+        return False
+    stats.record(name, time.perf_counter() - start)
+    if status != ResponseCode.SUCCESS.value:
+        stats.counts["errors"] += 1
+        return False
+    return True
+
+async def simulate(user, online, stats, args, stop_at):
+    """One user's session once logged in: send at args.rate and read history at args.read_rate until stop_at."""
+    loop = asyncio.get_running_loop()
+    events = []
+    if args.rate > 0:
+        events.append(("send", args.rate))
+    if args.read_rate > 0:
+        events.append(("read", args.read_rate))
+    total = sum(rate for _, rate in events)
+    while events:
+        # Poisson arrivals: exponential gaps at the combined rate, each event picked in proportion to its rate
+        delay = random.expovariate(total)
+        if loop.time() + delay >= stop_at:
+            return
+        await asyncio.sleep(delay)
+        kind = random.choices([k for k, _ in events], weights=[r for _, r in events])[0]
+        if kind == "send":
+            receiver = random.choice(online)
+            if receiver == user.name and len(online) > 1:
+                continue
+            if await timed(stats, "send", user.send(receiver, message_content(args.message_size))):
+                stats.counts["sent"] += 1
+        else:
+            if await timed(stats, "read", user.read_history(args.page_size)):
+                stats.counts["reads"] += 1
+
+async def run(args):
+    """Create, log in and run every user, then return the report."""
+    stats = Stats()
+    prefix = f"lg{uuid.uuid4().hex[:6]}"
+    names = [f"{prefix}_{i}" for i in range(args.users)]
+    channels = []
+    if PROTOCOLS[args.protocol] is None:
+        target = f"{args.host}:{args.port}"
+        channels = [tls.grpc_aio_channel(target) for _ in range(args.grpc_channels)]
+        users = [GrpcUser(name, channels[i % len(channels)], stats) for i, name in enumerate(names)]
+    else:
+        users = [SocketUser(name, args.host, args.port, PROTOCOLS[args.protocol], stats) for name in names]
+
+    # Accounts are created and logged in with bounded concurrency, spread over the ramp-up
+    limit = asyncio.Semaphore(args.setup_concurrency)
+    loop = asyncio.get_running_loop()
+    ramp_start = loop.time()
+
+    async def join(i, user):
+        await asyncio.sleep(args.ramp * i / len(users))
+        async with limit:
+            try:
+                await user.connect()
+                await user.create()
+            except (grpc.RpcError, OSError) as e:
+                logging.error(f"Failed to set up {user.name}: {e}")
+                stats.counts["errors"] += 1
+                return None
+            if await timed(stats, "login", user.login()):
+                return user.name
+        return None
+
+    online = [name for name in await asyncio.gather(*(join(i, u) for i, u in enumerate(users))) if name is not None]
+    print(f"{len(online)}/{len(users)} users online after {loop.time() - ramp_start:.1f}s")
+    try:
+        if online:
+            start = loop.time()
+            stop_at = start + args.duration
+            joined = set(online)
+            active = [u for u in users if u.name in joined]
+            await asyncio.gather(*(simulate(u, online, stats, args, stop_at) for u in active))
+            # Let pushes that are still in flight arrive
+            await asyncio.sleep(args.drain)
+            elapsed = loop.time() - start
+        else:
+            elapsed = 1
+    finally:
+        await asyncio.gather(*(u.close() for u in users), return_exceptions=True)
+        for channel in channels:
+            await channel.close()
+    report = stats.report(elapsed)
+    report["users"] = {"requested": len(users), "online": len(online)}
+    return report
+
+def raise_open_file_limit():
+    """Each socket user holds a connection, so allow as many open files as the hard limit permits."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent chat users and report delivery latency.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--protocol", choices=list(PROTOCOLS), default="json")
+    parser.add_argument("--users", type=int, default=100, help="Simulated users, each with its own connection or stream")
+    parser.add_argument("--rate", type=float, default=0.2, help="Messages sent per user per second")
+    parser.add_argument("--read-rate", type=float, default=0.05, help="History reads per user per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run once users are online")
+    parser.add_argument("--ramp", type=float, default=5, help="Seconds over which users log in")
+    parser.add_argument("--drain", type=float, default=2, help="Seconds to wait for in-flight pushes after the run")
+    parser.add_argument("--message-size", type=int, default=100, help="Message content length in characters")
+    parser.add_argument("--page-size", type=int, default=config.get("max_view", 5), help="Messages per history read")
+    parser.add_argument("--setup-concurrency", type=int, default=100, help="Users creating accounts and logging in at once")
+    parser.add_argument("--grpc-channels", type=int, default=8, help="gRPC channels shared by the users")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    raise_open_file_limit()
+
+    report = asyncio.run(run(args))
+    counts = report["counts"]
+    print(f"sent {counts['sent']}, delivered {counts['delivered']} "
+          f"({100 * counts['delivered'] / max(counts['sent'], 1):.1f}%), reads {counts['reads']}, errors {counts['errors']}")
+    print(f"throughput: {report['throughput']['sent_per_sec']:.1f} sent/s, {report['throughput']['delivered_per_sec']:.1f} delivered/s")
+    for name in ("login", "send", "read", "delivery"):
+        if name in report:
+            r = report[name]
+            print(f"{name:>9}: n={r['n']}, mean {r['mean']:.3f} ms, p50 {r['p50']:.3f} ms, p95 {r['p95']:.3f} ms, p99 {r['p99']:.3f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "json"}, "report": report}, f, indent=2)
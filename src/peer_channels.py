@@ -0,0 +1,113 @@
+import threading
+import time
+import yaml
+import logging
+from collections import Counter
+import grpc
+import tls
+import handler_pb2_grpc
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+KEEPALIVE_TIME_MS = config.get("peer_keepalive_time_ms", 2000) # Idle time before a keepalive ping
+KEEPALIVE_TIMEOUT_MS = config.get("peer_keepalive_timeout_ms", 1000) # Unanswered ping after which the connection is dropped
+MIN_RECONNECT_BACKOFF_MS = config.get("peer_min_reconnect_backoff_ms", 100)
+MAX_RECONNECT_BACKOFF_MS = config.get("peer_max_reconnect_backoff_ms", 2000)
+
+# Client side: keep the connection checked while idle (e.g. between elections), and retry a lost peer quickly
+# with exponential backoff capped well below an election timeout
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", KEEPALIVE_TIME_MS),
+    ("grpc.keepalive_timeout_ms", KEEPALIVE_TIMEOUT_MS),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", MIN_RECONNECT_BACKOFF_MS),
+    ("grpc.min_reconnect_backoff_ms", MIN_RECONNECT_BACKOFF_MS),
+    ("grpc.max_reconnect_backoff_ms", MAX_RECONNECT_BACKOFF_MS),
+]
+# Server side: accept the peers' pings instead of answering them with GOAWAY (too_many_pings)
+SERVER_OPTIONS = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_ping_interval_without_data_ms", KEEPALIVE_TIME_MS // 2),
+    ("grpc.http2.max_ping_strikes", 0),
+]
+
+class PeerChannels:
+    """ One long-lived gRPC channel per Raft peer, shared by every Vote and AppendEntries sent to it.
+
+    Channels are opened on first use and kept for the life of the server: gRPC reconnects a lost peer on its own,
+    with the backoff in CHANNEL_OPTIONS, so the replication path never sets up a connection itself. Connectivity
+    changes and RPC outcomes are counted per peer for health reporting.
+
+    Methods:
+    - stub(self, peer): RaftStub on the peer's channel, opening the channel on first use.
+    - record(self, peer, future): Count the outcome of a finished RPC future.
+    - health(self): Per-peer connectivity state and counters.
+    - close(self): Close every channel.
+    """
+    def __init__(self, options=CHANNEL_OPTIONS):
+        self.options = options
+        self._channels = {} # peer -> (channel, stub)
+        self._states = {}   # peer -> last grpc.ChannelConnectivity seen
+        self._since = {}    # peer -> monotonic time of the last state change
+        self._counts = {}   # peer -> Counter
+        self._lock = threading.Lock()
+
+    def stub(self, peer):
+        """RaftStub on the peer's channel, opening the channel on first use."""
+        with self._lock:
+            entry = self._channels.get(peer)
+            if entry is None:
+                channel = tls.grpc_channel(peer, options=self.options)
+                entry = self._channels[peer] = (channel, handler_pb2_grpc.RaftStub(channel))
+                self._counts[peer] = Counter(opened=1)
+                self._states[peer] = grpc.ChannelConnectivity.IDLE
+                self._since[peer] = time.monotonic()
+                channel.subscribe(lambda state, peer=peer: self._on_state(peer, state), try_to_connect=True)
+        return entry[1]
+
+    def _on_state(self, peer, state):
+        with self._lock:
+            previous = self._states.get(peer)
+            if state == previous:
+                return
+            self._states[peer] = state
+            self._since[peer] = time.monotonic()
+            counts = self._counts[peer]
+            if state == grpc.ChannelConnectivity.READY:
+                counts["connects"] += 1
+            elif previous == grpc.ChannelConnectivity.READY:
+                counts["disconnects"] += 1
+            if state == grpc.ChannelConnectivity.TRANSIENT_FAILURE:
+                counts["connect_failures"] += 1
+        logging.info(f"[PEER] Channel state | server: {peer}, state: {state.name}")
+
+    def record(self, peer, future):
+        """Count the outcome of a finished RPC future: ok, or failed with its status code."""
+        error = future.exception()
+        with self._lock:
+            counts = self._counts[peer]
+            if error is None:
+                counts["rpc_ok"] += 1
+            else:
+                counts["rpc_failed"] += 1
+                code = error.code() if isinstance(error, grpc.RpcError) else None
+                counts[f"rpc_{code.name.lower() if code else 'error'}"] += 1
+
+    def health(self):
+        """{peer: {"state", "state_age", counters...}}: the channel's connectivity state, seconds spent in it, and
+        connects/disconnects/connect_failures/rpc_ok/rpc_failed/rpc_<status> counts."""
+        now = time.monotonic()
+        with self._lock:
+            return {peer: {"state": self._states[peer].name, "state_age": now - self._since[peer], **self._counts[peer]}
+                    for peer in self._channels}
+
+    def close(self):
+        """Close every channel."""
+        with self._lock:
+            channels, self._channels = self._channels, {}
+        for channel, _ in channels.values():
+            channel.close()
@@ -0,0 +1,162 @@
+import os
+import socket
+import struct
+import tempfile
+import logging
+from collections import Counter
+from collections.abc import MutableMapping
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# IPC datagram: kind | username length | username | payload
+IPC_HEADER_FMT = ">BH"
+IPC_HEADER_LEN = struct.calcsize(IPC_HEADER_FMT)
+IPC_ONLINE = 0 # payload: owning worker id
+IPC_OFFLINE = 1 # payload: owning worker id
+IPC_DELIVER = 2 # payload: packaged frame for the user's connection
+IPC_MAX_DATAGRAM = 1 << 16
+
+def ipc_path(port, worker_id):
+    """Path of the Unix datagram socket owned by a worker of the server on port."""
+    return os.path.join(tempfile.gettempdir(), f"chat-{port}-{worker_id}.sock")
+
+class RemoteClient:
+    """ Stand-in for a user's Message object when the user is connected to another worker.
+    Pushed frames are forwarded to the owning worker, which queues them on the user's connection.
+
+    Methods:
+    - _queue_send(self, message): Forward a packaged message to the owning worker.
+    - _accepting_pushes(self): Always True; backpressure is applied by the owning worker.
+    """
+    def __init__(self, registry, worker_id, username):
+        self.registry = registry
+        self.worker_id = worker_id
+        self.username = username
+
+    def _queue_send(self, message):
+        """Forward a packaged message to the worker that owns the user's connection."""
+        self.registry.send(self.worker_id, IPC_DELIVER, self.username, message)
+
+    def _accepting_pushes(self):
+        return True
+
+class PresenceRegistry(MutableMapping):
+    """ Cross-process replacement for the active_clients dict (username -> Message object) used by server workers.
+
+    Users logged in to this worker map to their Message objects. Users logged in to another worker map to a
+    RemoteClient, so server_handler can push to them without knowing where they are connected. Logins and logouts
+    are broadcast to the other workers over Unix datagram sockets, and pushed frames for remote users are forwarded
+    the same way. Iteration and len() only cover local users.
+
+    The registry is registered with the worker's selector and handles its own socket like a connection handler.
+
+    Methods:
+    - process_events(self, mask): Handle every datagram waiting on the IPC socket.
+    - send(self, worker_id, kind, username, payload): Send a datagram to another worker.
+    - broadcast(self, kind, username, payload): Send a datagram to every other worker.
+    - close(self): Close and unlink the IPC socket.
+    """
+    def __init__(self, port, worker_id, n_workers, metrics=None):
+        self.port = port
+        self.worker_id = worker_id
+        self.n_workers = n_workers
+        self.metrics = metrics if metrics is not None else Counter()
+        self.addr = ipc_path(port, worker_id)
+        self._local = {} # username -> Message object on this worker
+        self._remote = {} # username -> id of the worker that owns the connection
+        # Bind this worker's socket, replacing a stale one from a previous run
+        if os.path.exists(self.addr):
+            os.unlink(self.addr)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.addr)
+        self.sock.setblocking(False)
+
+    def __getitem__(self, username):
+        if username in self._local:
+            return self._local[username]
+        if username in self._remote:
+            return RemoteClient(self, self._remote[username], username)
+        raise KeyError(username)
+
+    def __setitem__(self, username, client):
+        self._local[username] = client
+        self._remote.pop(username, None)
+        self.broadcast(IPC_ONLINE, username, struct.pack(">H", self.worker_id))
+
+    def __delitem__(self, username):
+        del self._local[username]
+        self.broadcast(IPC_OFFLINE, username, struct.pack(">H", self.worker_id))
+
+    def __iter__(self):
+        return iter(self._local)
+
+    def __len__(self):
+        return len(self._local)
+
+    def send(self, worker_id, kind, username, payload):
+        """Send one datagram to another worker. Raises OSError if it cannot be queued, and ValueError if it is larger
+        than IPC_MAX_DATAGRAM, the most the receiving worker reads at once."""
+        name = username.encode("utf-8")
+        datagram = struct.pack(IPC_HEADER_FMT, kind, len(name)) + name + payload
+        if len(datagram) > IPC_MAX_DATAGRAM:
+            logging.error(f"IPC datagram of {len(datagram)} bytes for {username} exceeds {IPC_MAX_DATAGRAM}")
+            raise ValueError(f"IPC datagram of {len(datagram)} bytes exceeds {IPC_MAX_DATAGRAM}")
+        self.sock.sendto(datagram, ipc_path(self.port, worker_id))
+
+    def broadcast(self, kind, username, payload):
+        """Send one datagram to every other worker, logging workers that cannot be reached."""
+        for worker_id in range(self.n_workers):
+            if worker_id == self.worker_id:
+                continue
+            try:
+                self.send(worker_id, kind, username, payload)
+            except OSError as e:
+                logging.error(f"Failed to notify worker {worker_id}: {e!r}")
+
+    def process_events(self, mask):
+        """Handle every datagram waiting on the IPC socket."""
+        while True:
+            try:
+                datagram = self.sock.recv(IPC_MAX_DATAGRAM)
+            except BlockingIOError:
+                # Resource temporarily unavailable (errno EWOULDBLOCK)
+                return
+            try:
+                self._handle_datagram(datagram)
+            except Exception as e:
+                logging.error(f"Bad IPC datagram on worker {self.worker_id}: {e!r}")
+
+    def _handle_datagram(self, datagram):
+        """Apply a presence update or queue a forwarded frame."""
+        kind, name_len = struct.unpack_from(IPC_HEADER_FMT, datagram)
+        username = datagram[IPC_HEADER_LEN:IPC_HEADER_LEN + name_len].decode("utf-8")
+        payload = datagram[IPC_HEADER_LEN + name_len:]
+        if kind == IPC_ONLINE:
+            (owner,) = struct.unpack(">H", payload)
+            self._remote[username] = owner
+            self._local.pop(username, None)
+        elif kind == IPC_OFFLINE:
+            (owner,) = struct.unpack(">H", payload)
+            # Ignore a stale logout if the user has since logged in elsewhere
+            if self._remote.get(username) == owner:
+                del self._remote[username]
+        elif kind == IPC_DELIVER:
+            client = self._local.get(username)
+            if client is None:
+                # The message is stored as delivered; the user sees it in their history
+                logging.warning(f"Forwarded message for {username} arrived after they went offline.")
+                self.metrics["lost_remote_pushes"] += 1
+                return
+            client._queue_send(payload)
+            self.metrics["remote_pushes"] += 1
+        else:
+            raise ValueError(f"Unknown IPC datagram kind {kind}.")
+
+    def close(self):
+        """Close and unlink the IPC socket."""
+        try:
+            self.sock.close()
+        finally:
+            if os.path.exists(self.addr):
+                os.unlink(self.addr)
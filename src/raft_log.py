@@ -0,0 +1,359 @@
+import os
+import json
+import mmap
+import struct
+import zlib
+import threading
+import yaml
+import logging
+from collections.abc import Sequence
+import handler_pb2
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+SEGMENT_BYTES = config.get("wal_segment_bytes", 64 * 1024 * 1024) # A segment is sealed and a new one started past this size
+WAL_FSYNC = config.get("wal_fsync", True) # False skips fsync (tests, benchmarks): entries survive a crash of the process but not of the machine
+TAIL_CACHE = config.get("wal_cache_entries", 4096) # Most recent entries kept decoded in memory
+
+# Record: payload length | crc32 of payload | serialized Entry
+RECORD_HEADER_FMT = ">II"
+RECORD_HEADER_LEN = struct.calcsize(RECORD_HEADER_FMT)
+SEGMENT_SUFFIX = ".wal"
+BASE_FILE = "base.json" # Index and term of the last entry compacted into a snapshot
+
+def _fsync_dir(path):
+    """fsync a directory so a file created or removed in it survives a crash."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class Segment:
+    """ One append-only segment file holding the records of consecutive log indices from first on.
+
+    Methods:
+    - recover(cls, path, first): Open an existing segment, scanning it through mmap; drops a torn tail.
+    - write(self, data, lengths, terms): Append packed records for the next indices.
+    - read(self, i): Serialized Entry of the segment's i-th record.
+    - truncate(self, count): Keep the first count records.
+    - close(self): Close the file.
+    """
+    def __init__(self, path, first, offsets=None, terms=None):
+        self.path = path
+        self.first = first
+        self.offsets = offsets or [] # File offset of each record
+        self.terms = terms or []     # Term of each record, so consistency checks never read the file
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.size = os.lseek(self.fd, 0, os.SEEK_END)
+        self.dirty = False           # Written since the last fsync
+
+    @classmethod
+    def recover(cls, path, first):
+        """Open an existing segment. Records are scanned through an mmap of the file; a record cut short or failing
+        its checksum (a write torn by a crash) ends the segment and the file is truncated there."""
+        offsets, terms = [], []
+        size = os.path.getsize(path)
+        pos = 0
+        if size:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                while pos + RECORD_HEADER_LEN <= size:
+                    length, crc = struct.unpack_from(RECORD_HEADER_FMT, m, pos)
+                    end = pos + RECORD_HEADER_LEN + length
+                    if end > size:
+                        break
+                    payload = m[pos + RECORD_HEADER_LEN:end]
+                    if zlib.crc32(payload) != crc:
+                        break
+                    offsets.append(pos)
+                    terms.append(handler_pb2.Entry.FromString(payload).term)
+                    pos = end
+        if pos < size:
+            logging.error(f"[WAL] Torn tail dropped | segment: {path}, valid_bytes: {pos}, size: {size}")
+            os.truncate(path, pos)
+        return cls(path, first, offsets, terms)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def write(self, data, lengths, terms):
+        """Append packed records, given as one buffer and the length of each record, for the next indices."""
+        offset = self.size
+        for length in lengths:
+            self.offsets.append(offset)
+            offset += length
+        self.terms.extend(terms)
+        os.pwrite(self.fd, data, self.size)
+        self.size = offset
+        self.dirty = True
+
+    def read(self, i):
+        """Serialized Entry of the i-th record."""
+        start = self.offsets[i]
+        end = self.offsets[i + 1] if i + 1 < len(self.offsets) else self.size
+        record = os.pread(self.fd, end - start, start)
+        return record[RECORD_HEADER_LEN:]
+
+    def truncate(self, count):
+        """Keep the first count records."""
+        self.size = self.offsets[count] if count < len(self.offsets) else self.size
+        del self.offsets[count:]
+        del self.terms[count:]
+        os.ftruncate(self.fd, self.size)
+        self.dirty = True
+
+    def close(self):
+        os.close(self.fd)
+
+class RaftLog(Sequence):
+    """ Durable replacement for the in-memory Raft log list in server_grpc (log index i, from 1, is logs[i - 1]).
+
+    Entries are written as length-prefixed, checksummed Entry protobufs to segment files in a directory, named
+    after the first index they hold. A segment is sealed once it passes SEGMENT_BYTES and a new one started. An
+    in-memory index maps each log index to its segment and file offset, along with its term. The most recent
+    TAIL_CACHE entries are also kept decoded, so replication reads rarely touch the files.
+
+    Writes go to the files straight away but are only durable after sync(). sync() is a group commit: one fsync
+    covers everything appended since the previous one, and callers that arrive while an fsync is running share the
+    next. durable is the highest index known to be on disk.
+
+    On startup the segments are scanned (through mmap) to rebuild the index; a torn record at the end of the log is
+    dropped.
+
+    Entries covered by a snapshot can be dropped from the front with compact(). The log then starts after
+    base_index, whose term is kept (base_term) for the consistency check of the first entry; indices are unchanged
+    and len() is still the last index. Reading a compacted entry raises IndexError. Compaction cuts inside a segment
+    too (the records after base_index are copied to a new one), so the log stays bounded by the snapshot interval
+    whatever the segment size.
+
+    Methods:
+    - append(self, entry) / extend(self, entries): Write entries after the last index.
+    - term(self, index): Term of the entry at index (0 for index 0).
+    - sync(self): fsync every written entry.
+    - __delitem__(self, key): Truncate: del logs[i:] keeps the first i entries.
+    - compact(self, index): Drop every entry at or before index.
+    - reset(self, index, term): Drop every entry and continue after index (an installed snapshot).
+    - close(self): Close every segment.
+    """
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, fsync=WAL_FSYNC, cache=TAIL_CACHE):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.cache = cache
+        self._lock = threading.RLock()      # guards segments and the tail cache
+        self._sync_lock = threading.Lock()  # one fsync at a time; held before _lock
+        os.makedirs(directory, exist_ok=True)
+        self.base_index, self.base_term = 0, 0
+        if os.path.exists(os.path.join(directory, BASE_FILE)):
+            with open(os.path.join(directory, BASE_FILE)) as f:
+                base = json.load(f)
+            self.base_index, self.base_term = base["index"], base["term"]
+        self.segments = self._recover()
+        if not self.segments:
+            self.segments.append(self._new_segment(self.base_index + 1))
+        self._tail = []                     # decoded entries for the last len(self._tail) indices
+        self.durable = len(self)
+
+    def _recover(self):
+        """Open the segments in index order. Anything after a gap or a torn segment cannot be trusted and is removed, as
+        are segments already compacted and the partial copy of a split segment (both left behind by a crash during
+        compact())."""
+        names = sorted((int(name[:-len(SEGMENT_SUFFIX)]), name) for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        segments = []
+        for first, name in names:
+            path = os.path.join(self.directory, name)
+            expected = segments[-1].first + len(segments[-1]) if segments else self.base_index + 1
+            if first > expected:
+                logging.error(f"[WAL] Removing segment after a gap | segment: {path}, expected_first: {expected}")
+                os.remove(path)
+                continue
+            if segments and first < expected:
+                # The records after index of a segment compact() was splitting; the segment itself still has them
+                logging.error(f"[WAL] Removing overlapping segment | segment: {path}, expected_first: {expected}")
+                os.remove(path)
+                continue
+            segment = Segment.recover(path, first)
+            if segment.first + len(segment) - 1 <= self.base_index and len(segment):
+                segment.close()
+                os.remove(path)
+                continue
+            segments.append(segment)
+        if segments:
+            logging.info(f"[WAL] Recovered log | directory: {self.directory}, segments: {len(segments)}, last_index: {segments[-1].first + len(segments[-1]) - 1}")
+        return segments
+
+    def _new_segment(self, first):
+        segment = Segment(os.path.join(self.directory, f"{first:020d}{SEGMENT_SUFFIX}"), first)
+        if self.fsync:
+            _fsync_dir(self.directory)
+        return segment
+
+    def __len__(self):
+        last = self.segments[-1]
+        return last.first + len(last) - 1
+
+    def _locate(self, index):
+        """(segment, position in it) of a log index."""
+        for segment in reversed(self.segments):
+            if index >= segment.first:
+                return segment, index - segment.first
+        raise IndexError(f"log index {index} is not in the log")
+
+    def __getitem__(self, key):
+        with self._lock:
+            n = len(self)
+            if isinstance(key, slice):
+                return [self[i] for i in range(*key.indices(n))]
+            if key < 0:
+                key += n
+            if not 0 <= key < n:
+                raise IndexError("log index out of range")
+            cached = key - (n - len(self._tail))
+            if cached >= 0:
+                return self._tail[cached]
+            segment, i = self._locate(key + 1)
+            return handler_pb2.Entry.FromString(segment.read(i))
+
+    def term(self, index):
+        """Term of the entry at log index (from 1); 0 for index 0, the empty prefix."""
+        if index == self.base_index:
+            return self.base_term
+        if index < self.base_index:
+            raise IndexError(f"log index {index} was compacted into a snapshot (base_index: {self.base_index})")
+        with self._lock:
+            segment, i = self._locate(index)
+            return segment.terms[i]
+
+    def append(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        """Write entries after the last index, one write per segment touched."""
+        with self._lock:
+            buffer, lengths, terms = [], [], []
+            size = self.segments[-1].size
+            for entry in entries:
+                payload = entry.SerializeToString()
+                record = struct.pack(RECORD_HEADER_FMT, len(payload), zlib.crc32(payload)) + payload
+                if size + len(record) > self.segment_bytes and (len(self.segments[-1]) or lengths):
+                    # Seal the active segment
+                    self._write(buffer, lengths, terms)
+                    buffer, lengths, terms = [], [], []
+                    self.segments.append(self._new_segment(len(self) + 1))
+                    size = 0
+                buffer.append(record)
+                lengths.append(len(record))
+                terms.append(entry.term)
+                size += len(record)
+            self._write(buffer, lengths, terms)
+            self._tail.extend(entries)
+            del self._tail[:-self.cache or len(self._tail)]
+
+    def _write(self, buffer, lengths, terms):
+        if lengths:
+            self.segments[-1].write(b"".join(buffer), lengths, terms)
+
+    def __delitem__(self, key):
+        """Truncate the log. Only a suffix can be removed: del logs[i:] keeps the entries at indices 1..i."""
+        if not isinstance(key, slice) or key.stop is not None or key.step is not None:
+            logging.error(f"[WAL] Unsupported delete | key: {key}")
+            raise ValueError("only a suffix of the log can be deleted (del logs[i:])")
+        with self._sync_lock, self._lock:
+            keep = min(len(self), max(0, key.start or 0))
+            if keep < self.segments[0].first - 1:
+                logging.error(f"[WAL] Truncation before the first index | keep: {keep}, first: {self.segments[0].first}")
+                raise ValueError("cannot truncate before the first index in the log")
+            drop = len(self) - keep
+            while len(self.segments) > 1 and self.segments[-1].first > keep:
+                segment = self.segments.pop()
+                segment.close()
+                os.remove(segment.path)
+            last = self.segments[-1]
+            last.truncate(keep - last.first + 1)
+            del self._tail[max(0, len(self._tail) - drop):]
+            self.durable = min(self.durable, keep)
+
+    def _write_base(self, index, term):
+        """Record the compacted prefix atomically."""
+        path = os.path.join(self.directory, BASE_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"index": index, "term": term}, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        if self.fsync:
+            _fsync_dir(self.directory)
+        self.base_index, self.base_term = index, term
+
+    def compact(self, index):
+        """Drop every entry at or before index (covered by a snapshot). The segments before the one holding index are
+        removed; that one is split, its records after index copied to a new segment starting at index + 1 (usually
+        few: entries not yet applied when the snapshot was taken)."""
+        with self._sync_lock, self._lock:
+            if index <= self.base_index or index > len(self):
+                return
+            drop = 0
+            while self.segments[drop].first + len(self.segments[drop]) - 1 < index:
+                drop += 1
+            segment = self.segments[drop]
+            keep = index - segment.first + 1 # position of the first record after index
+            index_term = segment.terms[keep - 1]
+            drop += 1
+            rest = []
+            if keep < len(segment) or drop == len(self.segments):
+                # Split the segment holding index, or start a new active segment if index is the last entry. The copy
+                # is durable before the base moves past the original
+                split = self._new_segment(index + 1)
+                if keep < len(segment):
+                    offsets = segment.offsets[keep:] + [segment.size]
+                    data = os.pread(segment.fd, segment.size - offsets[0], offsets[0])
+                    split.write(data, [end - start for start, end in zip(offsets, offsets[1:])], segment.terms[keep:])
+                    if self.fsync:
+                        os.fsync(split.fd)
+                    split.dirty = False
+                rest = [split]
+            # The base is recorded before the files go, so a crash in between only leaves segments recovery removes
+            self._write_base(index, index_term)
+            for segment in self.segments[:drop]:
+                segment.close()
+                os.remove(segment.path)
+            self.segments[:drop] = rest
+            logging.info(f"[WAL] Compacted log | segments: {drop}, base_index: {self.base_index}")
+
+    def reset(self, index, term):
+        """Drop every entry and continue the log after index, whose term is term: the log of a follower that
+        installed a snapshot it does not share a prefix with."""
+        with self._sync_lock, self._lock:
+            for segment in self.segments:
+                segment.close()
+                os.remove(segment.path)
+            self._write_base(index, term)
+            self.segments = [self._new_segment(index + 1)]
+            self._tail = []
+            self.durable = index
+
+    def sync(self):
+        """Make every entry written so far durable. Returns once an fsync that started after the last write is done."""
+        with self._lock:
+            target = len(self)
+        with self._sync_lock:
+            if self.durable >= target:
+                return
+            with self._lock:
+                target = len(self)
+                dirty = [s for s in self.segments if s.dirty]
+                for segment in dirty:
+                    segment.dirty = False
+            if self.fsync:
+                for segment in dirty:
+                    os.fsync(segment.fd)
+            self.durable = target
+
+    def close(self):
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
@@ -0,0 +1,169 @@
+import time
+import logging
+from utils import ResponseCode, OpCode
+
+class Route:
+    """ One entry of the dispatch table: the handler for an opcode, the arguments it takes and whether it changes state.
+
+    Methods:
+    - check(self, args): Return True if args match the schema.
+    """
+    __slots__ = ("opcode", "name", "handler", "arg_types", "rest", "write")
+
+    def __init__(self, opcode, handler, arg_types=(), rest=None, write=False):
+        """
+        :param opcode: OpCode value the route answers.
+        :param handler: Callable taking (ctx, *args) and returning {"status_code": ..., "data": [...]}.
+        :param arg_types: Type (or tuple of types) of each positional argument.
+        :param rest: Type of any further arguments, or None if the handler takes exactly len(arg_types).
+        :param write: True if the operation changes the database, so replicated servers must log it.
+        """
+        self.opcode = opcode
+        self.name = OpCode(opcode).name
+        self.handler = handler
+        self.arg_types = arg_types
+        self.rest = rest
+        self.write = write
+
+    def check(self, args):
+        n = len(self.arg_types)
+        if len(args) < n or (self.rest is None and len(args) > n):
+            return False
+        for i, arg in enumerate(args):
+            expected = self.arg_types[i] if i < n else self.rest
+            # bool is an int subclass, but never a valid argument
+            if not isinstance(arg, expected) or isinstance(arg, bool):
+                return False
+        return True
+
+class RequestRouter:
+    """ Opcode dispatch table shared by the JSON, custom and gRPC front ends.
+
+    Handlers take a context object and the request arguments. The context is the front end's per-request object (a
+    server_handler.Message, or the gRPC HandlerService) and must provide:
+    - db: a DatabaseHandler.
+    - on_login(username): Register the user as online on this front end.
+    - send_message(sender, receiver, content): Store a message and push it if the receiver is online.
+
+    Every dispatch is timed and passed to the hooks as hook(name, seconds, status_code).
+
+    Methods:
+    - route(self, opcode, arg_types=(), rest=None, write=False): Decorator that registers a handler for an opcode.
+    - is_write(self, opcode): Return True if the opcode's operation changes the database.
+    - dispatch(self, opcode, ctx, args): Validate args, run the handler and return its result.
+    - add_hook(self, hook): Call hook after every dispatch.
+    """
+    def __init__(self):
+        self._routes = {} # opcode -> Route
+        self._hooks = []
+
+    def route(self, opcode, arg_types=(), rest=None, write=False):
+        opcode = getattr(opcode, "value", opcode)
+        def register(handler):
+            if opcode in self._routes:
+                raise ValueError(f"Opcode {opcode} already routed to {self._routes[opcode].handler.__name__}")
+            self._routes[opcode] = Route(opcode, handler, arg_types, rest, write)
+            return handler
+        return register
+
+    def is_write(self, opcode):
+        route = self._routes.get(getattr(opcode, "value", opcode))
+        return route is not None and route.write
+
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+
+    def dispatch(self, opcode, ctx, args):
+        route = self._routes.get(opcode)
+        if route is None:
+            logging.error(f"Unknown opcode: {opcode}")
+            return {"status_code": ResponseCode.BAD_REQUEST.value}
+        if not route.check(args):
+            logging.error(f"Bad arguments for {route.name}: {args!r}")
+            return {"status_code": ResponseCode.BAD_REQUEST.value}
+
+        start = time.perf_counter()
+        result = route.handler(ctx, *args)
+        elapsed = time.perf_counter() - start
+        for hook in self._hooks:
+            hook(route.name, elapsed, result["status_code"])
+        return result
+
+class LatencyStats:
+    """ Dispatch hook that aggregates handler latency per operation.
+
+    Methods:
+    - __call__(self, name, seconds, status_code): Record one dispatch.
+    - summary(self): Return {name: (count, mean ms, max ms)}.
+    """
+    def __init__(self):
+        self._stats = {} # name -> [count, total seconds, max seconds]
+
+    def __call__(self, name, seconds, status_code):
+        # One list update per call, so concurrent pool threads at worst lose a sample
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        if seconds > stats[2]:
+            stats[2] = seconds
+
+    def summary(self):
+        return {name: (count, 1000 * total / count, 1000 * peak)
+                for name, (count, total, peak) in sorted(self._stats.items())}
+
+ROUTER = RequestRouter()
+
+@ROUTER.route(OpCode.STARTING)
+def starting(ctx):
+    return {"status_code": ResponseCode.SUCCESS.value}
+
+@ROUTER.route(OpCode.ACCOUNT_EXISTS, (str,))
+def account_exists(ctx, username):
+    if ctx.db.account_exists(username):
+        return {"status_code": ResponseCode.ACCOUNT_EXISTS.value}
+    return {"status_code": ResponseCode.ACCOUNT_NOT_FOUND.value}
+
+@ROUTER.route(OpCode.CREATE_ACCOUNT, (str, str, str), write=True)
+def create_account(ctx, username, password, bio):
+    return ctx.db.create_account(username, password, bio)
+
+@ROUTER.route(OpCode.LOGIN_ACCOUNT, (str, str))
+def login_account(ctx, username, password):
+    result = ctx.db.login_account(username, password)
+    if result["status_code"] == ResponseCode.SUCCESS.value:
+        ctx.on_login(username)
+    return result
+
+@ROUTER.route(OpCode.LIST_ACCOUNTS, rest=str)
+def list_accounts(ctx, *pattern):
+    # Search query may arrive split across arguments
+    if pattern:
+        return ctx.db.list_accounts("".join(pattern))
+    return ctx.db.list_accounts()
+
+@ROUTER.route(OpCode.DELETE_ACCOUNT, (str, str), write=True)
+def delete_account(ctx, username, password):
+    return ctx.db.delete_account(username, password)
+
+@ROUTER.route(OpCode.HOMEPAGE, (str,))
+def homepage(ctx, username):
+    return ctx.db.fetch_homepage(username)
+
+# Reading unread messages marks them delivered
+@ROUTER.route(OpCode.READ_MSG_UNDELIVERED, (str, int), write=True)
+def read_undelivered(ctx, username, n):
+    return ctx.db.fetch_messages_undelivered(username, n)
+
+@ROUTER.route(OpCode.READ_MSG_DELIVERED, (str, int))
+def read_delivered(ctx, username, n):
+    return ctx.db.fetch_messages_delivered(username, n)
+
+@ROUTER.route(OpCode.DELETE_MSG, (str, (list, tuple)), write=True)
+def delete_messages(ctx, username, message_ids):
+    return ctx.db.delete_messages(username, list(message_ids))
+
+@ROUTER.route(OpCode.SEND_MSG, (str, str, str), write=True)
+def send_message(ctx, sender, receiver, content):
+    return ctx.send_message(sender, receiver, content)
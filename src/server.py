@@ -3,9 +3,22 @@ import socket
 import traceback
 import yaml
 import os
+import time
+import errno
+from collections import Counter
 import server_handler
+from presence import PresenceRegistry
+from dispatch import RequestDispatcher
+from timer_wheel import TimerWheel
+from router import ROUTER, LatencyStats
+import tls
 from utils import database_setup
 
+try:
+    from edge_selector import EdgeTriggeredSelector
+except ImportError:
+    EdgeTriggeredSelector = None
+
 # Load configuration from YAML file
 yaml_path = "config.yaml"
 with open(yaml_path, "r") as y:
@@ -16,51 +29,204 @@ DEFAULT_HOST = config.get("host", "127.0.0.1")
 DEFAULT_PORT = config.get("port", 65432)
 DEFAULT_PROTOCOL = config.get("protocol", 0)
 DB_PATH = config.get("db_path", "server.db")
+DEFAULT_WORKERS = config.get("workers", 1)
+DB_WORKERS = config.get("db_workers", 4)
+MAX_CONNECTIONS = config.get("max_connections", 10000)
+ACCEPT_BACKLOG = config.get("accept_backlog", 1024)
+ACCEPT_RETRY_DELAY = config.get("accept_retry_delay", 0.1)
+EDGE_TRIGGERED = config.get("edge_triggered", False)
 
-# Active clients mapping (username -> socket)
+# Active clients mapping (username -> socket). A PresenceRegistry shared across processes in multi-worker mode
 active_clients = {}
+# Handlers with frames queued during the current loop iteration
+pending_writes = set()
+# Server-wide counters, e.g. pushed messages deferred by backpressure
+metrics = Counter()
+# Per-operation handler latency, recorded by the request router
+latency = LatencyStats()
+ROUTER.add_hook(latency)
+# Thread pool for request handling, created by start_server (None: handle requests on the event loop)
+dispatcher = None
+# Open client connections, capped at MAX_CONNECTIONS
+connections = set()
+# Listening sockets unregistered while at the connection limit, or out of file descriptors
+paused_listeners = []
+# Monotonic time before which paused listeners stay paused (set when accept runs out of file descriptors)
+accept_retry_at = 0.0
+# Shared server SSLContext for TLS connections, set by start_server (None: plain TCP)
+ssl_context = None
+# Idle checks (pings and reaping) for client connections
+timers = TimerWheel(tick=1.0, span=max(server_handler.PING_INTERVAL, server_handler.IDLE_TIMEOUT))
 
 # Initialize the selector and database
 sel = selectors.DefaultSelector()
 database_setup(DB_PATH)
 
 
-def accept_connection(sock, protocol):
+def make_selector(edge_triggered=False):
+    """
+    Returns the selector for the event loop.
+
+    :param edge_triggered: Use the Linux edge-triggered epoll selector instead of the platform default.
+    """
+    if not edge_triggered:
+        return selectors.DefaultSelector()
+    if EdgeTriggeredSelector is None:
+        raise RuntimeError("Edge-triggered mode needs Linux epoll.")
+    return EdgeTriggeredSelector()
+
+
+def accept_connection(sock, protocol, max_connections=MAX_CONNECTIONS):
     """
-    Accepts a new incoming client connection, initializes the appropriate handler,
-    and registers it with the selector for event-driven processing.
+    Accepts every pending client connection (until the socket would block), initializes the appropriate handler
+    for each, and registers it with the selector for event-driven processing.
+    At the connection limit, the listening socket is unregistered until a connection closes. When the process or
+    system runs out of file descriptors, it is unregistered for ACCEPT_RETRY_DELAY seconds while existing
+    connections are served.
 
     :param sock: Listening socket accepting the connection.
     :param protocol: Protocol version (0 for default, 1 for custom).
+    :param max_connections: Maximum number of open client connections.
+    """
+    global accept_retry_at
+    while len(connections) < max_connections:
+        try:
+            conn, addr = sock.accept()
+        except BlockingIOError:
+            # No more pending connections
+            return
+        except OSError as e:
+            metrics["accept_errors"] += 1
+            if e.errno in (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM):
+                # Out of descriptors or memory: the pending connection stays queued, so retrying now would spin
+                print(f"Error accepting connections: {e}, pausing accepts for {ACCEPT_RETRY_DELAY}s")
+                metrics["accept_pauses"] += 1
+                accept_retry_at = time.monotonic() + ACCEPT_RETRY_DELAY
+                sel.unregister(sock)
+                paused_listeners.append(sock)
+                return
+            # The client went away before it was accepted (ECONNABORTED, EPROTO): accept the next one
+            print(f"Error accepting a connection: {e}")
+            continue
+        print(f"New connection from {addr}")
+
+        try:
+            conn.setblocking(False)  # Set non-blocking mode
+            if ssl_context is not None:
+                # Handshake messages go out in several small writes; Nagle would hold them for the client's delayed ACK
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                # The handler runs the handshake from the event loop
+                conn = ssl_context.wrap_socket(conn, server_side=True, do_handshake_on_connect=False)
+        except OSError as e:
+            print(f"Error setting up connection from {addr}: {e}")
+            metrics["accept_errors"] += 1
+            conn.close()
+            continue
+        # Handle messages using the default or custom protocol
+        if protocol == 0:
+            handler = server_handler.Message(sel, conn, addr, db_path=DB_PATH, active_clients=active_clients, pending_writes=pending_writes, metrics=metrics, dispatcher=dispatcher, connections=connections)
+        else:
+            handler = server_handler.MessageCustom(sel, conn, addr, db_path=DB_PATH, active_clients=active_clients, pending_writes=pending_writes, metrics=metrics, dispatcher=dispatcher, connections=connections)
+
+        sel.register(conn, selectors.EVENT_READ, data=handler)
+        schedule_idle_check(handler, handler.check_idle(handler.last_activity))
+
+    # At the limit: leave further connections in the kernel backlog until a client disconnects
+    print(f"Connection limit ({max_connections}) reached, pausing accepts")
+    metrics["accept_pauses"] += 1
+    sel.unregister(sock)
+    paused_listeners.append(sock)
+
+
+def schedule_idle_check(handler, delay):
+    """
+    Schedules the next idle check for a connection.
+
+    :param handler: Connection handler.
+    :param delay: Seconds until the check, or None for no check.
+    """
+    if delay is not None:
+        timers.schedule(handler, delay)
+
+
+def run_idle_checks():
+    """
+    Pings or closes connections whose idle timers expired, and schedules their next check.
+    Closed connections are dropped from the wheel when their timer expires.
+    """
+    now = time.monotonic()
+    for handler in timers.advance(now):
+        try:
+            schedule_idle_check(handler, handler.check_idle(now))
+        except Exception:
+            print(f"Error checking {handler.addr}:\n{traceback.format_exc()}")
+            handler.close()
+
+
+def resume_accepting(max_connections=MAX_CONNECTIONS):
+    """
+    Re-registers paused listening sockets once there is room for new connections and the retry delay after
+    running out of file descriptors has passed.
+
+    :param max_connections: Maximum number of open client connections.
     """
-    conn, addr = sock.accept()
-    print(f"New connection from {addr}")
+    if paused_listeners and len(connections) < max_connections and time.monotonic() >= accept_retry_at:
+        for sock in paused_listeners:
+            # Registering again reports connections that queued while paused
+            sel.register(sock, selectors.EVENT_READ, data=None)
+        paused_listeners.clear()
 
-    conn.setblocking(False)  # Set non-blocking mode
-    # Handle messages using the default or custom protocol
-    if protocol == 0:
-        handler = server_handler.Message(sel, conn, addr, db_path=DB_PATH, active_clients=active_clients)
-    else:
-        print("Using custom protocol handler")
-        handler = server_handler.MessageCustom(sel, conn, addr, db_path=DB_PATH, active_clients=active_clients)
 
-    sel.register(conn, selectors.EVENT_READ, data=handler)
+def select_timeout():
+    """
+    Returns the seconds the event loop may block: until the next idle check, or until paused listeners are retried
+    after running out of file descriptors (None: block until an event).
+    """
+    timeout = timers.timeout()
+    if paused_listeners and accept_retry_at:
+        retry = max(0.0, accept_retry_at - time.monotonic())
+        timeout = retry if timeout is None else min(timeout, retry)
+    return timeout
 
 
-def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, protocol=DEFAULT_PROTOCOL):
+def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, protocol=DEFAULT_PROTOCOL, workers=1, db_workers=0,
+                 max_connections=MAX_CONNECTIONS, backlog=ACCEPT_BACKLOG, edge_triggered=False, use_tls=False):
     """
     Initializes and starts the server, handling client connections and requests.
 
     :param host: Server host (default from config).
     :param port: Server port (default from config).
     :param protocol: Communication protocol (0 for default, 1 for custom).
+    :param workers: Number of event loop processes sharing the port (default 1).
+    :param db_workers: Threads handling requests off the event loop (default 0: handle them on the loop).
+    :param max_connections: Maximum number of open client connections (per worker).
+    :param backlog: Listen backlog for pending connections.
+    :param edge_triggered: Run the loop on the Linux edge-triggered epoll selector.
+    :param use_tls: Accept TLS connections, with the certificate from config (tls_cert, tls_key).
     """
+    global sel, dispatcher, ssl_context
+    if use_tls and ssl_context is None:
+        # Before forking, so every worker shares the session ticket keys and a client can resume on any of them
+        ssl_context = tls.server_context()
+    if workers > 1:
+        start_workers(host, port, protocol, workers, db_workers, max_connections, backlog, edge_triggered)
+        return
+    if edge_triggered and not getattr(sel, "edge_triggered", False):
+        sel.close()
+        sel = make_selector(edge_triggered)
     try:
+        if db_workers > 0:
+            dispatcher = RequestDispatcher(db_workers)
+            sel.register(dispatcher.sock, selectors.EVENT_READ, data=dispatcher)
         # Create and configure the listening socket
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Prevents address reuse issues
+        if isinstance(active_clients, PresenceRegistry):
+            # Worker process: the kernel balances connections across the workers' sockets
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sel.register(active_clients.sock, selectors.EVENT_READ, data=active_clients)
         server_socket.bind((host, port))
-        server_socket.listen()
+        server_socket.listen(backlog)
         print(f"Server listening on {host}:{port}")
 
         server_socket.setblocking(False)  # Allow non-blocking I/O
@@ -68,11 +234,15 @@ def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, protocol=DEFAULT_PROTOCOL
 
         # Main event loop
         while True:
-            events = sel.select(timeout=None)
+            events = sel.select(timeout=select_timeout())
             # For each event from the selector
             for key, mask in events:
                 if key.data is None:
-                    accept_connection(key.fileobj, protocol)  # Accept new clients
+                    try:
+                        accept_connection(key.fileobj, protocol, max_connections)  # Accept new clients
+                    except Exception:
+                        # Keep serving the clients already connected
+                        print(f"Error accepting connections:\n{traceback.format_exc()}")
                 else:
                     handler = key.data
                     try:
@@ -81,13 +251,88 @@ def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, protocol=DEFAULT_PROTOCOL
                         print(f"Error handling {handler.addr}:\n{traceback.format_exc()}")
                         handler.close()
 
+            # Ping or close idle connections
+            run_idle_checks()
+
+            # Flush responses and pushed messages queued this iteration: one sendmsg per client
+            for handler in list(pending_writes):
+                try:
+                    handler.flush()
+                except Exception:
+                    print(f"Error sending to {handler.addr}:\n{traceback.format_exc()}")
+                    handler.close()
+
+            # Accept again if clients disconnected while at the connection limit
+            resume_accepting(max_connections)
+
     except KeyboardInterrupt:
         print("\nServer shutting down gracefully...")
+        print(f"Metrics: {dict(metrics)}")
+        for name, (count, mean_ms, max_ms) in latency.summary().items():
+            print(f"{name}: {count} requests, mean {mean_ms:.3f} ms, max {max_ms:.3f} ms")
     finally:
         sel.close()
+        if isinstance(active_clients, PresenceRegistry):
+            active_clients.close()
+        if dispatcher is not None:
+            dispatcher.close()
         # os.remove(DB_PATH)  # Cleanup database file after shutdown
 
 
+def start_workers(host, port, protocol, workers, db_workers=0, max_connections=MAX_CONNECTIONS, backlog=ACCEPT_BACKLOG, edge_triggered=False):
+    """
+    Forks worker processes that each run the event loop on their own SO_REUSEPORT socket.
+    Workers share presence and forward pushed messages over Unix datagram sockets (see presence.py).
+
+    :param host: Server host.
+    :param port: Server port shared by every worker.
+    :param protocol: Communication protocol (0 for default, 1 for custom).
+    :param workers: Number of worker processes.
+    :param db_workers: Threads handling requests in each worker.
+    :param max_connections: Maximum number of open client connections per worker.
+    :param backlog: Listen backlog of each worker's socket.
+    :param edge_triggered: Run each worker's loop on the Linux edge-triggered epoll selector.
+    """
+    global sel, active_clients
+    if not hasattr(os, "fork") or not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("Multiple workers need os.fork and SO_REUSEPORT.")
+
+    # Bind every worker's IPC socket before any worker can broadcast a login
+    registries = [PresenceRegistry(port, worker_id, workers, metrics) for worker_id in range(workers)]
+    pids = []
+    for worker_id, registry in enumerate(registries):
+        pid = os.fork()
+        if pid == 0:
+            # Child: fresh selector (an epoll instance must not be shared across processes)
+            for other in registries:
+                if other is not registry:
+                    other.sock.close()
+            sel.close()
+            sel = make_selector(edge_triggered)
+            active_clients = registry
+            print(f"Worker {worker_id} started (pid {os.getpid()})")
+            try:
+                start_server(host, port, protocol, db_workers=db_workers, max_connections=max_connections, backlog=backlog, edge_triggered=edge_triggered)
+            except Exception:
+                print(f"Worker {worker_id} failed:\n{traceback.format_exc()}")
+            finally:
+                os._exit(0)
+        pids.append(pid)
+
+    # Parent: workers own the IPC sockets now
+    for registry in registries:
+        registry.sock.close()
+    while pids:
+        try:
+            os.waitpid(pids[0], 0)
+            pids.pop(0)
+        except KeyboardInterrupt:
+            # Ctrl-C reaches the whole process group, so the workers are shutting down too
+            continue
+        except ChildProcessError:
+            pids.pop(0)
+
+
 if __name__ == "__main__":
     # Parse optional command-line arguments
     import argparse
@@ -96,6 +341,14 @@ if __name__ == "__main__":
     parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Server host (default from config)")
     parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Server port (default from config)")
     parser.add_argument("--protocol", type=int, choices=[0, 1], default=DEFAULT_PROTOCOL, help="Protocol version (0: default, 1: custom)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of event loop processes sharing the port (default 1)")
+    parser.add_argument("--db-workers", type=int, default=DB_WORKERS, help="Threads handling requests off the event loop, 0 to handle them on the loop (default from config)")
+
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS, help="Maximum open client connections per process (default from config)")
+    parser.add_argument("--backlog", type=int, default=ACCEPT_BACKLOG, help="Listen backlog for pending connections (default from config)")
+    parser.add_argument("--edge-triggered", action=argparse.BooleanOptionalAction, default=EDGE_TRIGGERED, help="Use the Linux edge-triggered epoll loop (default from config)")
+    parser.add_argument("--tls", action=argparse.BooleanOptionalAction, default=tls.TLS_ENABLED, help="Accept TLS connections (default from config)")
 
     args = parser.parse_args()
-    start_server(host=args.host, port=args.port, protocol=args.protocol)
\ No newline at end of file
+    start_server(host=args.host, port=args.port, protocol=args.protocol, workers=args.workers, db_workers=args.db_workers,
+                 max_connections=args.max_connections, backlog=args.backlog, edge_triggered=args.edge_triggered, use_tls=args.tls)
\ No newline at end of file
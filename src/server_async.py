@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import yaml
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import server_handler
+from server_handler import HIGH_WATERMARK, LOW_WATERMARK
+from router import ROUTER, LatencyStats
+import tls
+from utils import database_setup
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Load configuration from YAML file
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+# Default values from config
+DEFAULT_HOST = config.get("host", "127.0.0.1")
+DEFAULT_PORT = config.get("port", 65432)
+DEFAULT_PROTOCOL = config.get("protocol", 0)
+DB_PATH = config.get("db_path", "server.db")
+DB_WORKERS = config.get("db_workers", 4)
+
+# Active clients mapping (username -> handler)
+active_clients = {}
+# Server-wide counters, e.g. pushed messages deferred by backpressure
+metrics = Counter()
+# Per-operation handler latency, recorded by the request router
+latency = LatencyStats()
+ROUTER.add_hook(latency)
+
+class AsyncHandlerMixin(asyncio.Protocol):
+    """ Runs a server_handler stub as an asyncio protocol instead of on the selectors loop.
+
+    Frames are parsed on the event loop. Each request is then handled (decoded, run against the database and packaged)
+    on a thread pool, so database calls never block other connections. A connection's requests are handled one at a
+    time in arrival order: the next frame is only parsed once the previous request is done. Responses and pushed
+    messages are written through the transport from the event loop thread.
+
+    Backpressure uses the transport's flow control. Writing pauses above HIGH_WATERMARK buffered bytes and resumes below
+    LOW_WATERMARK, and pushed messages are stored as undelivered while it is paused.
+
+    Methods:
+    - connection_made(self, transport): Set up handler state and start serving requests.
+    - data_received(self, data): Buffer received bytes and wake the request task.
+    - connection_lost(self, exc): Remove the user from active clients and stop the request task.
+    - pause_writing(self): Stop accepting pushed messages.
+    - resume_writing(self): Accept pushed messages again.
+    - _serve_requests(self): Handle buffered requests in order, one at a time.
+    - _queue_send(self, message): Write a packaged message from any thread.
+    - _accepting_pushes(self): Whether pushed messages may be queued.
+    - close(self): Close the transport.
+    """
+    _content_as_view = False # Content is handled on another thread while the receive buffer keeps growing
+
+    def __init__(self, db_path, active_clients, metrics, executor):
+        # Handler state is set up in connection_made, once the peer address is known
+        self._db_path = db_path
+        self._active_clients = active_clients
+        self._metrics = metrics
+        self.executor = executor
+
+    def connection_made(self, transport):
+        super().__init__(None, None, transport.get_extra_info("peername"), self._db_path, self._active_clients, None, self._metrics)
+        self.transport = transport
+        self.transport.set_write_buffer_limits(high=HIGH_WATERMARK, low=LOW_WATERMARK)
+        # The transport completed any TLS handshake before calling connection_made
+        ssl_object = transport.get_extra_info("ssl_object")
+        if ssl_object is not None:
+            self.metrics["tls_resumed" if ssl_object.session_reused else "tls_full_handshakes"] += 1
+        self._loop = asyncio.get_running_loop()
+        self._data_ready = asyncio.Event()
+        self._frame = None # (header, content) of the frame being handled
+        self._task = self._loop.create_task(self._serve_requests())
+
+    def data_received(self, data):
+        self._recv_buffer += data
+        self._data_ready.set()
+
+    def connection_lost(self, exc):
+        self._remove_active_client()
+        self._task.cancel()
+        logging.info(f"Connection to {self.addr} closed.")
+
+    def pause_writing(self):
+        self._backpressured = True
+        logging.warning(f"Send buffer for {self.addr} passed {HIGH_WATERMARK} bytes, deferring pushed messages.")
+
+    def resume_writing(self):
+        self._backpressured = False
+
+    def _handle_frame(self, content_bytes):
+        """Keep the frame for _serve_requests, which hands it to the thread pool."""
+        self._frame = (self._header, content_bytes)
+
+    async def _serve_requests(self):
+        """Handle buffered requests in arrival order, one at a time, on the thread pool."""
+        try:
+            while True:
+                self._frame = None
+                if not self._drain_frames(max_frames=1):
+                    # No complete request buffered
+                    self._data_ready.clear()
+                    await self._data_ready.wait()
+                    continue
+                if self._frame is None:
+                    # Rejected (see _reject_frame) without reaching the pool
+                    continue
+                # The parser is idle until this request is done, so self._header is stable while the pool uses it
+                self._header, content = self._frame
+                await self._loop.run_in_executor(self.executor, self._process_frame, content)
+                self._header = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error handling {self.addr}: {e!r}")
+            self.close()
+
+    def _queue_send(self, message):
+        """Write a packaged message. Safe to call from the thread pool."""
+        self._loop.call_soon_threadsafe(self._write, message)
+
+    def _write(self, message):
+        if not self.transport.is_closing():
+            self.transport.write(message)
+
+    def _accepting_pushes(self):
+        return not self._backpressured
+
+    def close(self):
+        self.transport.close()
+
+class AsyncMessage(AsyncHandlerMixin, server_handler.Message):
+    """ JSON protocol handler for the asyncio server. """
+
+class AsyncMessageCustom(AsyncHandlerMixin, server_handler.MessageCustom):
+    """ Custom protocol handler for the asyncio server. """
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, protocol=DEFAULT_PROTOCOL, db_workers=DB_WORKERS, ssl_context=None):
+    """
+    Starts the asyncio server and serves until cancelled.
+
+    :param host: Server host (default from config).
+    :param port: Server port (default from config).
+    :param protocol: Communication protocol (0 for default, 1 for custom).
+    :param db_workers: Number of threads running database work.
+    :param ssl_context: Shared server SSLContext to accept TLS connections with, or None for plain TCP.
+    """
+    loop = asyncio.get_running_loop()
+    handler_class = AsyncMessage if protocol == 0 else AsyncMessageCustom
+    with ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="db") as executor:
+        server = await loop.create_server(
+            lambda: handler_class(DB_PATH, active_clients, metrics, executor),
+            host, port, reuse_address=True, ssl=ssl_context)
+        print(f"Server listening on {host}:{port} ({type(loop).__module__} event loop)")
+        async with server:
+            await server.serve_forever()
+
+def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, protocol=DEFAULT_PROTOCOL, db_workers=DB_WORKERS, use_tls=False):
+    """
+    Runs the asyncio server, on uvloop when it is installed.
+
+    :param host: Server host (default from config).
+    :param port: Server port (default from config).
+    :param protocol: Communication protocol (0 for default, 1 for custom).
+    :param db_workers: Number of threads running database work.
+    :param use_tls: Accept TLS connections, with the certificate from config (tls_cert, tls_key).
+    """
+    database_setup(DB_PATH)
+    ssl_context = tls.server_context() if use_tls else None
+    run = uvloop.run if uvloop is not None else asyncio.run
+    try:
+        run(serve(host, port, protocol, db_workers, ssl_context))
+    except KeyboardInterrupt:
+        print("\nServer shutting down gracefully...")
+        print(f"Metrics: {dict(metrics)}")
+        for name, (count, mean_ms, max_ms) in latency.summary().items():
+            print(f"{name}: {count} requests, mean {mean_ms:.3f} ms, max {max_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    # Parse optional command-line arguments
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Start the asyncio chat server.")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Server host (default from config)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Server port (default from config)")
+    parser.add_argument("--protocol", type=int, choices=[0, 1], default=DEFAULT_PROTOCOL, help="Protocol version (0: default, 1: custom)")
+    parser.add_argument("--db-workers", type=int, default=DB_WORKERS, help="Threads running database work (default from config)")
+    parser.add_argument("--tls", action=argparse.BooleanOptionalAction, default=tls.TLS_ENABLED, help="Accept TLS connections (default from config)")
+
+    args = parser.parse_args()
+    start_server(host=args.host, port=args.port, protocol=args.protocol, db_workers=args.db_workers, use_tls=args.tls)
@@ -12,9 +12,17 @@ import time
 import ssl
 import logging
 from database import DatabaseHandler
-from utils import ResponseCode, apply_action
+from utils import ResponseCode, OpCode, apply_action
+from router import ROUTER
+import compression
+import tls
+from peer_channels import PeerChannels, SERVER_OPTIONS
+from raft_log import RaftLog
+import snapshot
+import election
 import handler_pb2
 import handler_pb2_grpc
+from google.protobuf import empty_pb2
 from concurrent import futures
 
 import grpc
@@ -28,6 +36,25 @@ with open(yaml_path, "r") as y:
 MIN_MESSAGE_LEN = config["min_message_len"]
 MAX_MESSAGE_LEN = config["max_message_len"]
 HEARTBEAT_LEN = config["heartbeat_len"]
+# The leader serves reads without contacting followers for this long after a majority acknowledged a heartbeat. Must
+# stay below election_timeout_min: followers that heard from the leader more recently refuse to elect a new one
+READ_LEASE = config.get("read_lease", HEARTBEAT_LEN / 2)
+READ_INDEX_TIMEOUT = config.get("read_index_timeout", 1.0) # Seconds a read waits for a heartbeat round once the lease has lapsed
+READ_MAX_STALENESS = config.get("read_max_staleness", 1.0) # Seconds behind the leader a BOUNDED_STALENESS read may be, unless the request sets it
+MAX_BATCH = config.get("append_entries_batch", 512) # Most entries sent to a follower in one AppendEntries
+RPC_TIMEOUT = config.get("raft_rpc_timeout", 0.25) # Deadline in seconds for each Vote/AppendEntries sent to a peer
+WRITE_BATCH_ENTRIES = config.get("write_batch_entries", 256) # Client writes that start a replication round without waiting out WRITE_BATCH_DELAY
+WRITE_BATCH_DELAY = config.get("write_batch_delay", 0.002) # Seconds the leader waits after a client write for more to share its round
+COMMIT_TIMEOUT = config.get("commit_timeout", 5.0) # Seconds a client write waits for its entry to commit before the RPC fails
+APPLY_BATCH = config.get("apply_batch", 4096) # Most committed entries applied to the database in one transaction
+SNAPSHOT_ENTRIES = config.get("snapshot_entries", 10000) # Entries applied since the last snapshot that trigger a new one (0: never)
+SNAPSHOT_CHUNK = config.get("snapshot_chunk_bytes", 1 << 20) # Bytes per InstallSnapshot message
+SNAPSHOT_TIMEOUT = config.get("snapshot_timeout", 60) # Deadline in seconds for streaming a snapshot to a follower
+GRPC_COMPRESSION = {
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+    "none": grpc.Compression.NoCompression,
+}[config.get("grpc_compression", "gzip")]
 
 # Load server configuration
 idx = int(sys.argv[1])
@@ -36,6 +63,9 @@ host = server_config.get("host", "localhost")
 port = server_config.get("port", 65432)
 DB_PATH = server_config.get('db_path', "../data/s{idx}.db")
 LOG_PATH = server_config.get('log_path', "../log/s{idx}.log")
+WAL_PATH = server_config.get('wal_path', os.path.splitext(DB_PATH)[0] + ".wal") # Directory of the durable Raft log
+SNAPSHOT_PATH = server_config.get('snapshot_path', os.path.splitext(DB_PATH)[0] + ".snapshot.db")
+ELECTION_PATH = server_config.get('election_path', os.path.splitext(DB_PATH)[0] + ".election.json") # Persisted term and vote
 
 # Global variables
 active_clients = {} # Active clients mapping (username -> socket)
@@ -62,95 +92,155 @@ class Role:
 
 role: int = Role.FOLLOWER               # initial role
 leader_addr: str = None                 # <host>:<port>, like "localhost:50051"
-voted_for: int = None                   # candidate ID   
+election_state = election.ElectionState(ELECTION_PATH) # durable copy of term and voted_for
+voted_for: int = election_state.voted_for # candidate ID voted for in the current term
 n_servers = config.get("n_servers", 5)  # number of servers
 all_servers = [f"{config.get('servers')[i]['host']}:{config.get('servers')[i]['port']}" for i in range(n_servers)]                       # list of all server addresses
-logs = []                               # log of all actions for replication
-term = 0                                # tracks election cycle and log consistency 
-commit_idx = 0                          # highest log index known to be safely replicated
+self_addr = f"{host}:{port}"
+peers = [s for s in all_servers if s != self_addr] # other servers
+logs = RaftLog(WAL_PATH)                # durable log of all actions for replication; log index i (from 1) is logs[i - 1]
+term = election_state.term              # tracks election cycle and log consistency 
+commit_idx = 0                          # highest log index known to be safely replicated (0: none)
+last_applied = 0                        # highest log index applied to the database, also stored in it (raft_applied)
+applier = DatabaseHandler(DB_PATH)      # long-lived handler committed entries are applied through, under apply_lock
+apply_lock = threading.Lock()           # held while entries are applied, so a snapshot sees the database at last_applied
+applied_cond = threading.Condition(apply_lock) # notified when last_applied advances
+proposals = {}                          # (leader) log index -> Proposal of a client write waiting for the entry to commit
+replicate_cond = threading.Condition()  # (leader) notified when a replication round should start
+unsent = 0                              # (leader) wake-ups (mostly client writes) since the last replication round
+snapshot_index = 0                      # last log index (and its term) in the snapshot at SNAPSHOT_PATH
+snapshot_term = 0
+snapshot_lock = threading.Lock()        # guards SNAPSHOT_PATH and snapshot_index/snapshot_term
+snapshot_running = threading.Event()    # set while a snapshot is taken in the background
+snapshot_retry = {}                     # (leader) peer -> monotonic time before which a failed snapshot transfer is not retried
+next_idx = {}                           # (leader) peer -> index of the next entry to send it
+match_idx = {}                          # (leader) peer -> highest index known to be stored on it
+raft_lock = threading.RLock()           # guards logs, term, commit_idx and the replication state
+peer_channels = PeerChannels()          # one long-lived channel per peer
 votes_recv = 0                          # number of votes received
 last_heartbeat = time.time()            # last time a heartbeat was received
-timer = random.randint(0,3)             # election timer
+leadership_confirmed = 0.0              # (leader) monotonic start time of the last heartbeat round a majority acknowledged
+leader_since = 0.0                      # (leader) monotonic time this server won its election
+caught_up = 0.0                         # (follower) monotonic time of the last AppendEntries after which it had applied the leader's commit index
+lease_cond = threading.Condition()      # notified when leadership_confirmed advances
+timer = time.time() + election.timeout() # election timer: an election starts once it passes without word from a leader
 
 class HandlerService(handler_pb2_grpc.HandlerServicer):
     """
-    Handles standard communication between the server and a client using JSON encoding. Each RPC call logs to 'logs' for replication purposes, then applies the requested DB operation.
+    Handles standard communication between the server and a client using JSON encoding. RPCs that change the database append an entry to 'logs' for replication and return once it commits and is applied (see Proposal); reads are served from the local database (see read_barrier).
+    Operations run through the router shared with the socket servers (router.ROUTER); this class converts between protobuf messages and router arguments and results.
     """
     def __init__(self):
         global active_clients, logs
         self.db_path = DB_PATH
+        self.db = DatabaseHandler(self.db_path) # Opens a connection per call, so safe to share across RPC threads
 
     def set_path(self, path):
         """Changes the DB path if needed for testing purposes"""
         self.db_path = path
+        self.db = DatabaseHandler(self.db_path)
+
+    def on_login(self, username):
+        """Mark user as active"""
+        with lock:
+            active_clients[username] = queue.Queue()
+
+    def _execute(self, opcode, args, context, read=None, **entry):
+        """Run an operation through the router. Writes (ROUTER.is_write) are proposed: appended to 'logs' as an Entry
+        built from the entry keyword, and run through the router once it commits (see propose). Reads and session
+        operations are not replicated and wait for read_barrier instead, or for read_allowed if the request ('read')
+        chooses its consistency"""
+        if ROUTER.is_write(opcode):
+            proposal = propose(opcode, args, **entry)
+            if proposal is None:
+                self._unavailable(context, f"[RAFT] Write rejected, not the leader | op: {opcode.name}",
+                                  "Not the leader, retry on the current leader")
+            if not proposal.wait(COMMIT_TIMEOUT):
+                self._unavailable(context, f"[RAFT] Write not applied | op: {opcode.name}, index: {proposal.index}",
+                                  "The write did not commit in time or was overwritten by a new leader")
+            return proposal.result
+        elif read is not None:
+            if not read_allowed(read.consistency, read.max_staleness_ms):
+                mode = handler_pb2.ReadConsistency.Name(read.consistency)
+                self._unavailable(context, f"[RAFT] Read rejected | op: {opcode.name}, consistency: {mode}",
+                                  f"This server cannot serve a {mode} read now, retry on another server or the leader")
+        elif not read_barrier():
+            self._unavailable(context, f"[RAFT] Read rejected, leadership not confirmed | op: {opcode.name}",
+                              "Leadership could not be confirmed, retry on the current leader")
+        return ROUTER.dispatch(opcode.value, self, args)
+
+    @staticmethod
+    def _unavailable(context, log, details):
+        """Fail the RPC with UNAVAILABLE, so the client retries on the current leader"""
+        logging.error(log)
+        if context is not None:
+            context.abort(grpc.StatusCode.UNAVAILABLE, details)
+        raise RuntimeError(details)
+
+    @staticmethod
+    def _messages(data):
+        """Convert message rows (id, sender, receiver, content, timestamp, ...) to protobuf messages"""
+        return [handler_pb2.Message(id=m[0],
+                                    sender=m[1],
+                                    receiver=m[2],
+                                    content=m[3],
+                                    timestamp=m[4])
+                                    for m in data]
+
+    @staticmethod
+    def _compress_reply(response, context):
+        """Compress a response over the compression threshold; small responses are sent as-is.
+        gRPC only compresses when the client accepts the algorithm."""
+        if context is not None and response.ByteSize() >= compression.THRESHOLD:
+            context.set_compression(GRPC_COMPRESSION)
+        return response
 
     def Starting(self, request, context):
         """Ping to verify connection"""
         response = handler_pb2.StartingResponse()
-        response.status_code = ResponseCode.SUCCESS.value
-        response.status_code = ResponseCode.SUCCESS.value
+        response.status_code = ROUTER.dispatch(OpCode.STARTING.value, self, [])["status_code"]
         return response
     
     def CheckAccountExists(self, request, context):
         """Check if an account with the given username exists"""
         # Add a new log entry
-        logs.append(handler_pb2.Entry(acc_exists=request))
 
-        # Create fresh DB instance
-        db = DatabaseHandler(self.db_path)
         # Process the request
         response = handler_pb2.AccountExistsResponse()
-        exists = db.account_exists(request.username)
+        result = self._execute(OpCode.ACCOUNT_EXISTS, [request.username], context, read=request)
         # Package the response
-        if not exists:
-            response.status_code = ResponseCode.ACCOUNT_NOT_FOUND.value
-        else:
-            response.status_code = ResponseCode.ACCOUNT_EXISTS.value
+        response.status_code = result["status_code"]
+        if result["status_code"] == ResponseCode.ACCOUNT_EXISTS.value:
             response.exists = True
         return response
 
     def CreateAccount(self, request, context):
         """Create a new account (username, password, bio)"""
-        logs.append(handler_pb2.Entry(create_acc=request))
-        db = DatabaseHandler(self.db_path)
 
         response = handler_pb2.CreateAccountResponse()
-        result = db.create_account(request.username, request.password, request.bio)
+        result = self._execute(OpCode.CREATE_ACCOUNT, [request.username, request.password, request.bio], context, create_acc=request)
         response.status_code = result["status_code"]
         return response
     
     def LoginAccount(self, request, context):
         """Login to an existing account (username, password), returns some unread messages """
-        logs.append(handler_pb2.Entry(login_acc=request))
-        db = DatabaseHandler(self.db_path)
         
         response = handler_pb2.LoginAccountResponse()
-        result = db.login_account(request.username, request.password)
+        # Marks the user as active (on_login) if login was successful
+        result = self._execute(OpCode.LOGIN_ACCOUNT, [request.username, request.password], context)
         response.status_code = result["status_code"]
         # Fetch the messages if login was successful
         if result["status_code"] == ResponseCode.SUCCESS.value:
             data = result["data"]
             response.count = data.pop(0)
-            data = [handler_pb2.Message(id=m[0],
-                                        sender=m[1],
-                                        receiver=m[2],
-                                        content=m[3],
-                                        timestamp=m[4])
-                                        for m in data]
-            response.msg_lst.extend(data)
-
-            # Mark user as active
-            with lock:
-                active_clients[request.username] = queue.Queue()
-        return response
+            response.msg_lst.extend(self._messages(data))
+        return self._compress_reply(response, context)
         
     def ListAccount(self, request, context):
         """List all accounts matching an optoinal pattern"""
-        logs.append(handler_pb2.Entry(list_acc=request))
-        db = DatabaseHandler(self.db_path)  # Create fresh DB instance
         
         response = handler_pb2.ListAccountResponse()
-        result = db.list_accounts(pattern=request.pattern or "")
+        result = self._execute(OpCode.LIST_ACCOUNTS, [request.pattern or ""], context, read=request)
         response.status_code = result["status_code"]
         if result["status_code"] == ResponseCode.SUCCESS.value:
             data = result["data"]
@@ -163,158 +253,77 @@ class HandlerService(handler_pb2_grpc.HandlerServicer):
                     for a in data
                 ]
             response.acct_lst.extend(pb_accts)
-        return response 
+        return self._compress_reply(response, context) 
     
     def DeleteAccount(self, request, context):
         """Deletes an account (username, password)"""
-        logs.append(handler_pb2.Entry(delete_acc=request))
-        db = DatabaseHandler(self.db_path)
 
         response = handler_pb2.DeleteAccountResponse()
-        result = db.delete_account(request.username, request.password)
+        result = self._execute(OpCode.DELETE_ACCOUNT, [request.username, request.password], context, delete_acc=request)
         response.status_code = result["status_code"]
         return response
 
     def FetchHomepage(self, request, context):
         """Fetches homepage data for a user"""
-        logs.append(handler_pb2.Entry(fetch_homepage=request))
-        db = DatabaseHandler(self.db_path)
 
         response = handler_pb2.FetchHomepageResponse()
-        result = db.fetch_homepage(request.username)
+        result = self._execute(OpCode.HOMEPAGE, [request.username], context)
         response.status_code = result["status_code"]
         if result["status_code"] == ResponseCode.SUCCESS.value:
             data = result["data"]
-            data = [
-                handler_pb2.Message(
-                    id=m[0],
-                    sender=m[1],
-                    receiver=m[2],
-                    content=m[3],
-                    timestamp=m[4]
-                )
-                for m in data
-            ]
-            response.msg_lst.extend(data)
-        return response 
+            response.count = data.pop(0)
+            response.msg_lst.extend(self._messages(data))
+        return self._compress_reply(response, context) 
 
     def FetchMessageRead(self, request, context):
         """Fetches the last N delivered (read) messages"""
-        logs.append(handler_pb2.Entry(fetch_read=request))
-        db = DatabaseHandler(self.db_path)
 
         response = handler_pb2.FetchMessagesReadResponse()
-        result = db.fetch_messages_delivered(request.username, request.num)
+        result = self._execute(OpCode.READ_MSG_DELIVERED, [request.username, request.num], context, read=request)
         response.status_code = result["status_code"]
         if result["status_code"] == ResponseCode.SUCCESS.value:
-            data = result["data"]
-            data = [
-                handler_pb2.Message(
-                    id=m[0],
-                    sender=m[1],
-                    receiver=m[2],
-                    content=m[3],
-                    timestamp=m[4]
-                )
-                for m in data
-            ]
-            response.msg_lst.extend(data)
-        return response 
+            response.msg_lst.extend(self._messages(result["data"]))
+        return self._compress_reply(response, context) 
 
     def FetchMessageUnread(self, request, context):
         """Fetches the last N undelivered (unread) messages"""
-        logs.append(handler_pb2.Entry(fetch_read=request))
-        db = DatabaseHandler(self.db_path)  # Create fresh DB instance
         
         response = handler_pb2.FetchMessagesUnreadResponse()
-        result = db.fetch_messages_undelivered(request.username, request.num)
+        result = self._execute(OpCode.READ_MSG_UNDELIVERED, [request.username, request.num], context, fetch_unread=request)
         response.status_code = result["status_code"]
         if result["status_code"] == ResponseCode.SUCCESS.value:
             data = result["data"]
             response.count = data.pop(0)
-            pb_msgs = [
-                handler_pb2.Message(
-                    id=m[0],
-                    sender=m[1],
-                    receiver=m[2],
-                    content=m[3],
-                    timestamp=m[4]
-                )
-                for m in data
-            ]
-            response.msg_lst.extend(pb_msgs)
-        return response
+            response.msg_lst.extend(self._messages(data))
+        return self._compress_reply(response, context)
 
     def DeleteMessage(self, request, context):
         """Delete specific messages by ID"""
-        logs.append(handler_pb2.Entry(delete_msg=request))
-        db = DatabaseHandler(self.db_path)
 
         response = handler_pb2.DeleteMessageResponse()
-        result = db.delete_messages(request.username, request.message_id_lst)
+        result = self._execute(OpCode.DELETE_MSG, [request.username, list(request.message_id_lst)], context, delete_msg=request)
         response.status_code = result["status_code"]
         if result["status_code"] == ResponseCode.SUCCESS.value:
             data = result["data"]
             response.count = data.pop(0)
-            pb_msgs = [
-                handler_pb2.Message(
-                    id=m[0],
-                    sender=m[1],
-                    receiver=m[2],
-                    content=m[3],
-                    timestamp=m[4]
-                )
-                for m in data
-            ]
-            response.msg_lst.extend(pb_msgs)
-        return response
+            response.msg_lst.extend(self._messages(data))
+        return self._compress_reply(response, context)
     
-    def SendMessage(self, request_iterator, context):
+    def SendMessage(self, request, context):
         """
-        Client-streaming RPC:
-        - Each "SendMessageRequest" from the iterator is a single message
-        - Insert the message into the database
+        Insert the message into the database
         - If the receiver is online, immediately push the message to their queue
         """
-        db = DatabaseHandler(self.db_path)
-        delivered_count = 0
-        total_count = 0
-
-        for req in request_iterator:
-            sender = req.sender
-            receiver = req.receiver
-            content = req.content
-            timestamp = round(time.time())
-
-            # Add to 'logs' for replication
-            req.timestamp = timestamp
-            logs.append(handler_pb2.Entry(send_msg=req))
+        # The leader stamps the message time and decides whether it is delivered (pushed to the receiver, online here),
+        # so every replica stores the same row
+        with lock:
+            delivered = request.receiver in active_clients
+        send_msg = handler_pb2.SendMessageRequest(sender=request.sender, receiver=request.receiver, content=request.content,
+                                                  timestamp=round(time.time()), delivered=delivered)
+        result = self._execute(OpCode.SEND_MSG, [request.sender, request.receiver, request.content], context, send_msg=send_msg)
 
-            # Mark as delivered if receiver is online
-            with lock:
-                is_online = receiver in active_clients
-
-            result = db.insert_message(sender, receiver, content, timestamp, is_online)
-            total_count += 1
-            if result["status_code"] == ResponseCode.SUCCESS.value:
-                # If receiver is online, push to their queue
-                if is_online:
-                    with lock:
-                        msg = handler_pb2.Message(
-                            id=result["data"][0],  # e.g. DB returns newly inserted ID
-                            sender=sender,
-                            receiver=receiver,
-                            content=content,
-                            timestamp=timestamp
-                        )
-                        active_clients[receiver].put(msg)
-                    delivered_count += 1
-
-        # Build a final, single response
         response = handler_pb2.SendMessageResponse()
-        response.status_code = ResponseCode.SUCCESS.value
-        # response.delivered_count = delivered_count
-        # response.total_count = total_count
+        response.status_code = result["status_code"]
         return response
     
     def ReceiveMessage(self, request, context):
@@ -322,7 +331,6 @@ class HandlerService(handler_pb2_grpc.HandlerServicer):
         Continuously stream new messages to the client
         - Yields new messages from the user's queue as they arrive
         """
-        logs.append(handler_pb2.Entry(receive_msg=request))
         username = request.username
         with lock:
             if username not in active_clients:
@@ -330,6 +338,8 @@ class HandlerService(handler_pb2_grpc.HandlerServicer):
                 return
             user_queue = active_clients[username]
 
+        if context is not None:
+            context.set_compression(GRPC_COMPRESSION)
         while True:
             try:
                 # block for up to 30s waiting for a new message
@@ -337,6 +347,8 @@ class HandlerService(handler_pb2_grpc.HandlerServicer):
                 msg = user_queue.get(block=True)
                 response = handler_pb2.ReceiveMessageResponse()
                 response.msg_lst.append(msg)
+                if context is not None and response.ByteSize() < compression.THRESHOLD:
+                    context.disable_next_message_compression()
                 yield response
 
             except queue.Empty:
@@ -345,7 +357,6 @@ class HandlerService(handler_pb2_grpc.HandlerServicer):
 
     def Ending(self, request, context):
         """Removes a client from active_clients (logout)."""
-        logs.append(handler_pb2.Entry(ending=request))
         username = request.username
         with lock:
             if username in active_clients:
@@ -354,64 +365,693 @@ class HandlerService(handler_pb2_grpc.HandlerServicer):
                 response.status_code = ResponseCode.SUCCESS.value
                 return response
             
+def append_entry(**entry):
+    """Append an Entry for a client write to the log, stamped with the current term. Returns its log index"""
+    with raft_lock:
+        logs.append(handler_pb2.Entry(term=term, **entry))
+        return len(logs)
+
+class Proposal:
+    """ A client write on the leader, waiting for its log entry to commit. Once the entry at its index commits in the
+    term it was proposed in, apply_committed runs the write through the router with the proposal as the context, so
+    the handler writes through the applier inside the apply transaction and its result goes back to the client. If a
+    new leader commits another entry at that index instead, the proposal fails.
+
+    Methods:
+    - apply(self, db): Run the write through the router on db and keep its result.
+    - wait(self, timeout): Block until the write was applied or failed. Returns True if it was applied.
+    - send_message(self, sender, receiver, content): Router context: store a message with the entry's time stamp and
+      delivered flag, and push it to the receiver if it is delivered.
+    """
+    def __init__(self, opcode, args, index, term, entry):
+        self.opcode = opcode
+        self.args = args
+        self.index = index
+        self.term = term
+        self.entry = entry      # Entry fields the write was logged with
+        self.db = None          # the applier while the write is applied
+        self.result = None      # router result; None if the proposal failed
+        self.done = False       # set under apply_lock once applied or failed
+
+    def apply(self, db):
+        self.db = db
+        self.result = ROUTER.dispatch(self.opcode.value, self, self.args)
+
+    def wait(self, timeout):
+        with applied_cond:
+            if not applied_cond.wait_for(lambda: self.done, timeout) and proposals.get(self.index) is self:
+                del proposals[self.index]
+        return self.result is not None
+
+    def send_message(self, sender, receiver, content):
+        timestamp = self.entry["send_msg"].timestamp
+        # Delivered was decided when the write was logged, as followers apply it (see utils.apply_action)
+        delivered = self.entry["send_msg"].delivered
+        result = self.db.insert_message(sender, receiver, content, timestamp, delivered)
+        # If receiver is online, push to their queue
+        if result["status_code"] == ResponseCode.SUCCESS.value and delivered:
+            with lock:
+                msg = handler_pb2.Message(
+                    id=result["data"][0],  # e.g. DB returns newly inserted ID
+                    sender=sender,
+                    receiver=receiver,
+                    content=content,
+                    timestamp=timestamp
+                )
+                if receiver in active_clients:
+                    active_clients[receiver].put(msg)
+        return result
+
+def propose(opcode, args, **entry):
+    """Leader: append a client write to the log and wake the replicator. Returns its Proposal to wait on, or None if
+    this server is not the leader"""
+    with raft_lock:
+        if role != Role.LEADER:
+            return None
+        index = append_entry(**entry)
+        proposal = proposals[index] = Proposal(opcode, args, index, term, entry)
+    wake_replicator()
+    return proposal
+
+def wake_replicator():
+    """Leader: start the next replication round now instead of at the next heartbeat"""
+    global unsent
+    with replicate_cond:
+        unsent += 1
+        replicate_cond.notify()
+
+def wait_for_writes(timeout):
+    """Leader: block until the replicator is woken (client writes, or a follower still behind) or timeout passes and a
+    heartbeat is due. After a wake-up, wait up to WRITE_BATCH_DELAY for WRITE_BATCH_ENTRIES, so concurrent writes
+    share one fsync and one AppendEntries per follower"""
+    global unsent
+    with replicate_cond:
+        if replicate_cond.wait_for(lambda: unsent > 0, timeout) and WRITE_BATCH_DELAY:
+            replicate_cond.wait_for(lambda: unsent >= WRITE_BATCH_ENTRIES, WRITE_BATCH_DELAY)
+        unsent = 0
+
+def replicate():
+    """Leader: one replication round. Sends every follower its missing entries (an empty AppendEntries is the
+    heartbeat), then commits and applies what a majority stored"""
+    global role, leader_addr, last_heartbeat
+    round_start = time.monotonic()
+    last_heartbeat = time.time()
+    # One fsync covers every client write since the last round
+    logs.sync()
+    # Followers whose next entries were compacted away get the snapshot instead
+    install_snapshots()
+    acked = FanOut("AppendEntries", append_entries_request, handle_append_response).wait(RPC_TIMEOUT)
+    if role != Role.LEADER:
+        # A follower has seen a newer term: handle_append_response stepped down
+        logging.info(f"[RAFT] Lost leader role | term: {term}")
+    # If a majority acknowledged (stragglers are handled as their answers arrive)
+    elif acked:
+        # Commit change --> move forward index
+        advance_commit()
+        apply_committed()
+        # Leadership held when the round started: renews the read lease
+        confirm_leadership(round_start)
+    elif time.monotonic() - max(leadership_confirmed, leader_since) > election.TIMEOUT_MIN:
+        # No majority for a whole election timeout: the others may have elected a new leader by now
+        role = Role.FOLLOWER
+        leader_addr = None
+        logging.info(f"[RAFT] Lost leader role, no majority | term: {term}")
+
+def term_at(index):
+    """Term of the entry at log index (from 1); 0 for index 0, the empty prefix"""
+    return logs.term(index)
+
+def become_leader():
+    """Take the leader role after winning an election: every follower is assumed up to date until it rejects. A no-op
+    entry of the new term is appended, as entries from earlier terms only commit along with one from the current term"""
+    global role, leader_addr, next_idx, match_idx, leader_since
+    with raft_lock:
+        role = Role.LEADER
+        leader_addr = self_addr
+        leader_since = time.monotonic()
+        next_idx = {s: len(logs) + 1 for s in peers}
+        match_idx = {s: 0 for s in peers}
+        append_entry()
+
+def append_entries_request(peer):
+    """AppendEntries for a follower: the entries from its nextIndex on, at most MAX_BATCH (none if it is up to date).
+    None if those entries were compacted away: the follower needs the snapshot instead (see install_snapshots)"""
+    with raft_lock:
+        if next_idx[peer] <= logs.base_index:
+            return None
+        prev = next_idx[peer] - 1
+        return handler_pb2.AppendEntriesRequest(
+            leader_addr=leader_addr,
+            term=term,
+            prev_log_idx=prev,
+            prev_log_term=term_at(prev),
+            entries=logs[prev:prev + MAX_BATCH],
+            commit=commit_idx)
+
+def handle_append_response(peer, request, response):
+    """Update a follower's replication state from its answer. Returns False if it has seen a newer term, in which
+    case this server steps down, or if the request was sent in an earlier term (or before losing leadership): a
+    delayed answer says nothing about the follower's log in this term"""
+    with raft_lock:
+        if response.term > term:
+            step_down(peer, response.term)
+            return False
+        if request.term != term or role != Role.LEADER:
+            logging.info(f"[RAFT] Dropped stale AppendEntries response | server: {peer}, request.term: {request.term}, term: {term}")
+            return False
+        if response.success:
+            match_idx[peer] = max(match_idx[peer], response.match_idx)
+            next_idx[peer] = match_idx[peer] + 1
+            # Commit as soon as a majority stores an entry, not at the end of the heartbeat round
+            advance_commit()
+            if next_idx[peer] <= len(logs):
+                # Entries were appended while this AppendEntries was in flight: send them now
+                wake_replicator()
+        else:
+            next_idx[peer] = backoff_index(response)
+            logging.info(f"[RAFT] Log mismatch | server: {peer}, conflict_term: {response.conflict_term}, next_idx: {next_idx[peer]}")
+        return True
+
+def step_down(peer, new_term):
+    """A peer has seen a newer term, so become a follower in it"""
+    global role, leader_addr
+    with raft_lock:
+        logging.info(f"[RAFT] Stepping down, newer term | server: {peer}, term: {term}, response.term: {new_term}")
+        set_term(new_term)
+        role = Role.FOLLOWER
+        leader_addr = None
+
+def set_term(new_term, vote=None):
+    """Move to new_term, or vote in the current one, and persist both before answering anyone: a restarted server
+    never votes twice in a term. Called under raft_lock"""
+    global term, voted_for
+    term, voted_for = new_term, vote
+    election_state.save(term, voted_for)
+
+def reset_election_timer():
+    """Push the next election back by a fresh randomized timeout"""
+    global timer
+    timer = time.time() + election.timeout()
+
+def run_election():
+    """
+    Follower or candidate whose election timer ran out without word from a leader.
+    - PreVote: ask the peers whether they would vote for this server in the next term, without changing any state.
+      A server cut off from the others fails here instead of raising its term and disrupting the cluster on its return
+    - Vote: with a majority of pre-votes, move to the next term, vote for itself and ask for the peers' votes
+    The timer is redrawn first, so after a split vote the candidates retry at different times
+    """
+    global role, votes_recv
+    reset_election_timer()
+    heard = last_heartbeat
+    if not FanOut("PreVote", lambda peer: vote_request(peer, pre_vote=True), handle_vote_response).wait(RPC_TIMEOUT):
+        logging.info(f"[RAFT] PreVote failed | term: {term}")
+        return
+    with raft_lock:
+        if role == Role.LEADER or last_heartbeat != heard:
+            # A leader showed up during the PreVote
+            return
+        role = Role.CANDIDATE
+        set_term(term + 1, idx)
+        election_term = term
+    logging.info(f"[RAFT] Election | term: {election_term}")
+    ballot = FanOut("Vote", vote_request, handle_vote_response)
+    won = ballot.wait(RPC_TIMEOUT)
+    votes_recv = ballot.acks
+    with raft_lock:
+        won = won and role == Role.CANDIDATE and term == election_term
+        if won:
+            become_leader()
+    if won:
+        logging.info(f"[RAFT] Won election | votes_recv: {votes_recv}, n_servers: {n_servers}, term: {term}, leader_addr: {leader_addr}")
+    else:
+        logging.info(f"[RAFT] Lost election | votes_recv: {votes_recv}, n_servers: {n_servers}, term: {term}, leader_addr: {leader_addr}")
+
+def backoff_index(response):
+    """nextIndex after a rejected AppendEntries. Skips the follower's whole conflicting term instead of one entry per
+    round: past the leader's last entry of that term if it has one, otherwise to the term's first index"""
+    if response.conflict_term:
+        for i in range(len(logs), logs.base_index, -1):
+            if term_at(i) == response.conflict_term:
+                return i + 1
+            if term_at(i) < response.conflict_term:
+                break
+    return max(1, response.conflict_idx)
+
+def advance_commit():
+    """Leader: commit up to the highest index stored on a majority, if that entry is from the current term"""
+    global commit_idx
+    with raft_lock:
+        # The leader counts only what it has fsynced itself
+        matched = sorted([logs.durable] + list(match_idx.values()), reverse=True)
+        majority_idx = matched[n_servers // 2]
+        if majority_idx > commit_idx and term_at(majority_idx) == term:
+            commit_idx = majority_idx
+            logging.info(f"[RAFT] Committed change | commit_idx: {commit_idx}")
+
+def apply_committed():
+    """Apply the committed entries past last_applied to the database, in log order. Each run of up to APPLY_BATCH
+    entries goes through the long-lived applier in one transaction that also records the new last_applied, so a
+    restart resumes after the last batch that reached the database. Entries proposed by clients of this server run
+    through the router (see Proposal), whose waiting RPCs are then woken"""
+    global last_applied
+    with applied_cond:
+        while last_applied < commit_idx:
+            first, last = last_applied + 1, min(commit_idx, last_applied + APPLY_BATCH)
+            finished = []
+            with applier.transaction():
+                for i, entry in enumerate(logs[first - 1:last], first):
+                    proposal = proposals.get(i)
+                    if proposal is not None and proposal.term == entry.term:
+                        proposal.apply(applier)
+                    else:
+                        apply_action(entry, applier)
+                    if proposal is not None:
+                        finished.append(proposal)
+                applier.save_applied(last)
+            last_applied = last
+            for proposal in finished:
+                del proposals[proposal.index]
+                proposal.done = True
+            applied_cond.notify_all()
+            logging.info(f"[RAFT] Applied entries | first: {first}, last: {last}")
+
+def take_snapshot():
+    """Snapshot the database at last_applied with the SQLite backup API, then drop the log entries it covers. A
+    snapshot only holds committed state"""
+    global snapshot_index, snapshot_term
+    with apply_lock:
+        index = last_applied
+        if index <= snapshot_index or index > commit_idx:
+            return False
+        with raft_lock:
+            index_term = term_at(index)
+        with snapshot_lock:
+            snapshot.create(DB_PATH, SNAPSHOT_PATH, index, index_term)
+            snapshot_index, snapshot_term = index, index_term
+    # Under raft_lock: AppendEntries and append_entries_request check base_index before reading the entries after it
+    with raft_lock:
+        logs.compact(index)
+    logging.info(f"[RAFT] Took snapshot | index: {index}, term: {index_term}, base_index: {logs.base_index}")
+    return True
+
+def maybe_snapshot():
+    """Start a snapshot in the background once SNAPSHOT_ENTRIES entries were applied since the last one"""
+    if not SNAPSHOT_ENTRIES or last_applied - snapshot_index < SNAPSHOT_ENTRIES or snapshot_running.is_set():
+        return
+    snapshot_running.set()
+    def run():
+        try:
+            take_snapshot()
+        except Exception as e:
+            logging.error(f"[RAFT] Snapshot failed | error: {e}")
+        finally:
+            snapshot_running.clear()
+    threading.Thread(target=run, daemon=True).start()
+
+def install_snapshot(path, index, last_term):
+    """Follower: load a snapshot received from the leader into the database and continue the log after it. Entries
+    after the snapshot are kept if the log agrees with it, otherwise the whole log is replaced"""
+    global last_applied, commit_idx, snapshot_index, snapshot_term
+    with applied_cond:
+        if index <= last_applied:
+            # Everything in it is applied already
+            os.remove(path)
+            return
+        snapshot.restore(path, DB_PATH)
+        applier.save_applied(index)
+        with snapshot_lock:
+            os.replace(path, SNAPSHOT_PATH)
+            snapshot_index, snapshot_term = index, last_term
+        with raft_lock:
+            if logs.base_index < index <= len(logs) and term_at(index) == last_term:
+                logs.compact(index)
+            else:
+                logs.reset(index, last_term)
+            commit_idx = max(commit_idx, index)
+        last_applied = index
+        # Writes proposed up to index are in the snapshot, but their results are not
+        for i in [i for i in proposals if i <= index]:
+            proposals.pop(i).done = True
+        applied_cond.notify_all()
+    logging.info(f"[RAFT] Installed snapshot | index: {index}, term: {last_term}")
+
+def send_snapshot(peer):
+    """Leader: stream the latest snapshot to a follower whose next entries were compacted away, in SNAPSHOT_CHUNK
+    messages, and continue replication after it"""
+    with snapshot_lock:
+        f = open(SNAPSHOT_PATH, "rb")
+        index, last_term = snapshot_index, snapshot_term
+    with raft_lock:
+        header = dict(leader_addr=leader_addr, term=term, last_idx=index, last_term=last_term)
+    logging.info(f"[RAFT] Sending snapshot | server: {peer}, index: {index}, bytes: {os.fstat(f.fileno()).st_size}")
+    try:
+        requests = (handler_pb2.InstallSnapshotRequest(offset=offset, data=data, done=done, **header)
+                    for offset, data, done in snapshot.chunks(f, SNAPSHOT_CHUNK))
+        response = peer_channels.stub(peer).InstallSnapshot(requests, timeout=SNAPSHOT_TIMEOUT)
+    finally:
+        f.close()
+    with raft_lock:
+        if response.term > term:
+            step_down(peer, response.term)
+        elif response.success:
+            match_idx[peer] = max(match_idx[peer], index)
+            next_idx[peer] = match_idx[peer] + 1
+
+def install_snapshots():
+    """Leader: start streaming the snapshot to each follower that needs it, one transfer per follower at a time. A
+    failed transfer is retried after HEARTBEAT_LEN"""
+    for peer in peers:
+        with raft_lock:
+            if next_idx[peer] > logs.base_index or time.monotonic() < snapshot_retry.get(peer, 0):
+                continue
+        with FanOut.in_flight_lock:
+            if (peer, "InstallSnapshot") in FanOut.in_flight:
+                continue
+            FanOut.in_flight.add((peer, "InstallSnapshot"))
+        def run(peer=peer):
+            try:
+                send_snapshot(peer)
+            except Exception as e:
+                logging.error(f"[RAFT] InstallSnapshot failed | server: {peer}, error: {e.code() if isinstance(e, grpc.RpcError) else e}")
+                snapshot_retry[peer] = time.monotonic() + HEARTBEAT_LEN
+            finally:
+                with FanOut.in_flight_lock:
+                    FanOut.in_flight.discard((peer, "InstallSnapshot"))
+        threading.Thread(target=run, daemon=True).start()
+
+def raft_call(peer, method, request, timeout=None):
+    """Start a Raft RPC to a peer on its long-lived channel without blocking. Returns a grpc.Future whose deadline
+    is timeout seconds away"""
+    future = getattr(peer_channels.stub(peer), method).future(request, timeout=timeout or RPC_TIMEOUT)
+    future.add_done_callback(lambda f: peer_channels.record(peer, f))
+    return future
+
+class FanOut:
+    """
+    One Raft RPC sent to every peer at once, each with its own deadline. Answers are handled as they arrive, so the
+    round is decided by the first majority and a slow or dead peer no longer holds it up. A peer whose previous RPC
+    of the same kind is still in flight is skipped rather than sent a second one, as is a peer make_request returns
+    None for.
+
+    Methods:
+    - wait(self, timeout): Block until a majority (counting this server) acknowledged or every RPC finished.
+      Returns True on a majority.
+    """
+    in_flight = set()                   # (peer, method) with an outstanding RPC
+    in_flight_lock = threading.Lock()
+
+    def __init__(self, method, make_request, on_response, send=raft_call):
+        self.method = method
+        self.on_response = on_response
+        self.acks = 1                   # this server
+        self.pending = 0
+        self.cond = threading.Condition()
+        for peer in peers:
+            with FanOut.in_flight_lock:
+                if (peer, method) in FanOut.in_flight:
+                    continue
+                FanOut.in_flight.add((peer, method))
+            try:
+                request = make_request(peer)
+            except Exception as e:
+                logging.error(f"[RAFT] {method} request failed | server: {peer}, error: {e}")
+                request = None
+            if request is None:
+                with FanOut.in_flight_lock:
+                    FanOut.in_flight.discard((peer, method))
+                continue
+            with self.cond:
+                self.pending += 1
+            try:
+                future = send(peer, method, request)
+            except Exception as e:
+                logging.error(f"[RAFT] {method} failed | server: {peer}, error: {e}")
+                self._finish(peer, False)
+                continue
+            future.add_done_callback(lambda f, peer=peer, request=request: self._done(peer, request, f))
+
+    def _done(self, peer, request, future):
+        ack = False
+        try:
+            ack = self.on_response(peer, request, future.result())
+        except grpc.RpcError as e:
+            logging.error(f"[RAFT] {self.method} failed | server: {peer}, code: {e.code()}")
+        except Exception as e:
+            logging.error(f"[RAFT] {self.method} failed | server: {peer}, error: {e}")
+        self._finish(peer, ack)
+
+    def _finish(self, peer, ack):
+        with FanOut.in_flight_lock:
+            FanOut.in_flight.discard((peer, self.method))
+        with self.cond:
+            self.pending -= 1
+            self.acks += bool(ack)
+            self.cond.notify_all()
+
+    def wait(self, timeout=None):
+        with self.cond:
+            self.cond.wait_for(lambda: self.acks > n_servers // 2 or self.pending == 0, timeout)
+            return self.acks > n_servers // 2
+
+def vote_request(peer, pre_vote=False):
+    """VoteRequest for this server's candidacy, carrying where its log ends. A PreVote asks about the next term"""
+    with raft_lock:
+        return handler_pb2.VoteRequest(cand_id=idx, cand_term=term + 1 if pre_vote else term, prev_log_idx=len(logs), prev_log_term=term_at(len(logs)))
+
+def handle_vote_response(peer, request, response):
+    """Count a vote (or pre-vote). Returns True if granted. A peer in a newer term ends the candidacy"""
+    logging.info(f"[RAFT] Requesting vote | server: {peer}, success: {response.success}")
+    with raft_lock:
+        if response.term > term:
+            step_down(peer, response.term)
+            return False
+    return response.success
+
+def read_barrier(timeout=READ_INDEX_TIMEOUT):
+    """
+    Return True once a read served from the local database reflects every write acknowledged to clients.
+    - Leader, lease valid: a majority acknowledged a heartbeat within READ_LEASE, so no other leader can exist yet
+    - Leader, lease lapsed (ReadIndex): wait for a heartbeat round that starts after the read arrived to reach a majority
+    - Follower: reads are served locally as before; clients send them to the leader
+    """
+    if role != Role.LEADER:
+        return True
+    arrived = time.monotonic()
+    with lease_cond:
+        if arrived < leadership_confirmed + READ_LEASE:
+            return True
+        return lease_cond.wait_for(lambda: leadership_confirmed >= arrived, timeout)
+
+def confirm_leadership(round_start):
+    """Record that a majority acknowledged the heartbeat round started at round_start (monotonic)"""
+    global leadership_confirmed
+    with lease_cond:
+        if round_start > leadership_confirmed:
+            leadership_confirmed = round_start
+            lease_cond.notify_all()
+
+def read_allowed(consistency=handler_pb2.LEADER, max_staleness_ms=0):
+    """
+    Return True once this server may serve a read at the requested consistency (handler_pb2.ReadConsistency).
+    - LEADER: the leader, after read_barrier. Followers refuse, so clients go to the leader
+    - READ_INDEX: the leader as for LEADER; a follower asks the leader for its commit index (see follower_read_index)
+    - BOUNDED_STALENESS: any server whose staleness() is at most max_staleness_ms (READ_MAX_STALENESS if 0)
+    """
+    if consistency == handler_pb2.BOUNDED_STALENESS:
+        bound = max_staleness_ms / 1000 if max_staleness_ms else READ_MAX_STALENESS
+        return staleness() <= bound
+    if role == Role.LEADER:
+        return read_barrier()
+    if consistency == handler_pb2.READ_INDEX:
+        return follower_read_index()
+    return False
+
+def staleness():
+    """Seconds since this server's database was last known to hold every committed write: for the leader, since the
+    start of the last heartbeat round a majority acknowledged; for a follower, since the last AppendEntries after which
+    it had applied the leader's commit index"""
+    return time.monotonic() - (leadership_confirmed if role == Role.LEADER else caught_up)
+
+def follower_read_index(timeout=READ_INDEX_TIMEOUT):
+    """Follower: get the leader's commit index at the time of the read (the leader confirms its leadership first), then
+    wait until this server has applied it. Every write acknowledged before the read is then visible locally"""
+    leader = leader_addr
+    if leader is None or leader == self_addr:
+        return False
+    try:
+        response = raft_call(leader, "ReadIndex", empty_pb2.Empty(), timeout).result()
+    except grpc.RpcError as e:
+        logging.error(f"[RAFT] ReadIndex failed | server: {leader}, code: {e.code()}")
+        return False
+    if not response.success:
+        return False
+    with applied_cond:
+        return applied_cond.wait_for(lambda: last_applied >= response.read_idx, timeout)
+
 class RaftService(handler_pb2_grpc.RaftServicer):
     """
     Basic Raft implementation for leader election and log replication
     """
     def Vote(self, request, context):
-        """Vote in favor or or against depending on candidate logs"""
-        global term, voted_for, leader_addr
+        """Vote for a candidate at most once per term, and only if its log is at least as up to date as this one"""
+        global leader_addr, role
         logging.info(f"[RAFT] Received VoteRequest | cand_id: {request.cand_id}, cand_term: {request.cand_term}, prev_log_idx: {request.prev_log_idx}, prev_log_term: {request.prev_log_term}")
 
-        # If candidate is behind me, reject
-        if request.cand_term < term or voted_for is None: # TODO: check
-            logging.info(f"[RAFT] Rejected VoteRequest | cand_id: {request.cand_id}, cand_term: {request.cand_term}, term: {term}, voted_for: {voted_for}")
-            return handler_pb2.VoteResponse(term=term, success=False)
-        # If candidate is ahead of me, vote for them + update my term
-        if request.cand_term >= term:
-            logging.info(f"[RAFT] Accepted VoteRequest | cand_id: {request.cand_id}, cand_term: {request.cand_term}, term: {term}")
-            term = request.cand_term
-            voted_for = request.cand_id
-            return handler_pb2.VoteResponse(term=term, success=True)
+        with raft_lock:
+            if request.cand_term > term:
+                # A leader or candidate of an older term steps down
+                if role != Role.FOLLOWER:
+                    logging.info(f"[RAFT] Stepping down, newer term | server: {request.cand_id}, term: {term}, cand_term: {request.cand_term}")
+                set_term(request.cand_term)
+                role = Role.FOLLOWER
+                leader_addr = None
+            granted = (request.cand_term == term and voted_for in (None, request.cand_id)
+                       and election.log_up_to_date(request.prev_log_idx, request.prev_log_term, len(logs), term_at(len(logs))))
+            if granted:
+                set_term(term, request.cand_id)
+                # Granting a vote counts as hearing from a leader to be: no competing election for a while
+                reset_election_timer()
+                logging.info(f"[RAFT] Accepted VoteRequest | cand_id: {request.cand_id}, cand_term: {request.cand_term}, term: {term}")
+            else:
+                logging.info(f"[RAFT] Rejected VoteRequest | cand_id: {request.cand_id}, cand_term: {request.cand_term}, term: {term}, voted_for: {voted_for}")
+            return handler_pb2.VoteResponse(term=term, success=granted)
+
+    def PreVote(self, request, context):
+        """Tell a would-be candidate whether it would get this server's vote in cand_term, without changing any state.
+        Refused while a leader is known to be alive: this server is the leader, or heard from one within the minimum
+        election timeout"""
+        with raft_lock:
+            leader_alive = role == Role.LEADER or (leader_addr is not None and time.time() - last_heartbeat < election.TIMEOUT_MIN)
+            granted = (request.cand_term > term and not leader_alive
+                       and election.log_up_to_date(request.prev_log_idx, request.prev_log_term, len(logs), term_at(len(logs))))
+            logging.info(f"[RAFT] PreVote | cand_id: {request.cand_id}, cand_term: {request.cand_term}, term: {term}, granted: {granted}")
+            return handler_pb2.VoteResponse(term=term, success=granted)
 
     def AppendEntries(self, request, context):
         """
         Followers respond to leader's heartbeat
-        Used for log replication
+        Used for log replication: entries after prev_log_idx are appended once the logs agree up to it, and entries up
+        to the leader's commit index are applied to the database
         """
-        global leader_addr, logs, DB_PATH, timer, role, voted_for, last_heartbeat
-        logging.info(f"[RAFT] Received AppendEntriesRequest | leader_addr: {leader_addr}, term: {request.term}, prev_log_idx: {request.prev_log_idx}, prev_log_term: {request.prev_log_term}, commit: {request.commit}")
+        global leader_addr, logs, DB_PATH, timer, role, voted_for, last_heartbeat, term, commit_idx, caught_up
+        received = time.monotonic()
+        logging.info(f"[RAFT] Received AppendEntriesRequest | leader_addr: {leader_addr}, term: {request.term}, prev_log_idx: {request.prev_log_idx}, prev_log_term: {request.prev_log_term}, entries: {len(request.entries)}, commit: {request.commit}")
 
-        # Reset vote
-        voted_for = None
+        with raft_lock:
+            # Reject stale leaders
+            if request.term < term:
+                return handler_pb2.AppendEntriesResponse(term=term, success=False)
+            if request.term > term:
+                set_term(request.term)
+
+            # Update timers
+            reset_election_timer()
+            last_heartbeat = time.time()
+
+            # Become FOLLOWER if not already
+            role = Role.FOLLOWER # NEW
+
+            # 1) Update leader_addr?
+            if request.leader_addr != leader_addr:
+                logging.info(f"[RAFT] Switched leader | leader_addr: {leader_addr}, request.leader_addr: {request.leader_addr}")
+                leader_addr = request.leader_addr
+
+            # 2) Logs must agree up to prev_log_idx, otherwise tell the leader where to back off to. Entries up to
+            # base_index are in this server's snapshot: committed, so they agree
+            prev = request.prev_log_idx
+            entries = request.entries
+            if prev < logs.base_index:
+                entries = entries[logs.base_index - prev:]
+                prev = logs.base_index
+            elif prev > len(logs):
+                return handler_pb2.AppendEntriesResponse(term=term, success=False, conflict_idx=len(logs) + 1)
+            if term_at(prev) != request.prev_log_term:
+                conflict_term = term_at(prev)
+                first = prev
+                # The base entry is committed, so the conflicting run cannot reach back past it
+                while first > logs.base_index + 1 and term_at(first - 1) == conflict_term:
+                    first -= 1
+                return handler_pb2.AppendEntriesResponse(term=term, success=False, conflict_term=conflict_term, conflict_idx=first)
+
+            # 3) Append new entries, dropping any conflicting (uncommitted) suffix, and make them durable before
+            # acknowledging
+            skip = 0
+            while skip < len(entries) and prev + skip < len(logs) and term_at(prev + skip + 1) == entries[skip].term:
+                skip += 1
+            if skip < len(entries):
+                if prev + skip < len(logs):
+                    logging.info(f"[RAFT] Truncating log | from: {prev + skip + 1}, len: {len(logs)}")
+                    del logs[prev + skip:]
+                logs.extend(entries[skip:])
+                logs.sync()
+            last_new = prev + len(entries)
+
+            # 4) Move the commit index to the leader's
+            commit_idx = max(commit_idx, min(request.commit, last_new))
+            response = handler_pb2.AppendEntriesResponse(term=term, success=True, match_idx=last_new)
+
+        # 5) Apply actions the leader has committed (outside raft_lock: apply_lock comes first, see take_snapshot)
+        apply_committed()
+        if last_applied >= request.commit:
+            # Everything the leader had committed when it sent this is in the database (BOUNDED_STALENESS reads)
+            caught_up = max(caught_up, received)
+        return response
+
+    def InstallSnapshot(self, request_iterator, context):
+        """
+        Followers receive the leader's snapshot in chunks when the entries they need were compacted away. The chunks
+        are written to a file next to the database, which is then loaded with install_snapshot
+        """
+        global leader_addr, term, role, voted_for, last_heartbeat, timer
+        path = DB_PATH + ".installing"
+        header = None
+        with open(path, "wb") as f:
+            for chunk in request_iterator:
+                if header is None:
+                    header = chunk
+                    logging.info(f"[RAFT] Received InstallSnapshotRequest | leader_addr: {chunk.leader_addr}, term: {chunk.term}, last_idx: {chunk.last_idx}, last_term: {chunk.last_term}")
+                    with raft_lock:
+                        # Reject stale leaders
+                        if chunk.term < term:
+                            return handler_pb2.InstallSnapshotResponse(term=term, success=False)
+                        if chunk.term > term:
+                            set_term(chunk.term)
+                        role = Role.FOLLOWER
+                        leader_addr = chunk.leader_addr
+                if chunk.offset != f.tell():
+                    logging.error(f"[RAFT] Snapshot chunk out of order | offset: {chunk.offset}, expected: {f.tell()}")
+                    return handler_pb2.InstallSnapshotResponse(term=term, success=False)
+                f.write(chunk.data)
+                # A transfer counts as heartbeats, so a long one does not start an election
+                reset_election_timer()
+                last_heartbeat = time.time()
+                if chunk.done:
+                    break
+            else:
+                logging.error(f"[RAFT] Snapshot stream ended early | received: {f.tell()}")
+                return handler_pb2.InstallSnapshotResponse(term=term, success=False)
+            f.flush()
+            os.fsync(f.fileno())
+        install_snapshot(path, header.last_idx, header.last_term)
+        return handler_pb2.InstallSnapshotResponse(term=term, success=True)
 
-        # Update timers
-        timer = time.time() + random.uniform(0, 0.5)
-        last_heartbeat = time.time()
-        
-        # Become FOLLOWER if not already
-        role = Role.FOLLOWER # NEW
-
-        # 1) Update leader_addr?
-        if request.leader_addr != leader_addr:
-            logging.info(f"[RAFT] Switched leader | leader_addr: {leader_addr}, request.leader_addr: {request.leader_addr}")
-            leader_addr = request.leader_addr
-        # 2) Exist new entries?
-        if len(logs) - 1 == request.prev_log_idx:
-            return handler_pb2.AppendEntriesResponse(term=term, success=True)
-        # 3) Apply actions
-        for entry in request.entries[request.commit + 1]:
-            logs.append(entry)
-            logging.info(f"[RAFT] Applying action | entry: {entry}")
-            apply_action(entry, DB_PATH)
-        return handler_pb2.AppendEntriesResponse(term=request.term, success=True)
-    
     def GetLeader(self, request, context):
         """Return the current leader address"""
         global leader_addr
         logging.info(f"[RAFT] Get leader | leader_addr: {leader_addr}")
         return handler_pb2.GetLeaderResponse(leader_addr=leader_addr)
 
+    def ReadIndex(self, request, context):
+        """Leader: the commit index a follower must apply before serving a READ_INDEX read. Taken when the request
+        arrives, and only returned once a heartbeat round confirms this server was still the leader then. Fails until
+        the leader has committed an entry of its own term, as only then is its commit index up to date"""
+        with raft_lock:
+            read_idx, current_term = commit_idx, term
+            success = role == Role.LEADER and term_at(read_idx) == current_term
+        success = success and read_barrier()
+        return handler_pb2.ReadIndexResponse(term=current_term, success=success, read_idx=read_idx)
+
 def serve():
     """
     Main loop for starting the gRPC server. 
@@ -419,33 +1059,29 @@ def serve():
     """
     global all_servers, votes_recv, idx, term, role, timer, logs
     global commit_idx, voted_for, n_servers, leader_addr, host, port, last_heartbeat
+    global last_applied, snapshot_index, snapshot_term
+
+    # Recover: the database holds everything up to the index it records, and at least the log's compacted prefix
+    snapshot_index, snapshot_term = snapshot.read_meta(SNAPSHOT_PATH)
+    commit_idx = logs.base_index
+    last_applied = max(logs.base_index, applier.last_applied())
 
     # Setup gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=SERVER_OPTIONS)
     handler_pb2_grpc.add_HandlerServicer_to_server(HandlerService(), server)
     handler_pb2_grpc.add_RaftServicer_to_server(RaftService(), server)
-    server.add_insecure_port(f'{host}:{port}')
+    if tls.TLS_ENABLED:
+        # Peers and clients resume TLS sessions through tls.grpc_channel's shared session cache
+        server.add_secure_port(f'{host}:{port}', tls.grpc_server_credentials())
+    else:
+        server.add_insecure_port(f'{host}:{port}')
     server.start()
     time.sleep(0.5)  # Give time for the socket to bind
 
-    # Connect to all other servers + elect leader
-    for s in all_servers:
-        try:
-            channel = grpc.insecure_channel(s)
-            stub = handler_pb2_grpc.RaftStub(channel)
-            response = stub.Vote(handler_pb2.VoteRequest(
-                cand_term=0,
-                cand_id=0, # auto select first server as leader to begin with
-                prev_log_idx=0,
-                prev_log_term=0
-                )
-            )
-            logging.info(f"[RAFT] Connecting | server: {s}, leader_addr: {leader_addr}")
-            channel.close()
-            break
-        except Exception as e:
-            logging.error(f"[RAFT] Connection error | server: {s}, error: {e}")
-            time.sleep(1)
+    # Open the long-lived channels to all other servers; they connect in the background and reconnect on their own
+    for s in peers:
+        peer_channels.stub(s)
+        logging.info(f"[RAFT] Connecting | server: {s}")
 
     # Sleep for random amount of time to allow for election
     time.sleep(random.random())
@@ -453,116 +1089,26 @@ def serve():
     # Take actions based on role
     try:
         while True:
-            if role == Role.FOLLOWER:
-                # If no leader heartbeat: trigger election (will automatically call AppendEntries upon receiving)
-                if time.time() - last_heartbeat > HEARTBEAT_LEN:
-                    term += 1
-                    voted_for = None
-                    # leader_addr = None
-                    role = Role.CANDIDATE
-                    logging.info(f"[RAFT] Election | term: {term}")
-            elif role == Role.CANDIDATE:
+            if role in (Role.FOLLOWER, Role.CANDIDATE):
+                # No word from a leader for a randomized election timeout: PreVote, then elect (see run_election)
                 if time.time() > timer:
-                    # Reset timer
-                    timer = time.time() + random.uniform(3,5)
-
-                    # Vote for self
-                    votes_recv = 1
-                    voted_for = idx
-
-                    # Request other servers to vote for me
-                    for s in all_servers:
-                        try:
-                            channel = grpc.insecure_channel(s)
-                            stub = handler_pb2_grpc.RaftStub(channel)
-                            response = stub.Vote(handler_pb2.VoteRequest(
-                                cand_id=idx,
-                                cand_term=term,
-                                prev_log_idx=len(logs) - 1,
-                                prev_log_term=logs[-1].term if logs else 0,
-                                )
-                            )
-                            if response.success:
-                                votes_recv += 1
-                            logging.info(f"[RAFT] Requesting vote | server: {s}, success: {response.success}, votes_recv: {votes_recv}, leader_addr: {leader_addr}")
-                        except Exception as e:
-                            logging.error(f"[RAFT] Connection error | server: {s}, error: {e}")
-                            pass
-                    # If you win the election
-                    if votes_recv > n_servers // 2:
-                        role = Role.LEADER
-                        leader_addr = f"{host}:{port}"
-
-                        logging.info(f"[RAFT] Won election | votes_recv: {votes_recv}, n_servers: {n_servers}, term: {term}, leader_addr: {leader_addr}")
-
-                        # Send heartbeat to all other servers
-                        for s in all_servers:
-                            try:
-                                # Update leader heartbeat but do not send to self
-                                if s == f"{host}:{port}":
-                                    last_heartbeat = time.time()
-                                    continue
-                                channel = grpc.insecure_channel(s)
-                                stub = handler_pb2_grpc.RaftStub(channel)
-                                # Send out all logs TODO: optimize to just send snapshot
-                                response = stub.AppendEntries(handler_pb2.AppendEntriesRequest(
-                                    leader_addr=leader_addr,
-                                    term=term,
-                                    prev_log_term=logs[-1].term if logs else 0,
-                                    prev_log_idx=len(logs) - 1,
-                                    entries=logs,
-                                    commit=commit_idx
-                                    )
-                                )
-                                channel.close()
-                                logging.info(f"[RAFT] Sent heartbeat | server: {s}, success: {response.success}")
-                            except Exception as e:
-                                logging.error(f"[RAFT] Sent heartbeat erro | server: {s}, error: {e}")
-                                pass
-
-                    else:
-                        logging.info(f"[RAFT] Lost election | votes_recv: {votes_recv}, n_servers: {n_servers}, term: {term}, leader_addr: {leader_addr}")
+                    run_election()
             elif role == Role.LEADER:
-                # Send heartbeat (AppendEntries)
-                ack = 0
-                for s in all_servers:
-                    try:
-                        if s == f"{host}:{port}":
-                            last_heartbeat = time.time()
-                            continue
-                        channel = grpc.insecure_channel(s)
-                        stub = handler_pb2_grpc.RaftStub(channel)
-                        # Send out all logs TODO: optimize to just send snapshot
-                        response = stub.AppendEntries(handler_pb2.AppendEntriesRequest(
-                            leader_addr=leader_addr,
-                            term=term,
-                            prev_log_term=logs[-1].term if logs else 0,
-                            prev_log_idx=len(logs) - 1,
-                            entries=logs,
-                            commit=commit_idx)
-                        )
-                        ack += response.success
-                        channel.close()
-                        logging.info(f"[RAFT] Sent heartbeat | server: {s}, success: {response.success}, ack: {ack}")
-                    except Exception as e:
-                        logging.error(f"[RAFT] Sent heartbeat erro | server: {s}, error: {e}")
-                        pass
-                # If ACK successful
-                if ack >= n_servers // 2:
-                    # Commit change --> move forward index
-                    commit_idx = len(logs) - 1
-                    logging.info(f"[RAFT] Committed change | commit_idx: {commit_idx}")
-                else:
-                    # Lose leader role
-                    role = Role.FOLLOWER
-                    leader_addr = None
-                    logging.info(f"[RAFT] Lost leader role | leader_addr: {leader_addr}")
+                # Send heartbeat (AppendEntries) to all followers at once, carrying each one's missing entries
+                replicate()
             else:
                 logging.error(f"[RAFT] Invalid role | role: {role}")
                 pass
-            time.sleep(0.1)
+            maybe_snapshot()
+            if role == Role.LEADER:
+                # The next round starts as soon as client writes arrive, or when the heartbeat is due
+                wait_for_writes(0.1)
+            else:
+                time.sleep(0.1)
     except KeyboardInterrupt:
         logging.info(f"[END] server {idx} at {host}:{port}")
+        logging.info(f"[PEER] Channel health | {peer_channels.health()}")
+        peer_channels.close()
         server.stop(0)
 
     server.wait_for_termination()
@@ -1,12 +1,15 @@
-import io
-import json
 import yaml
 import selectors
 import struct
 import time
 import ssl
 import logging
+from collections import Counter
 from database import DatabaseHandler
+from framing import FrameReader, FrameWriter, pack_protoheader
+import compression
+from codec import DEFAULT_CODEC
+from router import ROUTER
 from utils import encode_protocol, decode_protocol, ResponseCode, OpCode
 import handler_pb2 as handler_pb2
 
@@ -23,41 +26,105 @@ VERSION = config["version"]
 DB_PATH = config.get("db_path", None)
 MIN_MESSAGE_LEN = config["min_message_len"]
 MAX_MESSAGE_LEN = config["max_message_len"]
-
-class Message:
+HIGH_WATERMARK = config.get("send_high_watermark", 1 << 20)
+LOW_WATERMARK = config.get("send_low_watermark", 1 << 18)
+RECV_SIZE = 4096
+TLS_WRITE_CHUNK = 1 << 16 # Bytes per TLS send; SSLSocket has no sendmsg, so queued frames are joined up to this size
+PING_INTERVAL = config.get("ping_interval", 30)
+IDLE_TIMEOUT = config.get("idle_timeout", 90)
+
+class Message(FrameReader, FrameWriter):
     """
     Handles standard communication between the server and a client using JSON encoding. Message is (fuzzily) equivalent to a server-stub.
+    Framing is handled by FrameReader, so every complete request in the receive buffer is processed per read event.
+    Outgoing frames are queued by FrameWriter. When the server passes a pending_writes set, each connection with queued
+    frames is flushed once at the end of the loop iteration, so responses and pushed messages go out in one sendmsg.
+    JSON goes through self.codec, which decodes request content straight from the receive buffer. Frames for responses
+    without data (e.g. a plain SUCCESS) are cached per (opcode, status code, encoding).
+    TLS sockets (wrapped by the server without a handshake) complete the handshake on their first events, and count
+    full and resumed handshakes in metrics.
+    Response content over compression.THRESHOLD is compressed with the codec negotiated from the protoheader flags of
+    the client's requests. Clients that announce no codecs get plain frames.
+    Pushed messages are subject to backpressure: once a receiver has more than HIGH_WATERMARK bytes unsent, new messages
+    for it are stored as undelivered until its queue drains below LOW_WATERMARK. Deferrals are counted in metrics.
+    When the server passes a RequestDispatcher, requests are handled on its thread pool so database calls do not stall
+    the event loop. One request per connection is in flight at a time, so responses keep the order of the requests.
+    With an edge-triggered selector (edge_selector.py), reads continue until the socket is drained.
+    The server's timer wheel calls check_idle: after PING_INTERVAL seconds without data from the client the server sends
+    a PING, and after IDLE_TIMEOUT seconds the connection is closed. Closing removes the user from active clients.
 
     Methods:
     - _set_selector_events_mask(self, mode): Set the selector to listen for events.
     - _read(self): Read incoming data from the client.
-    - _write(self): Write outgoing data to the client.
+    - _queue_send(self, message): Queue a packaged message and schedule a flush.
+    - _accepting_pushes(self): Whether pushed messages may be queued, applying the watermarks.
+    - _do_handshake(self): Advance a TLS handshake without blocking.
+    - _send_buffers(self, buffers): Send queued buffers, joined for TLS sockets.
+    - _remove_active_client(self): Remove this connection's user from active clients.
+    - check_idle(self, now): Ping or close an idle connection. Returns the delay until the next check.
+    - _ping(self): Queue a PING frame.
     - _json_encode(self, obj, encoding): Encode a Python object as JSON.
     - _json_decode(self, json_bytes, encoding): Decode JSON bytes into a Python object.
-    - _package_response(self, response): Package a response message for sending.
+    - _compress(self, content_bytes, peer, key): Compress response content for the peer connection.
+    - _package_response(self, response, peer=None): Package a response message for sending.
+    - _constant_response_key(self, response): Cache key for a response without data, or None.
     - _process_request(self): Process the client request and generate a response.
-    - _generate_action(self, opcode, args): Execute the requested action and return the result.
+    - _reject_frame(self, error): Answer a request whose content failed to decompress with BAD_REQUEST.
+    - _generate_action(self, opcode, args): Execute the requested action through the shared router and return the result.
+    - on_login(self, username): Register this connection as the user's active client.
+    - send_message(self, sender, receiver, msg_content): Store a message and push it to an online receiver.
     - process_events(self, mask): Process events based on the mask.
     - read(self): Read and process incoming data from the client.
+    - _dispatch_next(self): Hand the next buffered request to the dispatcher if none is in flight.
+    - _request_done(self, future): Finish a dispatched request on the event loop and dispatch the next one.
     - write(self): Write outgoing data to the client.
+    - flush(self): Send queued data and update the selector mask.
     - close(self): Close the connection.
-    - process_protoheader(self): Process protoheader from received buffer.
-    - process_header(self): Process header from received buffer.
-    - process_content(self): Process content from received buffer.
+    - _decode_header(self, header_bytes): Decode header bytes into a dict.
+    - _handle_frame(self, content_bytes): Decode and process one complete request, or keep it for the dispatcher.
+    - _process_frame(self, content_bytes): Decode one complete request and queue its response.
+    - process_content(self, content_bytes): Decode request content.
     """
-    def __init__(self, selector, sock, addr, db_path, active_clients={}):
+    codec = DEFAULT_CODEC
+    _content_as_view = True
+    _response_cache = {} # (opcode, status_code, encoding) -> packaged message
+
+    def __init__(self, selector, sock, addr, db_path, active_clients={}, pending_writes=None, metrics=None, dispatcher=None, connections=None):
+        super().__init__()
         self.selector = selector
         self.sock = sock
         self.addr = addr
-        self._recv_buffer = b""
-        self._send_buffer = b""
-        self._header_len = None
-        self._header = None # Parsed header data
+        self._events = selectors.EVENT_READ # Events currently registered with the selector
+        # Edge-triggered selectors only report new data once, so each read must drain the socket
+        self._edge_triggered = getattr(selector, "edge_triggered", False) is True
         self.request = None # Parsed request data
         self.response_created = False
-        self.db = DatabaseHandler(DB_PATH)
+        self.db = DatabaseHandler(db_path)
         # Active clients mapping (username -> Message object)
         self.active_clients = active_clients
+        self.username = None # Set on login
+        self.last_activity = time.monotonic() # Last time data arrived from the client
+        self._last_ping = None
+        # Connections with frames queued this loop iteration, flushed by the server loop
+        self.pending_writes = pending_writes
+        # Server-wide counters (name -> count), shared between connections
+        self.metrics = metrics if metrics is not None else Counter()
+        self._backpressured = False # Set above the high watermark, cleared below the low watermark
+        # Thread pool for request handling, or None to handle requests on the event loop
+        self.dispatcher = dispatcher
+        self._in_flight = False # A request is being handled by the dispatcher
+        self._frame = None # (header, content) of the next request to dispatch
+        if dispatcher is not None:
+            self._content_as_view = False # Content is handled on another thread while the receive buffer keeps growing
+        # Open connections, for the server's connection limit
+        self.connections = connections
+        if connections is not None:
+            connections.add(self)
+        # TLS sockets are accepted without a handshake; it runs non-blocking on the first events
+        self._tls = isinstance(sock, ssl.SSLSocket)
+        self._handshaking = self._tls
+        if self._tls:
+            self._write_chunk = TLS_WRITE_CHUNK
 
         logging.info(f"New connection established: {addr}")
 
@@ -71,69 +138,166 @@ class Message:
             events = selectors.EVENT_READ | selectors.EVENT_WRITE
         else:
             raise ValueError(f"Invalid events mask mode {mode!r}.")
-        self.selector.modify(self.sock, events, data=self)
+        # Skip the syscall if nothing changes
+        if events != self._events:
+            self.selector.modify(self.sock, events, data=self)
+            self._events = events
 
     def _read(self):
-        """Reads incoming data from the client socket."""
-        try:
-            # Should be ready to read
-            data = self.sock.recv(4096)
-        except BlockingIOError:
-            # Resource temporarily unavailable (errno EWOULDBLOCK)
-            pass
-        except Exception as e:
-            logging.error(f"Read error from {self.addr}: {e}")
-            self.close()
-        else:
+        """Reads incoming data from the client socket. With an edge-triggered selector, reads until it is drained."""
+        while True:
+            try:
+                # Should be ready to read
+                data = self.sock.recv(RECV_SIZE)
+            except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                # Resource temporarily unavailable (errno EWOULDBLOCK), or no complete TLS record yet
+                return
+            except Exception as e:
+                logging.error(f"Read error from {self.addr}: {e}")
+                self.close()
+                return
             if data:
                 self._recv_buffer += data
+                self.last_activity = time.monotonic()
+                # A short read means the socket buffer is empty. TLS can hold decrypted bytes the selector never reports
+                if (not self._edge_triggered or len(data) < RECV_SIZE) and not (self._tls and self.sock.pending()):
+                    return
             else:
                 # Socket closed, remove from active clients
-                for username, client in list(self.active_clients.items()):
-                    if client is self:
-                        del self.active_clients[username]
-                        logging.info(f"Removed {username} from active clients.")
-                        break
+                self._remove_active_client()
                 raise RuntimeError("Peer closed.")
 
-    def _write(self):
-        """Writes data from the send buffer to the client socket."""
-        if self._send_buffer:
-            print(f"Sending {self._send_buffer!r} to {self.addr}")
-            try:
-                # Should be ready to write
-                sent = self.sock.send(self._send_buffer)
-            except BlockingIOError:
-                # Resource temporarily unavailable (errno EWOULDBLOCK)
-                pass
-            else:
-                self._send_buffer = self._send_buffer[sent:]
-                # Close when the buffer is drained. The response has been sent.
-                if sent and not self._send_buffer:
-                    pass
+    def _do_handshake(self):
+        """Advance the TLS handshake without blocking. Returns True once it is complete."""
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._set_selector_events_mask("r")
+            return False
+        except ssl.SSLWantWriteError:
+            self._set_selector_events_mask("rw")
+            return False
+        except (ssl.SSLError, OSError) as e:
+            # Plain-TCP clients, probes and untrusting clients end up here
+            logging.error(f"TLS handshake with {self.addr} failed: {e}")
+            self.metrics["tls_handshake_errors"] += 1
+            self.close()
+            return False
+        self._handshaking = False
+        self.last_activity = time.monotonic()
+        self.metrics["tls_resumed" if self.sock.session_reused else "tls_full_handshakes"] += 1
+        self._set_selector_events_mask("rw" if self._pending() else "r")
+        return True
+
+    def _send_buffers(self, buffers):
+        """Send a list of buffers. TLS sockets get them joined into one write."""
+        if not self._tls:
+            return self.sock.sendmsg(buffers)
+        try:
+            # A retry after SSLWantWriteError resends the same leading bytes, as OpenSSL requires
+            return self.sock.send(b"".join(buffers))
+        except (ssl.SSLWantWriteError, ssl.SSLWantReadError):
+            raise BlockingIOError
+
+    def _remove_active_client(self):
+        """Remove this connection's user from active clients, unless they have since logged in elsewhere."""
+        if self.username is not None and self.active_clients.get(self.username) is self:
+            del self.active_clients[self.username]
+            logging.info(f"Removed {self.username} from active clients.")
+        self.username = None
+
+    def check_idle(self, now):
+        """Ping or close the connection depending on how long the client has been silent.
+        Returns the delay in seconds until the next check, or None if no further check is needed."""
+        if self.sock is None:
+            return None
+        idle = now - self.last_activity
+        if IDLE_TIMEOUT and idle >= IDLE_TIMEOUT:
+            logging.info(f"Closing {self.addr}: idle for {idle:.0f}s.")
+            self.metrics["idle_closed"] += 1
+            self.close()
+            return None
+        if PING_INTERVAL and idle >= PING_INTERVAL:
+            # One ping per silence; skip while a request is still being handled
+            if (self._last_ping is None or self._last_ping < self.last_activity) and not self._in_flight:
+                self._ping()
+                self._last_ping = now
+            return IDLE_TIMEOUT - idle if IDLE_TIMEOUT else PING_INTERVAL
+        deadlines = [d for d in (PING_INTERVAL, IDLE_TIMEOUT) if d]
+        return min(deadlines) - idle if deadlines else None
+
+    def _ping(self):
+        """Queue a PING frame for the client."""
+        header = self._header
+        self._header = {"content_encoding": "utf-8", "content_length": 0, "opcode": OpCode.PING.value}
+        try:
+            message = self._package_response({"status_code": ResponseCode.SUCCESS.value, "data": []})
+        finally:
+            self._header = header
+        self._queue_send(message)
+        self.metrics["pings"] += 1
+
+    def _queue_send(self, message):
+        """Queue a packaged message and schedule a flush for the end of this loop iteration."""
+        if self.dispatcher is not None and not self.dispatcher.on_loop_thread():
+            # Called from the pool: send queues are only touched on the event loop
+            self.dispatcher.call_soon(self._queue_send, message)
+            return
+        self._queue_frame(message)
+        if self.pending_writes is not None:
+            self.pending_writes.add(self)
+        else:
+            self._set_selector_events_mask("rw")
+
+    def _accepting_pushes(self):
+        """Whether pushed messages may be queued on this connection. Applies high/low watermark hysteresis."""
+        pending = self._pending()
+        if self._backpressured and pending <= LOW_WATERMARK:
+            self._backpressured = False
+        elif not self._backpressured and pending >= HIGH_WATERMARK:
+            self._backpressured = True
+            logging.warning(f"Send queue for {self.addr} passed {HIGH_WATERMARK} bytes, deferring pushed messages.")
+        return not self._backpressured
 
     def _json_encode(self, obj, encoding):
-        return json.dumps(obj, ensure_ascii=False).encode(encoding)
+        return self.codec.encode(obj, encoding)
 
     def _json_decode(self, json_bytes, encoding):
-        tiow = io.TextIOWrapper(
-            io.BytesIO(json_bytes), encoding=encoding, newline=""
-        )
-        obj = json.load(tiow)
-        tiow.close()
-        return obj
-
-    def _package_response(self, response):
-        """Encodes and packages the server response before sending (JSON format)."""
+        return self.codec.decode(json_bytes, encoding)
+
+    def _constant_response_key(self, response):
+        """Return a cache key for a response that carries no data, or None if it must be encoded."""
+        if response.get("data") or set(self._header) != {"content_encoding", "content_length", "opcode"}:
+            return None
+        return (self._header["opcode"], response["status_code"], self._header["content_encoding"], bool(self._peer_accepts))
+
+    def _compress(self, content_bytes, peer, key):
+        """Compress response content for the peer connection. Returns (codec used, content)."""
+        if key is not None:
+            # Constant responses are cached for every peer and too small to compress anyway
+            return compression.NONE, content_bytes
+        return compression.compress(content_bytes, getattr(peer, "_send_codec", compression.NONE))
+
+    def _package_response(self, response, peer=None):
+        """Encodes and packages the server response before sending (JSON format).
+        Content is compressed as negotiated with peer, the connection the frame is for (default: this one)."""
+        # Reuse cached frames for constant responses
+        key = self._constant_response_key(response)
+        if key is not None and key in self._response_cache:
+            return self._response_cache[key]
         # Encode response content
         content_bytes = self._json_encode(response, self._header["content_encoding"])
+        peer = self if peer is None else peer
+        codec, content_bytes = self._compress(content_bytes, peer, key)
         # Encode response header
         jsonheader = self._header
         jsonheader["content_length"] = len(content_bytes)
         jsonheader_bytes = self._json_encode(jsonheader, self._header["content_encoding"])
         # Encode protoheader and package message
-        message_hdr = struct.pack(">H",VERSION) + struct.pack(">H", len(jsonheader_bytes))
+        message_hdr = pack_protoheader(len(jsonheader_bytes), codec, bool(getattr(peer, "_peer_accepts", 0)))
         message = message_hdr + jsonheader_bytes + content_bytes
+        if key is not None:
+            self._response_cache[key] = message
         return message
 
     def _process_request(self):
@@ -153,7 +317,7 @@ class Message:
             
         # Load send buffer
         self.response_created = True
-        self._send_buffer += message
+        self._queue_send(message)
         
     def _generate_action(self, opcode, args):
         """Execute the requested action and return the result.
@@ -167,132 +331,131 @@ class Message:
             - "status_code": The status code of the operation.
             - "data": Optional List of data returned by the operation.
         """
-        if opcode == OpCode.STARTING.value:
-            result = {"status_code": ResponseCode.SUCCESS.value}
-        elif opcode == OpCode.ACCOUNT_EXISTS.value:
-            result = self.db.account_exists(args[0])
-            # Parse result of account_exists, which is a bool
-            if not result:
-                result = {"status_code": ResponseCode.ACCOUNT_NOT_FOUND.value}
-            else:
-                result = {"status_code": ResponseCode.ACCOUNT_EXISTS.value} # TODO: cleanup
-        elif opcode == OpCode.CREATE_ACCOUNT.value:
-            print(args)
-            result = self.db.create_account(*args)
-        elif opcode == OpCode.LOGIN_ACCOUNT.value:
-            result = self.db.login_account(*args)
-            # Add to active clients if login successful
-            if result["status_code"] == ResponseCode.SUCCESS.value:
-                self.active_clients[args[0]] = self
-        elif opcode == OpCode.LIST_ACCOUNTS.value:
-            # List accounts based on search query
-            if len(args) > 0:
-                result = self.db.list_accounts("".join(args))
-            else:
-                result = self.db.list_accounts()
-        elif opcode == OpCode.DELETE_ACCOUNT.value:
-            result = self.db.delete_account(*args)
-        elif opcode == OpCode.HOMEPAGE.value:
-            result = self.db.fetch_homepage(*args)
-        elif opcode == OpCode.READ_MSG_UNDELIVERED.value:
-            result = self.db.fetch_messages_undelivered(*args)
-        elif opcode == OpCode.READ_MSG_DELIVERED.value:
-            result = self.db.fetch_messages_delivered(*args)
-        elif opcode == OpCode.DELETE_MSG.value:
-            result = self.db.delete_messages(*args)
-        elif opcode == OpCode.MATCH.value:
-            result = self.db.match_users(*args)
-            print("RESULT   ", result)
-        elif opcode == OpCode.SEND_MSG.value:
-            sender = args[0]
-            receiver = args[1]
-            msg_content = args[2]
-            # If receiver online: try sending immediately
-            if receiver in self.active_clients:
-                try:
-                    # Insert message into database
-                    result = self.db.insert_message(*args, round(time.time()), True)
-
-                    # We have a Message object for the receiver
-                    receiver_msg = self.active_clients[receiver]
+        return ROUTER.dispatch(opcode, self, args)
+
+    def on_login(self, username):
+        """Register this connection as the user's active client."""
+        self._remove_active_client()
+        self.active_clients[username] = self
+        self.username = username
+
+    def send_message(self, sender, receiver, msg_content):
+        """Store a message, pushing it to the receiver's connection if they are online and keeping up."""
+        args = [sender, receiver, msg_content]
+        receiver_msg = self.active_clients.get(receiver)
+        # If receiver online and keeping up: try sending immediately
+        if receiver_msg is not None and receiver_msg._accepting_pushes():
+            # Insert message into database
+            result = self.db.insert_message(*args, round(time.time()), True)
+            if result["status_code"] != ResponseCode.SUCCESS.value:
+                return result
+            try:
+                # Construct a new header or payload for the receiver
+                new_args = result["data"] + args
+                response = {
+                    "status_code": ResponseCode.SUCCESS.value,
+                    "data": [(*new_args, round(time.time()), True)]
+                }
                 
-                    # Construct a new header or payload for the receiver
-                    new_args = [self.db.cursor.lastrowid] + args
-                    response = {
-                        "status_code": ResponseCode.SUCCESS.value,
-                        "data": [(*new_args, round(time.time()), True)]
-                    }
-                    
-                    # Temporarily update our opcode to "RECEIVE_MSG" 
-                    old_opcode = self._header["opcode"]
-                    self._header["opcode"] = OpCode.RECEIVE_MSG.value
-
-                    # Build the message
-                    packaged = self._package_response(response)
-                    self._header["opcode"] = old_opcode
-
-                    # Send data by appending to the receiver's buffer
-                    receiver_msg._send_buffer += packaged
-                    # Ensure the receiver is listening for EVENT_WRITE
-                    receiver_msg._set_selector_events_mask("w")
-                except Exception as e:
-                    logging.error(f"Failed to send message: {e}")
-                    result = self.db.insert_message(*args, round(time.time()), False)
-            else:
-                # If user not online, just store in DB
-                self.db.insert_message(sender, receiver, msg_content,
-                                       round(time.time()),
-                                       False)
-                result = {"status_code": ResponseCode.SUCCESS.value}
+                # Temporarily update our opcode to "RECEIVE_MSG" 
+                old_opcode = self._header["opcode"]
+                self._header["opcode"] = OpCode.RECEIVE_MSG.value
+
+                # Build the message, compressed for the receiver's connection (remote receivers get it uncompressed)
+                packaged = self._package_response(response, receiver_msg)
+                self._header["opcode"] = old_opcode
+
+                # Send data by queueing it on the receiver's connection (forwarded to another worker for remote
+                # receivers, which fails if the IPC socket is full or the frame too large for a datagram)
+                receiver_msg._queue_send(packaged)
+            except Exception as e:
+                # Not pushed: the stored message waits for the receiver's next fetch instead
+                logging.error(f"Failed to send message: {e!r}")
+                self.metrics["failed_pushes"] += 1
+                self.db.mark_undelivered(result["data"][0])
         else:
-            with Exception as e:
-                logging.error(f"Unknown opcode: {e}")
-                result = {"status_code": ResponseCode.SUCCESS.value} #
+            # If user not online or too far behind, just store in DB
+            if receiver_msg is not None:
+                self.metrics["deferred_pushes"] += 1
+            self.db.insert_message(sender, receiver, msg_content,
+                                   round(time.time()),
+                                   False)
+            result = {"status_code": ResponseCode.SUCCESS.value}
         return result
 
     def process_events(self, mask):
         """Process read/write events. Entrypoint into the class. """
+        if self._handshaking and not self._do_handshake():
+            return
         if mask & selectors.EVENT_READ:
             self.read()
         if mask & selectors.EVENT_WRITE:
             self.write()
     
     def read(self):
-        """Handle incoming data and process response."""
-        # Reset previous request info
-        self.response_created = False
-        self._header_len = None
-        self._header = None
-        self.request = None
-
+        """Handle incoming data and process a response for every complete request."""
         # Read in bytes
         self._read()
+        if self.sock is None:
+            return
 
-        # Decode protoheader: get request type
-        if self._header_len is None:
-            self.process_protoheader()
-            
-        # Decode header and content
-        if self._header_len is not None and self._header is None:
-            self.process_header()
-                
-        if self._header and self.request is None:
-            self.process_content()
-            
-    def write(self):
-        """Send queued request data."""
-        # Make sure request is processed
-        if self.request and not self.response_created:
-            self._process_request()
+        # Decode and process all complete requests, queueing their responses
+        if self.dispatcher is None:
+            self._drain_frames()
+        else:
+            self._dispatch_next()
 
-        self._write()
+    def _dispatch_next(self):
+        """Hand the next buffered request to the dispatcher's pool, unless one is already in flight."""
+        if self._in_flight or self.sock is None:
+            return
+        self._frame = None
+        while self._frame is None:
+            # A rejected frame is answered without the pool; move on to the next one
+            if not self._drain_frames(max_frames=1):
+                return
+        # The parser is idle until this request is done, so self._header is stable while the pool uses it
+        self._header, content = self._frame
+        self._in_flight = True
+        self.dispatcher.submit(self._process_frame, content, done=self._request_done)
+
+    def _request_done(self, future):
+        """Finish a dispatched request on the event loop and dispatch the next buffered one."""
+        self._in_flight = False
+        self._header = None
+        if self.sock is None:
+            return
+        if future.exception() is not None:
+            logging.error(f"Error handling request from {self.addr}: {future.exception()!r}")
+            self.close()
+            return
+        try:
+            self._dispatch_next()
+        except Exception as e:
+            logging.error(f"Error reading request from {self.addr}: {e!r}")
+            self.close()
 
-        # Set selector to listen for read events, we're done writing.
-        self._set_selector_events_mask("r")
+    def write(self):
+        """Send queued response data."""
+        self.flush()
+
+    def flush(self):
+        """Send queued data. Stay registered for write events only while data is pending."""
+        if self.pending_writes is not None:
+            self.pending_writes.discard(self)
+        if self.sock is None:
+            return
+        self._flush()
+        self._set_selector_events_mask("rw" if self._pending() else "r")
 
     def close(self):
         """Unregister and close the socket."""
         # logging("Closing connection to {self.addr}")
+        if self.pending_writes is not None:
+            self.pending_writes.discard(self)
+        if self.connections is not None:
+            self.connections.discard(self)
+        self._remove_active_client()
         try:
             self.selector.unregister(self.sock)
         except Exception as e:
@@ -304,62 +467,39 @@ class Message:
         finally:
             self.sock = None
 
-    def process_protoheader(self):
-        """Process protocol header"""
-        hdrlen = 2
-                
-        # Get version
-        if len(self._recv_buffer) >= hdrlen:
-            v = struct.unpack(
-                ">H", self._recv_buffer[:hdrlen]
-            )[0]
-            if v != VERSION: 
-                logging.error(f"Unsupported version: {v}")
-            self._recv_buffer = self._recv_buffer[hdrlen:]
-
-        # Get header length
-        if len(self._recv_buffer) >= hdrlen:
-            self._header_len = struct.unpack(
-                ">H", self._recv_buffer[:hdrlen]
-            )[0]
-            self._recv_buffer = self._recv_buffer[hdrlen:]
-
-    def process_header(self):
-        """Process message header from received buffer."""
-        hdrlen = self._header_len
-
-        if len(self._recv_buffer) >= hdrlen:
-            # Read header data
-            self._header = self._json_decode(self._recv_buffer[:hdrlen], "utf-8")
-            self._recv_buffer = self._recv_buffer[hdrlen:]
-            # Check header data
-            for reqhdr in (
-                "content_encoding",
-                "content_length",
-                "opcode"
-            ):
-                if reqhdr not in self._header:
-                    logging.error(f"Missing required header '{reqhdr}'.")
-
-    def process_content(self):
-        """Process message content from received buffer."""
-        # Check if request is fully received
-        content_len = self._header["content_length"]
-        if not len(self._recv_buffer) >= content_len:
-            logging.error("Insufficient data for content.")
+    def _decode_header(self, header_bytes):
+        """Decode JSON header bytes."""
+        return self._json_decode(header_bytes, "utf-8")
+
+    def _handle_frame(self, content_bytes):
+        """Decode a complete request and queue its response, or keep it for the dispatcher."""
+        if self.dispatcher is not None:
+            self._frame = (self._header, content_bytes)
             return
-        
-        # Save data from receive buffer
-        data = self._recv_buffer[:content_len]
-        self._recv_buffer = self._recv_buffer[content_len:]
+        self._process_frame(content_bytes)
+
+    def _reject_frame(self, error):
+        """Answer a request whose content failed to decompress (corrupt, or over compression.MAX_CONTENT_LEN) with
+        BAD_REQUEST, and keep reading the frames after it."""
+        logging.error(f"Rejected request from {self.addr}: {error}")
+        self.response_created = True
+        self._queue_send(self._package_response({"status_code": ResponseCode.BAD_REQUEST.value, "data": []}))
+
+    def _process_frame(self, content_bytes):
+        """Decode a complete request and queue its response."""
+        if self._header["opcode"] == OpCode.PING.value:
+            # The client answering a ping; receiving it already counted as activity
+            return
+        self.process_content(content_bytes)
+        self._process_request()
+        self.request = None
 
+    def process_content(self, content_bytes):
+        """Process message content of a complete request."""
         # Encode data as request
         encoding = self._header["content_encoding"]
-        self.request = self._json_decode(data, encoding)
-        print(f"Received request {self.request!r} from {self.addr}")
-        
-        # Set selector to listen for write events, we're done reading.
-        self._set_selector_events_mask("w")
+        self.request = self._json_decode(content_bytes, encoding)
+        logging.debug("Received request %r from %s", self.request, self.addr)
 
 class MessageCustom(Message):
     """ Handles communication between the server and a client using a custom protocol. Inherited from Message. 
@@ -367,20 +507,24 @@ class MessageCustom(Message):
     Modified methods:
     - _package_response
     - _process_request
-    - process_header
+    - _decode_header
     - process_content
     """
-    def __init__(self, selector, sock, addr, db_path, active_clients={}):
+    _content_as_view = False # decode_protocol works on bytes
+    _response_cache = {}
+
+    def __init__(self, selector, sock, addr, db_path, active_clients={}, pending_writes=None, metrics=None, dispatcher=None, connections=None):
         """ Initialize the custom message handler. """
-        super().__init__(selector, sock, addr, db_path, active_clients)
+        super().__init__(selector, sock, addr, db_path, active_clients, pending_writes, metrics, dispatcher, connections)
 
-    def _package_response(self, response):
+    def _package_response(self, response, peer=None):
         """Custom response packaging using custom encode_protocol as a separator instead of JSON.
         
         Args:
         - response: The response to package.
             - status_code: The status code of the response.
             - data: Optional list of data returned by the operation.
+        - peer: Connection the frame is for, whose negotiated compression applies (default: this one).
         
         Returns:
         - message: The packaged response message
@@ -388,17 +532,25 @@ class MessageCustom(Message):
             -  message_hdr: The message header
             -  message: The message content
         """
+        # Reuse cached frames for constant responses
+        key = self._constant_response_key(response)
+        if key is not None and key in self._response_cache:
+            return self._response_cache[key]
         # Encode content
         content_data = [response["status_code"]] + response.get("data", [])
         content_bytes = encode_protocol(content_data)
+        peer = self if peer is None else peer
+        codec, content_bytes = self._compress(content_bytes, peer, key)
 
         # Encode header in custom format
         header = [self._header['content_encoding'], len(content_bytes), self._header['opcode']]
         header_bytes = encode_protocol(header)
 
         # Encode protoheader and package message
-        message_hdr = struct.pack(">H", VERSION) + struct.pack(">H", len(header_bytes))
+        message_hdr = pack_protoheader(len(header_bytes), codec, bool(getattr(peer, "_peer_accepts", 0)))
         message = message_hdr + header_bytes + content_bytes
+        if key is not None:
+            self._response_cache[key] = message
         return message
 
     def _process_request(self):
@@ -418,47 +570,25 @@ class MessageCustom(Message):
 
         # Load send buffer
         self.response_created = True
-        self._send_buffer += message
-
-    def process_header(self):
-        """Custom header processing using decode_protocol instead of JSON."""
-        hdrlen = self._header_len
-
-        # Check if header is fully received
-        if len(self._recv_buffer) >= hdrlen:
-            try:
-                # Decode header data
-                encoding, content_length, opcode = decode_protocol(self._recv_buffer[:hdrlen])
-                self._header = {
-                    "content_encoding": encoding,
-                    "content_length": content_length,
-                    "opcode": opcode,
-                }
-                self._recv_buffer = self._recv_buffer[hdrlen:]
-            except ValueError as e:
-                logging.error(f"Error decoding header: {e}")
+        self._queue_send(message)
 
-            # Check header fields   
-            for reqhdr in ("content_encoding", "content_length", "opcode"):
-                if reqhdr not in self._header:
-                    logging.error(f"Missing required header '{reqhdr}'.")
-
-    def process_content(self):
+    def _decode_header(self, header_bytes):
+        """Custom header decoding using decode_protocol instead of JSON."""
+        try:
+            encoding, content_length, opcode = decode_protocol(header_bytes)
+        except ValueError as e:
+            logging.error(f"Error decoding header: {e}")
+            raise
+        return {
+            "content_encoding": encoding,
+            "content_length": content_length,
+            "opcode": opcode,
+        }
+
+    def process_content(self, content_bytes):
         """Custom processing of message content using decode_protocol."""
-
-        # Check if request is fully received
-        content_len = self._header["content_length"]
-        if len(self._recv_buffer) < content_len:
-            return
-
-        # Extract and decode content
-        data = self._recv_buffer[:content_len]
-        self._recv_buffer = self._recv_buffer[content_len:]
-        request = decode_protocol(data)
+        request = decode_protocol(content_bytes)
 
         # Save request data
         self.request = {"args": request}
-        logging.info(f"Received request {self.request!r} from {self.addr}")
-
-        # Set selector to listen for write events, indicating readiness
-        self._set_selector_events_mask("w")
\ No newline at end of file
+        logging.debug("Received request %r from %s", self.request, self.addr)
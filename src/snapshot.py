@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import logging
+
+META_TABLE = "raft_snapshot" # Log position a snapshot reflects; only exists in snapshot files
+
+def create(db_path, path, last_idx, last_term):
+    """Copy the database at db_path to path with SQLite's online backup API and record the last log index (and its
+    term) the copy reflects. The copy is written next to path and renamed, so path always holds a complete snapshot."""
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(partial)
+    try:
+        src.backup(dst)
+        dst.execute(f"CREATE TABLE {META_TABLE} (last_idx INTEGER, last_term INTEGER)")
+        dst.execute(f"INSERT INTO {META_TABLE} VALUES (?, ?)", (last_idx, last_term))
+        dst.commit()
+    finally:
+        dst.close()
+        src.close()
+    with open(partial, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+
+def read_meta(path):
+    """(last_idx, last_term) of the snapshot at path; (0, 0) if there is none."""
+    if not os.path.exists(path):
+        return 0, 0
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT last_idx, last_term FROM {META_TABLE}").fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"[SNAPSHOT] Unreadable snapshot | path: {path}, error: {e}")
+        raise
+    finally:
+        conn.close()
+
+def restore(path, db_path):
+    """Replace the contents of the database at db_path with the snapshot at path, through the backup API, so the
+    file stays in place for connections that open it concurrently."""
+    src = sqlite3.connect(path)
+    dst = sqlite3.connect(db_path)
+    try:
+        src.backup(dst)
+        dst.execute(f"DROP TABLE IF EXISTS {META_TABLE}")
+        dst.commit()
+    finally:
+        dst.close()
+        src.close()
+
+def chunks(f, chunk_size):
+    """Read an open snapshot file as (offset, data, done) chunks; the last chunk has done set."""
+    offset = 0
+    data = f.read(chunk_size)
+    while True:
+        following = f.read(chunk_size) if data else b""
+        yield offset, data, not following
+        if not following:
+            return
+        offset += len(data)
+        data = following
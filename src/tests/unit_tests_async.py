@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+import asyncio
+import socket
+import struct
+import tempfile
+from unittest.mock import MagicMock, patch
+# Adjust path to ensure tests can import the server
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import ResponseCode, OpCode, database_setup
+import client_handler
+import server_async
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class TestAsyncServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Start the asyncio server on a scratch database"""
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp.name, "test.db")
+        database_setup(db_path)
+        self.patcher = patch.object(server_async, "DB_PATH", db_path)
+        self.patcher.start()
+        self.port = free_port()
+        self.server = asyncio.create_task(server_async.serve("127.0.0.1", self.port, 0, db_workers=2))
+        for _ in range(50):
+            try:
+                self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+                break
+            except OSError:
+                await asyncio.sleep(0.01)
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        self.server.cancel()
+        try:
+            await self.server
+        except asyncio.CancelledError:
+            pass
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def request(self, opcode, args):
+        message = client_handler.Message(None, None, None, {"content_encoding": "utf-8", "content": {"args": args}, "opcode": opcode})
+        return message._package_request(message.request)
+
+    async def responses(self, n):
+        """Read n responses from the server"""
+        incoming_queue = MagicMock()
+        client = client_handler.Message(None, None, None, None, incoming_queue)
+        while incoming_queue.put.call_count < n:
+            client._recv_buffer += await asyncio.wait_for(self.reader.read(65536), 5)
+            client._drain_frames()
+        return [c.args[0] for c in incoming_queue.put.call_args_list]
+
+    async def test_pipelined_requests_answered_in_order(self):
+        """Test that pipelined requests are answered in order although they run on a thread pool"""
+        self.writer.write(self.request(OpCode.CREATE_ACCOUNT.value, ["amy", "pw", "bio"])
+                          + self.request(OpCode.ACCOUNT_EXISTS.value, ["amy"])
+                          + self.request(OpCode.LOGIN_ACCOUNT.value, ["amy", "pw"])
+                          + self.request(OpCode.SEND_MSG.value, ["amy", "amy", "hi"]))
+        responses = await self.responses(5)
+        self.assertEqual([r["opcode"] for r in responses], [
+            OpCode.CREATE_ACCOUNT.value, OpCode.ACCOUNT_EXISTS.value, OpCode.LOGIN_ACCOUNT.value,
+            OpCode.RECEIVE_MSG.value, OpCode.SEND_MSG.value])
+        self.assertEqual(responses[1]["status_code"], ResponseCode.ACCOUNT_EXISTS.value)
+        self.assertEqual(responses[3]["data"][0][3], "hi")
+
+    async def test_paused_transport_defers_pushes(self):
+        """Test that a receiver whose transport paused writing gets undelivered messages"""
+        self.writer.write(self.request(OpCode.CREATE_ACCOUNT.value, ["amy", "pw", "bio"])
+                          + self.request(OpCode.LOGIN_ACCOUNT.value, ["amy", "pw"]))
+        await self.responses(2)
+        server_async.active_clients["amy"].pause_writing()
+        self.writer.write(self.request(OpCode.SEND_MSG.value, ["amy", "amy", "hi"])
+                          + self.request(OpCode.READ_MSG_UNDELIVERED.value, ["amy", 5]))
+        responses = await self.responses(2)
+        self.assertEqual([r["opcode"] for r in responses], [OpCode.SEND_MSG.value, OpCode.READ_MSG_UNDELIVERED.value])
+        self.assertEqual(server_async.metrics["deferred_pushes"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+import socket
+from unittest.mock import MagicMock
+# Adjust path to ensure tests can import codec
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from codec import JSONCodec, available_backends
+from utils import ResponseCode, OpCode
+import server_handler
+
+class TestJSONCodec(unittest.TestCase):
+
+    def test_roundtrip_all_backends(self):
+        """Test that every installed backend round-trips the same payload"""
+        obj = {"status_code": 200, "data": [0, [1, "amy", "hannah", "héllo 🌺", 3030, True]]}
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                codec = JSONCodec(backend)
+                encoded = codec.encode(obj, "utf-8")
+                self.assertIsInstance(encoded, bytes)
+                self.assertEqual(codec.decode(encoded, "utf-8"), obj)
+
+    def test_decode_memoryview(self):
+        """Test decoding directly from a memoryview slice"""
+        buf = bytearray(b'xx{"args":["hannah"]}yy')
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                with memoryview(buf)[2:-2] as view:
+                    self.assertEqual(JSONCodec(backend).decode(view, "utf-8"), {"args": ["hannah"]})
+
+    def test_tuples_encode_as_lists(self):
+        """Test that database rows (tuples) encode as JSON arrays"""
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                codec = JSONCodec(backend)
+                self.assertEqual(codec.decode(codec.encode([(1, "a")], "utf-8"), "utf-8"), [[1, "a"]])
+
+    def test_unknown_backend(self):
+        """Test that requesting a missing backend fails"""
+        with self.assertRaises(ValueError):
+            JSONCodec("simdjson")
+
+class TestConstantResponseCache(unittest.TestCase):
+
+    def test_success_frame_is_cached(self):
+        """Test that a plain SUCCESS response is encoded once and reused"""
+        message = server_handler.Message(MagicMock(), MagicMock(spec=socket.socket), ("127.0.0.1", 65432), db_path=None, active_clients={})
+        message._header = {"content_encoding": "utf-8", "content_length": 0, "opcode": OpCode.STARTING.value}
+        first = message._package_response({"status_code": ResponseCode.SUCCESS.value, "data": []})
+        message._header = {"content_encoding": "utf-8", "content_length": 0, "opcode": OpCode.STARTING.value}
+        second = message._package_response({"status_code": ResponseCode.SUCCESS.value, "data": []})
+        self.assertIs(first, second)
+
+        # Responses with data are always encoded
+        message._header = {"content_encoding": "utf-8", "content_length": 0, "opcode": OpCode.STARTING.value}
+        with_data = message._package_response({"status_code": ResponseCode.SUCCESS.value, "data": [1]})
+        self.assertNotEqual(first, with_data)
+
+if __name__ == '__main__':
+    unittest.main()
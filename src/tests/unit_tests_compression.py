@@ -0,0 +1,108 @@
+import unittest
+import sys
+import os
+import socket
+import struct
+from unittest.mock import MagicMock, patch
+# Adjust path to ensure tests can import the compression helpers
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import ResponseCode, OpCode
+import compression
+import framing
+import client_handler
+import server_handler
+
+class TestCompression(unittest.TestCase):
+
+    def test_threshold_and_round_trip(self):
+        """Test that small or incompressible content is left alone and the rest round-trips"""
+        for codec in compression.PREFERRED:
+            with self.subTest(codec=codec):
+                self.assertEqual(compression.compress(b"x" * 10, codec, threshold=512), (compression.NONE, b"x" * 10))
+                self.assertEqual(compression.compress(os.urandom(1024), codec, threshold=0)[0], compression.NONE)
+                used, packed = compression.compress(b"hello " * 200, codec, threshold=512)
+                self.assertEqual(used, codec)
+                self.assertLess(len(packed), 1200)
+                self.assertEqual(compression.decompress(packed, compression.ACCEPT_FLAGS | used), b"hello " * 200)
+
+    def test_oversize_content_rejected(self):
+        """Test that highly compressible content inflating past the limit is rejected, and content at the limit is not"""
+        for codec in [compression.DEFLATE] + [c for c in compression.PREFERRED if c != compression.DEFLATE]:
+            with self.subTest(codec=codec):
+                used, packed = compression.compress(b"\0" * (1 << 20), codec, threshold=0)
+                self.assertLess(len(packed), 1 << 13)
+                with self.assertRaises(ValueError):
+                    compression.decompress(packed, used, max_length=1 << 16)
+                self.assertEqual(len(compression.decompress(packed, used, max_length=1 << 20)), 1 << 20)
+        with self.assertRaises(ValueError):
+            compression.decompress(b"not deflate", compression.DEFLATE)
+
+    def test_negotiation(self):
+        """Test that a peer gets the preferred codec it accepts, and none if it announces nothing"""
+        self.assertEqual(compression.negotiate(0), compression.NONE)
+        deflate_only = (1 << (compression.DEFLATE - 1)) << compression.ACCEPT_SHIFT
+        self.assertEqual(compression.negotiate(deflate_only), compression.DEFLATE)
+
+class TestCompressedFrames(unittest.TestCase):
+
+    def setUp(self):
+        self.server = {}
+        self.incoming_queue = MagicMock()
+        self.data = [(i, "amy", "bob", "the same message body " * 4, 1700000000) for i in range(20)]
+
+    def exchange(self, server_cls, client_cls):
+        """Send a request from a client stub, then return the server's frame for a large response and what the client decodes from it"""
+        server = server_cls(MagicMock(), MagicMock(spec=socket.socket), ("127.0.0.1", 65432), db_path=None, active_clients={})
+        client = client_cls(None, None, None, None, self.incoming_queue)
+        request = client._package_request({"content_encoding": "utf-8", "content": {"args": ["amy"]}, "opcode": OpCode.HOMEPAGE.value})
+        server._recv_buffer += request
+        server.process_protoheader()
+        server.process_header()
+        frame = server._package_response({"status_code": ResponseCode.SUCCESS.value, "data": self.data})
+        client._recv_buffer += frame
+        client._drain_frames()
+        return frame, self.incoming_queue.put.call_args.args[0]["data"]
+
+    @unittest.skipUnless(compression.PREFERRED, "Compression disabled in config")
+    def test_large_response_compressed_for_client(self):
+        """Test that a client announcing codecs gets large responses compressed, on both protocols"""
+        for server_cls, client_cls in ((server_handler.Message, client_handler.Message),
+                                       (server_handler.MessageCustom, client_handler.MessageCustom)):
+            with self.subTest(protocol=server_cls.__name__):
+                frame, data = self.exchange(server_cls, client_cls)
+                flags = frame[0]
+                self.assertEqual(flags & compression.CODEC_MASK, compression.PREFERRED[0])
+                self.assertEqual([list(m) for m in data], [list(m) for m in self.data])
+
+    def test_oversize_request_gets_bad_request(self):
+        """Test that a request inflating past MAX_CONTENT_LEN is answered with BAD_REQUEST and the next one still runs"""
+        server = server_handler.Message(MagicMock(), MagicMock(spec=socket.socket), ("127.0.0.1", 65432), db_path=None, active_clients={})
+        server._generate_action = MagicMock(return_value={"status_code": ResponseCode.SUCCESS.value})
+        def frame(content, codec):
+            header = server._json_encode({"content_encoding": "utf-8", "content_length": len(content), "opcode": OpCode.HOMEPAGE.value}, "utf-8")
+            return framing.pack_protoheader(len(header), codec) + header + content
+        bomb = server._json_encode({"args": ["amy" + " " * (1 << 20)]}, "utf-8")
+        server._recv_buffer += frame(compression.compress(bomb, compression.DEFLATE, threshold=0)[1], compression.DEFLATE)
+        server._recv_buffer += frame(server._json_encode({"args": ["amy"]}, "utf-8"), compression.NONE)
+        with patch.object(compression, "MAX_CONTENT_LEN", 1 << 16):
+            self.assertEqual(server._drain_frames(), 2)
+
+        statuses = []
+        for sent in server._send_queue:
+            _, _, header_len = struct.unpack_from(framing.PROTOHEADER_FMT, sent)
+            statuses.append(server._json_decode(sent[framing.PROTOHEADER_LEN + header_len:], "utf-8")["status_code"])
+        self.assertEqual(statuses, [ResponseCode.BAD_REQUEST.value, ResponseCode.SUCCESS.value])
+        server._generate_action.assert_called_once_with(OpCode.HOMEPAGE.value, ["amy"])
+
+    def test_old_client_gets_plain_frames(self):
+        """Test that a client using the old version-only protoheader is never sent compressed frames"""
+        server = server_handler.Message(MagicMock(), MagicMock(spec=socket.socket), ("127.0.0.1", 65432), db_path=None, active_clients={})
+        header = server._json_encode({"content_encoding": "utf-8", "content_length": 2, "opcode": OpCode.HOMEPAGE.value}, "utf-8")
+        server._recv_buffer += struct.pack(">HH", framing.VERSION, len(header)) + header + b"{}"
+        server.process_protoheader()
+        server.process_header()
+        frame = server._package_response({"status_code": ResponseCode.SUCCESS.value, "data": self.data})
+        self.assertEqual(struct.unpack_from(">HH", frame)[0], framing.VERSION)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import select
+import socket
+import struct
+import threading
+from unittest.mock import MagicMock
+# Adjust path to ensure tests can import the dispatcher
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import ResponseCode, OpCode
+from dispatch import RequestDispatcher
+import client_handler
+import server_handler
+
+class TestRequestDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = RequestDispatcher(4)
+
+    def tearDown(self):
+        self.dispatcher.close()
+
+    def run_loop(self, until):
+        """Run dispatched callbacks the way the server loop would, until the condition holds"""
+        while not until():
+            readable, _, _ = select.select([self.dispatcher.sock], [], [], 5)
+            self.assertTrue(readable, "Dispatcher never woke the loop")
+            self.dispatcher.process_events(None)
+
+    def test_callbacks_run_on_loop_in_order(self):
+        """Test that callbacks queued from pool threads run on the loop thread, in order"""
+        calls = []
+        def work():
+            for i in range(3):
+                self.dispatcher.call_soon(lambda i=i: calls.append((i, self.dispatcher.on_loop_thread())))
+        done = []
+        self.dispatcher.submit(work, done=done.append)
+        self.run_loop(lambda: done)
+        self.assertEqual(calls, [(0, True), (1, True), (2, True)])
+        self.assertIsNone(done[0].exception())
+
+    def test_pipelined_requests_keep_order(self):
+        """Test that a connection's requests run one at a time and are answered in order"""
+        pending_writes = set()
+        message = server_handler.Message(MagicMock(), MagicMock(spec=socket.socket), ("127.0.0.1", 65432), db_path=None,
+                                         active_clients={}, pending_writes=pending_writes, dispatcher=self.dispatcher)
+        message.db = MagicMock()
+        started = threading.Event()
+        release = threading.Event()
+        def homepage(*args):
+            started.set()
+            release.wait(5)
+            return {"status_code": ResponseCode.SUCCESS.value, "data": [0]}
+        message.db.fetch_homepage.side_effect = homepage
+        message.db.account_exists.return_value = True
+
+        frames = b""
+        for opcode, args in ((OpCode.HOMEPAGE, ["amy"]), (OpCode.STARTING, []), (OpCode.ACCOUNT_EXISTS, ["amy"])):
+            content = message._json_encode({"args": args}, "utf-8")
+            header = message._json_encode({"content_encoding": "utf-8", "content_length": len(content), "opcode": opcode.value}, "utf-8")
+            frames += struct.pack(">HH", 1, len(header)) + header + content
+        message.sock.recv.return_value = frames
+        message.read()
+
+        # The slow first request blocks the others on this connection
+        self.assertTrue(started.wait(5))
+        self.assertTrue(message._in_flight)
+        self.assertEqual(len(message._send_queue), 0)
+        release.set()
+        self.run_loop(lambda: len(message._send_queue) == 3 and not message._in_flight)
+        self.assertEqual(pending_writes, {message})
+
+        incoming_queue = MagicMock()
+        client = client_handler.Message(None, None, None, None, incoming_queue)
+        client._recv_buffer += b"".join(message._send_queue)
+        client._drain_frames()
+        self.assertEqual([c.args[0]["opcode"] for c in incoming_queue.put.call_args_list],
+                         [OpCode.HOMEPAGE.value, OpCode.STARTING.value, OpCode.ACCOUNT_EXISTS.value])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+import select
+import selectors
+import socket
+from unittest.mock import MagicMock
+# Adjust path to ensure tests can import the selector
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import server_handler
+
+@unittest.skipUnless(hasattr(select, "epoll"), "Linux epoll only")
+class TestEdgeTriggeredSelector(unittest.TestCase):
+
+    def setUp(self):
+        from edge_selector import EdgeTriggeredSelector
+        self.sel = EdgeTriggeredSelector()
+        self.a, self.b = socket.socketpair()
+        self.a.setblocking(False)
+
+    def tearDown(self):
+        self.sel.close()
+        self.a.close()
+        self.b.close()
+
+    def test_events_reported_once_per_edge(self):
+        """Test that readiness is reported on new data only, not while data stays unread"""
+        self.sel.register(self.a, selectors.EVENT_READ, data="a")
+        # Writable edge right after registration
+        self.assertEqual([(k.data, m) for k, m in self.sel.select(0)], [("a", selectors.EVENT_WRITE)])
+        self.b.send(b"hi")
+        self.assertEqual([m for _, m in self.sel.select(0)], [selectors.EVENT_READ | selectors.EVENT_WRITE])
+        # Nothing new arrived: no event, although the data was not read
+        self.assertEqual(self.sel.select(0), [])
+
+    def test_modify_only_updates_data(self):
+        """Test that modify keeps edge-triggered read and write interest and swaps data"""
+        self.sel.register(self.a, selectors.EVENT_READ, data="old")
+        key = self.sel.modify(self.a, selectors.EVENT_READ, data="new")
+        self.assertEqual(key.events, selectors.EVENT_READ | selectors.EVENT_WRITE)
+        self.assertEqual(self.sel.get_key(self.a).data, "new")
+        self.sel.unregister(self.a)
+        with self.assertRaises(KeyError):
+            self.sel.get_key(self.a)
+
+    def test_handler_drains_socket(self):
+        """Test that a handler on an edge-triggered selector reads everything available in one event"""
+        message = server_handler.Message(self.sel, self.a, ("127.0.0.1", 65432), db_path=None, active_clients={})
+        payload = b"x" * (3 * server_handler.RECV_SIZE + 10)
+        self.b.sendall(payload)
+        message._read()
+        self.assertEqual(bytes(message._recv_buffer), payload)
+
+        # The default selector keeps one recv per event
+        message = server_handler.Message(MagicMock(), self.a, ("127.0.0.1", 65432), db_path=None, active_clients={})
+        self.b.sendall(payload)
+        message._read()
+        self.assertEqual(len(message._recv_buffer), server_handler.RECV_SIZE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+# Adjust path to ensure tests can import the election helpers
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import election
+from election import ElectionState
+
+class TestElection(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "election.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_timeout_is_randomized_within_range(self):
+        """Test that election timeouts fall in the configured range and differ between draws"""
+        timeouts = [election.timeout() for _ in range(100)]
+        self.assertTrue(all(election.TIMEOUT_MIN <= t <= election.TIMEOUT_MAX for t in timeouts))
+        self.assertGreater(len(set(timeouts)), 1)
+
+    def test_log_up_to_date(self):
+        """Test that the later last term wins, and the longer log wins on equal terms"""
+        self.assertTrue(election.log_up_to_date(1, 3, 10, 2))
+        self.assertFalse(election.log_up_to_date(10, 2, 1, 3))
+        self.assertTrue(election.log_up_to_date(5, 2, 5, 2))
+        self.assertFalse(election.log_up_to_date(4, 2, 5, 2))
+
+    def test_state_survives_restart(self):
+        """Test that the term and vote are read back after a restart, and a fresh file starts at term 0"""
+        state = ElectionState(self.path, fsync=False)
+        self.assertEqual((state.term, state.voted_for), (0, None))
+        state.save(4, 2)
+        state.save(5, None)
+        state = ElectionState(self.path)
+        self.assertEqual((state.term, state.voted_for), (5, None))
+        self.assertFalse(os.path.exists(self.path + ".partial"))
+
+if __name__ == '__main__':
+    unittest.main()
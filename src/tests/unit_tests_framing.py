@@ -0,0 +1,222 @@
+import unittest
+import sys
+import os
+import struct
+import selectors
+import socket
+from collections import Counter
+from unittest.mock import MagicMock
+# Adjust path to ensure tests can import handlers
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import ResponseCode, OpCode, encode_protocol, decode_protocol
+import client_handler
+import server_handler
+
+def make_frame(header_bytes, content_bytes, version=1):
+    """Build a protoheader | header | content frame."""
+    return struct.pack(">H", version) + struct.pack(">H", len(header_bytes)) + header_bytes + content_bytes
+
+def feed(message, data):
+    """Simulate a recv() that returned data, then drain frames."""
+    message._recv_buffer += data
+    return message._drain_frames()
+
+class TestClientFrameReader(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a client stub with a mocked socket and queue"""
+        self.selector = MagicMock()
+        self.sock = MagicMock(spec=socket.socket)
+        self.addr = ("127.0.0.1", 65432)
+        self.incoming_queue = MagicMock()
+        self.message = client_handler.Message(self.selector, self.sock, self.addr, None, self.incoming_queue)
+
+    def json_frame(self, opcode, response):
+        content = self.message._json_encode(response, "utf-8")
+        header = {"content_encoding": "utf-8", "content_length": len(content), "opcode": opcode}
+        return make_frame(self.message._json_encode(header, "utf-8"), content)
+
+    def test_drains_all_buffered_frames(self):
+        """Test that two frames in one read are both processed"""
+        data = self.json_frame(OpCode.SEND_MSG.value, {"status_code": 200, "data": []})
+        data += self.json_frame(OpCode.RECEIVE_MSG.value, {"status_code": 200, "data": [[1, "a", "b", "hi", 0, True]]})
+        self.assertEqual(feed(self.message, data), 2)
+        self.assertEqual(self.incoming_queue.put.call_count, 2)
+        self.assertEqual(self.message._buffered(), 0)
+
+    def test_frame_split_across_reads(self):
+        """Test that a frame fed one byte at a time keeps its partial state"""
+        data = self.json_frame(OpCode.HOMEPAGE.value, {"status_code": 200, "data": [0]})
+        handled = 0
+        for i in range(len(data)):
+            handled += feed(self.message, data[i:i + 1])
+        self.assertEqual(handled, 1)
+        self.incoming_queue.put.assert_called_once_with({"opcode": OpCode.HOMEPAGE.value, "status_code": 200, "data": [0]})
+
+    def test_partial_tail_is_kept(self):
+        """Test that an incomplete trailing frame is compacted to the front of the buffer"""
+        first = self.json_frame(OpCode.STARTING.value, {"status_code": 200, "data": []})
+        second = self.json_frame(OpCode.STARTING.value, {"status_code": 200, "data": []})
+        self.assertEqual(feed(self.message, first + second[:5]), 1)
+        self.assertEqual(self.message._recv_offset, 0)
+        self.assertEqual(bytes(self.message._recv_buffer), second[4:5])
+        self.assertEqual(feed(self.message, second[5:]), 1)
+
+    def test_custom_frames(self):
+        """Test draining custom protocol frames"""
+        message = client_handler.MessageCustom(self.selector, self.sock, self.addr, None, self.incoming_queue)
+        content = encode_protocol([200, "ok"])
+        frame = make_frame(encode_protocol(["utf-8", len(content), OpCode.STARTING.value]), content)
+        self.assertEqual(feed(message, frame * 3), 3)
+        self.incoming_queue.put.assert_called_with({"opcode": OpCode.STARTING.value, "status_code": 200, "data": ["ok"]})
+
+class TestServerFrameReader(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a server stub with a mocked socket"""
+        self.selector = MagicMock()
+        self.sock = MagicMock(spec=socket.socket)
+        self.addr = ("127.0.0.1", 65432)
+
+    def test_pipelined_requests(self):
+        """Test that every pipelined request in one read gets a response"""
+        message = server_handler.Message(self.selector, self.sock, self.addr, db_path=None, active_clients={})
+        content = message._json_encode({"args": []}, "utf-8")
+        header = message._json_encode({"content_encoding": "utf-8", "content_length": len(content), "opcode": OpCode.STARTING.value}, "utf-8")
+        self.sock.recv.return_value = make_frame(header, content) * 3
+        message.read()
+
+        # Parse the queued responses with a client stub
+        incoming_queue = MagicMock()
+        client = client_handler.Message(self.selector, self.sock, self.addr, None, incoming_queue)
+        self.assertEqual(feed(client, b"".join(message._send_queue)), 3)
+        incoming_queue.put.assert_called_with({"opcode": OpCode.STARTING.value, "status_code": ResponseCode.SUCCESS.value, "data": []})
+        self.selector.modify.assert_called_once_with(self.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, data=message)
+
+    def test_pipelined_requests_custom(self):
+        """Test pipelined requests with the custom protocol"""
+        message = server_handler.MessageCustom(self.selector, self.sock, self.addr, db_path=None, active_clients={})
+        content = encode_protocol([])
+        frame = make_frame(encode_protocol(["utf-8", len(content), OpCode.STARTING.value]), content)
+        self.sock.recv.return_value = frame * 2
+        message.read()
+
+        incoming_queue = MagicMock()
+        client = client_handler.MessageCustom(self.selector, self.sock, self.addr, None, incoming_queue)
+        self.assertEqual(feed(client, b"".join(message._send_queue)), 2)
+
+    def test_malformed_header_raises(self):
+        """Test that a header missing required fields is rejected"""
+        message = server_handler.Message(self.selector, self.sock, self.addr, db_path=None, active_clients={})
+        header = message._json_encode({"opcode": OpCode.STARTING.value}, "utf-8")
+        with self.assertRaises(ValueError):
+            feed(message, make_frame(header, b""))
+
+class TestFrameWriter(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a server stub that flushes from a pending_writes set"""
+        self.selector = MagicMock()
+        self.sock = MagicMock(spec=socket.socket)
+        self.addr = ("127.0.0.1", 65432)
+        self.pending_writes = set()
+        self.message = server_handler.Message(self.selector, self.sock, self.addr, db_path=None, active_clients={}, pending_writes=self.pending_writes)
+        self.sent = bytearray()
+
+    def accept(self, limit):
+        """Fake sendmsg that accepts at most limit bytes per call"""
+        def sendmsg(buffers):
+            data = b"".join(bytes(b) for b in buffers)[:limit]
+            self.sent += data
+            return len(data)
+        return sendmsg
+
+    def test_frames_coalesced_into_one_sendmsg(self):
+        """Test that frames queued in one iteration go out in a single syscall"""
+        self.sock.sendmsg.side_effect = self.accept(1 << 20)
+        for frame in (b"aaa", b"bb", b"c"):
+            self.message._queue_send(frame)
+        self.assertEqual(self.pending_writes, {self.message})
+        self.selector.modify.assert_not_called()
+
+        self.message.flush()
+        self.assertEqual(self.sock.sendmsg.call_count, 1)
+        self.assertEqual(bytes(self.sent), b"aaabbc")
+        self.assertEqual(self.pending_writes, set())
+        # Never registered for write events since nothing stayed pending
+        self.selector.modify.assert_not_called()
+
+    def test_partial_sends_track_offset(self):
+        """Test that short writes resume from the right offset and keep write interest until drained"""
+        self.sock.sendmsg.side_effect = self.accept(4)
+        for frame in (b"abc", b"defg", b"hi"):
+            self.message._queue_send(frame)
+
+        self.message.flush()
+        self.assertEqual(bytes(self.sent), b"abcd")
+        self.assertEqual(self.message._pending(), 5)
+        self.selector.modify.assert_called_with(self.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, data=self.message)
+
+        self.message.write()
+        self.message.write()
+        self.assertEqual(bytes(self.sent), b"abcdefghi")
+        self.assertEqual(self.message._pending(), 0)
+        self.selector.modify.assert_called_with(self.sock, selectors.EVENT_READ, data=self.message)
+
+    def test_would_block_keeps_queue(self):
+        """Test that a full socket buffer leaves frames queued"""
+        self.sock.sendmsg.side_effect = BlockingIOError
+        self.message._queue_send(b"abc")
+        self.message.flush()
+        self.assertEqual(self.message._pending(), 3)
+
+class TestBackpressure(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a sender and a stalled receiver sharing active_clients and metrics"""
+        self.selector = MagicMock()
+        self.sock = MagicMock(spec=socket.socket)
+        self.sock.sendmsg.side_effect = BlockingIOError # Receiver never drains
+        self.addr = ("127.0.0.1", 65432)
+        self.active_clients = {}
+        self.pending_writes = set()
+        self.metrics = Counter()
+        kwargs = dict(db_path=None, active_clients=self.active_clients, pending_writes=self.pending_writes, metrics=self.metrics)
+        self.sender = server_handler.Message(self.selector, MagicMock(spec=socket.socket), self.addr, **kwargs)
+        self.receiver = server_handler.Message(self.selector, self.sock, self.addr, **kwargs)
+        self.active_clients["bob"] = self.receiver
+        self.sender.db = MagicMock()
+        self.sender.db.insert_message.return_value = {"status_code": ResponseCode.SUCCESS.value, "data": [1]}
+        self.sender._header = {"content_encoding": "utf-8", "content_length": 0, "opcode": OpCode.SEND_MSG.value}
+
+    def send(self):
+        return self.sender._generate_action(OpCode.SEND_MSG.value, ["amy", "bob", "hi"])
+
+    def test_push_below_high_watermark(self):
+        """Test that messages are pushed while the receiver keeps up"""
+        self.assertEqual(self.send()["status_code"], ResponseCode.SUCCESS.value)
+        self.assertEqual(len(self.receiver._send_queue), 1)
+        self.assertIs(self.sender.db.insert_message.call_args.args[-1], True)
+        self.assertEqual(self.metrics["deferred_pushes"], 0)
+
+    def test_defer_above_high_watermark(self):
+        """Test that a backed-up receiver gets undelivered messages until it drains below the low watermark"""
+        self.receiver._queue_frame(b"x" * server_handler.HIGH_WATERMARK)
+        self.assertEqual(self.send()["status_code"], ResponseCode.SUCCESS.value)
+        self.assertEqual(len(self.receiver._send_queue), 1)
+        self.assertIs(self.sender.db.insert_message.call_args.args[-1], False)
+        self.assertEqual(self.metrics["deferred_pushes"], 1)
+
+        # Draining to between the watermarks keeps deferring
+        self.receiver._send_pending = server_handler.LOW_WATERMARK + 1
+        self.send()
+        self.assertEqual(self.metrics["deferred_pushes"], 2)
+
+        # Below the low watermark pushes resume
+        self.receiver._send_pending = server_handler.LOW_WATERMARK
+        self.send()
+        self.assertEqual(len(self.receiver._send_queue), 2)
+        self.assertEqual(self.metrics["deferred_pushes"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,17 +2,56 @@ import unittest
 from unittest.mock import MagicMock, patch
 import os
 import threading
+import time
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import handler_pb2
 import handler_pb2_grpc
+import server_grpc
 from server_grpc import HandlerService
+from raft_log import RaftLog
 from database import DatabaseHandler
-from utils import ResponseCode, database_setup
+from utils import ResponseCode, database_setup, apply_action
 import queue
+import tempfile
+import shutil
+import snapshot
+import election
+from concurrent import futures
+from google.protobuf import empty_pb2
 
 # Use a temporary database for testing
 TEST_DB_PATH = "test2.db"
+# ...and a temporary Raft log instead of the server's own
+server_grpc.logs = RaftLog(tempfile.mkdtemp(), fsync=False)
+# ...and a temporary term and vote
+server_grpc.election_state = election.ElectionState(os.path.join(tempfile.mkdtemp(), "election.json"), fsync=False)
+
+def lead_single_node(test):
+    """Make the server the leader of a one-server cluster for the rest of the test, on a fresh log, with its writes
+    applied to TEST_DB_PATH and a replicator thread committing them"""
+    tmp = tempfile.mkdtemp()
+    for name, value in [("n_servers", 1), ("peers", []), ("logs", RaftLog(tmp, fsync=False)), ("DB_PATH", TEST_DB_PATH),
+                        ("applier", DatabaseHandler(TEST_DB_PATH)), ("proposals", {}), ("term", 1), ("commit_idx", 0),
+                        ("last_applied", 0), ("role", server_grpc.role), ("leader_addr", None)]:
+        patcher = patch.object(server_grpc, name, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    server_grpc.become_leader()
+    stop = threading.Event()
+    def run():
+        while not stop.is_set():
+            server_grpc.replicate()
+            server_grpc.wait_for_writes(0.05)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    def finish():
+        stop.set()
+        thread.join()
+        server_grpc.logs.close()
+        server_grpc.applier.close()
+        shutil.rmtree(tmp)
+    test.addCleanup(finish)
 
 class TestHandlerService(unittest.TestCase):
     def setUp(self):
@@ -25,6 +64,7 @@ class TestHandlerService(unittest.TestCase):
 
         self.service = HandlerService()
         self.service.set_path(TEST_DB_PATH)
+        lead_single_node(self)
 
         self.addCleanup(self.tearDown)
 
@@ -233,6 +273,451 @@ class TestHandlerService(unittest.TestCase):
         self.assertEqual(response.status_code, ResponseCode.SUCCESS.value)
         self.assertGreaterEqual(len(response.acct_lst), 2)
 
+class TestReplicatedLog(unittest.TestCase):
+    def setUp(self):
+        if os.path.exists(TEST_DB_PATH):
+            os.remove(TEST_DB_PATH)
+        database_setup(TEST_DB_PATH)
+        self.service = HandlerService()
+        self.service.set_path(TEST_DB_PATH)
+        del server_grpc.logs[:]
+
+    def tearDown(self):
+        server_grpc.role = server_grpc.Role.FOLLOWER
+        del server_grpc.logs[:]
+        if os.path.exists(TEST_DB_PATH):
+            os.remove(TEST_DB_PATH)
+
+    def test_only_writes_are_logged(self):
+        """Test that reads and session RPCs are served without adding log entries"""
+        lead_single_node(self)
+        self.service.CreateAccount(handler_pb2.CreateAccountRequest(username="alice", password="pw", bio="bio"), None)
+        self.service.CheckAccountExists(handler_pb2.AccountExistsRequest(username="alice"), None)
+        self.service.LoginAccount(handler_pb2.LoginAccountRequest(username="alice", password="pw"), None)
+        self.service.ListAccount(handler_pb2.ListAccountRequest(pattern=""), None)
+        self.service.FetchHomepage(handler_pb2.FetchHomepageRequest(username="alice"), None)
+        self.service.FetchMessageRead(handler_pb2.FetchMessagesReadRequest(username="alice", num=5), None)
+        self.service.SendMessage(handler_pb2.SendMessageRequest(sender="alice", receiver="alice", content="hi"), None)
+        self.service.FetchMessageUnread(handler_pb2.FetchMessagesUnreadRequest(username="alice", num=5), None)
+        # After the no-op entry the leader starts its term with
+        self.assertEqual([e.WhichOneof("request") for e in server_grpc.logs], [None, "create_acc", "send_msg", "fetch_unread"])
+
+    def test_writes_return_once_committed(self):
+        """Test that a write returns the result of applying its committed entry, and that only the leader takes writes"""
+        with self.assertRaises(RuntimeError):
+            self.service.CreateAccount(handler_pb2.CreateAccountRequest(username="alice", password="pw", bio="bio"), None)
+        self.assertEqual(len(server_grpc.logs), 0)
+
+        lead_single_node(self)
+        response = self.service.CreateAccount(handler_pb2.CreateAccountRequest(username="alice", password="pw", bio="bio"), None)
+        self.assertEqual(response.status_code, ResponseCode.SUCCESS.value)
+        self.assertGreaterEqual(server_grpc.last_applied, 2)
+        self.assertEqual(server_grpc.applier.last_applied(), server_grpc.last_applied)
+        response = self.service.CreateAccount(handler_pb2.CreateAccountRequest(username="alice", password="pw", bio="bio"), None)
+        self.assertEqual(response.status_code, ResponseCode.ACCOUNT_EXISTS.value)
+        self.assertEqual(server_grpc.proposals, {})
+
+    def test_replicas_agree_on_delivered(self):
+        """Test that a follower applying the log marks messages delivered exactly as the leader did, so unread counts
+        read from either replica match"""
+        lead_single_node(self)
+        for username in ("alice", "bob"):
+            self.service.CreateAccount(handler_pb2.CreateAccountRequest(username=username, password="pw", bio=""), None)
+        with patch.object(server_grpc, "active_clients", {"bob": queue.Queue()}):
+            self.service.SendMessage(handler_pb2.SendMessageRequest(sender="alice", receiver="bob", content="pushed"), None)
+            self.assertEqual(server_grpc.active_clients["bob"].get_nowait().content, "pushed")
+        with patch.object(server_grpc, "active_clients", {}):
+            self.service.SendMessage(handler_pb2.SendMessageRequest(sender="alice", receiver="bob", content="stored"), None)
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        follower = DatabaseHandler(os.path.join(tmp, "follower.db"))
+        database_setup(follower.path)
+        for entry in server_grpc.logs:
+            apply_action(entry, follower)
+        leader = DatabaseHandler(TEST_DB_PATH)
+        for db in (leader, follower):
+            self.assertEqual((db.count_messages("bob", False), db.count_messages("bob", True)), (1, 1))
+
+    def test_concurrent_writes_share_a_round(self):
+        """Test that the replicator wakes on a write and waits up to the batch delay for the batch to fill"""
+        with patch.object(server_grpc, "WRITE_BATCH_ENTRIES", 3), patch.object(server_grpc, "WRITE_BATCH_DELAY", 5), patch.object(server_grpc, "unsent", 0):
+            start = time.monotonic()
+            self.assertIsNone(server_grpc.wait_for_writes(0.05))
+            self.assertLess(time.monotonic() - start, 1)
+
+            writers = [threading.Timer(0.05 * i, server_grpc.wake_replicator) for i in range(3)]
+            for writer in writers:
+                writer.start()
+            start = time.monotonic()
+            server_grpc.wait_for_writes(5)
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertEqual(server_grpc.unsent, 0)
+
+    def test_leader_reads_wait_for_lease(self):
+        """Test that a leader serves reads under its lease, and otherwise only after a heartbeat round confirms it"""
+        server_grpc.role = server_grpc.Role.LEADER
+        server_grpc.leadership_confirmed = 0.0
+        self.assertFalse(server_grpc.read_barrier(timeout=0.01))
+        with self.assertRaises(RuntimeError):
+            self.service.CheckAccountExists(handler_pb2.AccountExistsRequest(username="alice"), None)
+
+        # A round that starts after the read arrived confirms it (ReadIndex)
+        confirm = threading.Timer(0.05, lambda: server_grpc.confirm_leadership(time.monotonic()))
+        confirm.start()
+        self.assertTrue(server_grpc.read_barrier(timeout=2))
+        # ...and renews the lease for the reads that follow
+        self.assertTrue(server_grpc.read_barrier(timeout=0))
+
+class TestReadConsistency(unittest.TestCase):
+    def setUp(self):
+        if os.path.exists(TEST_DB_PATH):
+            os.remove(TEST_DB_PATH)
+        database_setup(TEST_DB_PATH)
+        self.service = HandlerService()
+        self.service.set_path(TEST_DB_PATH)
+        DatabaseHandler(TEST_DB_PATH).create_account("alice", "pw", "")
+        for name, value in [("role", server_grpc.Role.FOLLOWER), ("leader_addr", server_grpc.peers[0]), ("caught_up", 0.0),
+                            ("last_applied", 0), ("commit_idx", 0), ("term", 1)]:
+            patcher = patch.object(server_grpc, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        if os.path.exists(TEST_DB_PATH):
+            os.remove(TEST_DB_PATH)
+
+    def exists(self, consistency, max_staleness_ms=0):
+        request = handler_pb2.AccountExistsRequest(username="alice", consistency=consistency, max_staleness_ms=max_staleness_ms)
+        return self.service.CheckAccountExists(request, None).exists
+
+    def test_follower_serves_reads_within_staleness_bound(self):
+        """Test that a follower refuses leader-only reads and serves bounded-staleness reads only while it is fresh enough"""
+        with self.assertRaises(RuntimeError):
+            self.exists(handler_pb2.LEADER)
+        with self.assertRaises(RuntimeError):
+            self.exists(handler_pb2.BOUNDED_STALENESS)
+        server_grpc.caught_up = time.monotonic() - 0.5
+        self.assertTrue(self.exists(handler_pb2.BOUNDED_STALENESS))
+        with self.assertRaises(RuntimeError):
+            self.exists(handler_pb2.BOUNDED_STALENESS, max_staleness_ms=100)
+
+    def test_follower_read_index_waits_for_leader_commit(self):
+        """Test that a READ_INDEX read on a follower is served once it has applied the leader's commit index"""
+        reply = futures.Future()
+        reply.set_result(handler_pb2.ReadIndexResponse(term=1, success=True, read_idx=3))
+        with patch.object(server_grpc, "raft_call", return_value=reply) as call:
+            server_grpc.last_applied = 2
+            self.assertFalse(server_grpc.follower_read_index(timeout=0.05))
+            def apply():
+                with server_grpc.applied_cond:
+                    server_grpc.last_applied = 3
+                    server_grpc.applied_cond.notify_all()
+            threading.Timer(0.05, apply).start()
+            self.assertTrue(self.exists(handler_pb2.READ_INDEX))
+        self.assertEqual(call.call_args[0][:2], (server_grpc.peers[0], "ReadIndex"))
+
+        reply = futures.Future()
+        reply.set_result(handler_pb2.ReadIndexResponse(term=2, success=False))
+        with patch.object(server_grpc, "raft_call", return_value=reply):
+            with self.assertRaises(RuntimeError):
+                self.exists(handler_pb2.READ_INDEX)
+
+    def test_leader_read_index(self):
+        """Test that the leader hands out its commit index only once it has committed in its term and confirmed leadership"""
+        logs = RaftLog(tempfile.mkdtemp(), fsync=False)
+        self.addCleanup(logs.close)
+        logs.extend([handler_pb2.Entry(term=1), handler_pb2.Entry(term=2)])
+        with patch.object(server_grpc, "logs", logs), patch.object(server_grpc, "term", 2), patch.object(server_grpc, "role", server_grpc.Role.LEADER):
+            raft = server_grpc.RaftService()
+            server_grpc.commit_idx = 1
+            server_grpc.confirm_leadership(time.monotonic())
+            self.assertFalse(raft.ReadIndex(empty_pb2.Empty(), None).success)
+            server_grpc.commit_idx = 2
+            response = raft.ReadIndex(empty_pb2.Empty(), None)
+            self.assertEqual((response.success, response.read_idx), (True, 2))
+
+class TestElection(unittest.TestCase):
+    def setUp(self):
+        logs = RaftLog(tempfile.mkdtemp(), fsync=False)
+        logs.extend([handler_pb2.Entry(term=1), handler_pb2.Entry(term=2)])
+        self.addCleanup(logs.close)
+        for name, value in [("logs", logs), ("term", 2), ("voted_for", None), ("role", server_grpc.Role.FOLLOWER),
+                            ("leader_addr", None), ("last_heartbeat", 0.0)]:
+            patcher = patch.object(server_grpc, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.raft = server_grpc.RaftService()
+
+    def vote(self, method, cand_id, cand_term, prev_log_idx=2, prev_log_term=2):
+        request = handler_pb2.VoteRequest(cand_id=cand_id, cand_term=cand_term, prev_log_idx=prev_log_idx, prev_log_term=prev_log_term)
+        return getattr(self.raft, method)(request, None).success
+
+    def test_vote_once_per_term_for_up_to_date_logs(self):
+        """Test that a server votes for one candidate per term, persists the vote, and rejects candidates with stale logs"""
+        self.assertFalse(self.vote("Vote", 1, 3, prev_log_idx=5, prev_log_term=1))
+        self.assertEqual((server_grpc.term, server_grpc.voted_for), (3, None))
+        self.assertTrue(self.vote("Vote", 1, 3, prev_log_idx=2))
+        self.assertTrue(self.vote("Vote", 1, 3, prev_log_idx=2))
+        self.assertFalse(self.vote("Vote", 2, 3, prev_log_idx=9))
+        self.assertEqual((server_grpc.election_state.term, server_grpc.election_state.voted_for), (3, 1))
+        # A leader's heartbeat in the same term keeps the vote
+        self.raft.AppendEntries(handler_pb2.AppendEntriesRequest(term=3, leader_addr=server_grpc.peers[0], prev_log_idx=2, prev_log_term=2), None)
+        self.assertEqual(server_grpc.voted_for, 1)
+        self.assertTrue(self.vote("Vote", 2, 4))
+
+    def test_pre_vote_changes_nothing_and_respects_live_leader(self):
+        """Test that PreVote is granted only without a recently heard leader, and never changes the term or vote"""
+        self.assertTrue(self.vote("PreVote", 1, 3))
+        self.assertFalse(self.vote("PreVote", 1, 2))
+        self.assertFalse(self.vote("PreVote", 1, 3, prev_log_term=1))
+        self.assertEqual((server_grpc.term, server_grpc.voted_for), (2, None))
+        server_grpc.leader_addr, server_grpc.last_heartbeat = server_grpc.peers[0], time.time()
+        self.assertFalse(self.vote("PreVote", 1, 3))
+        server_grpc.last_heartbeat = time.time() - election.TIMEOUT_MIN
+        self.assertTrue(self.vote("PreVote", 1, 3))
+
+class TestLogReplication(unittest.TestCase):
+    def setUp(self):
+        if os.path.exists(TEST_DB_PATH):
+            os.remove(TEST_DB_PATH)
+        database_setup(TEST_DB_PATH)
+        self.saved = (server_grpc.DB_PATH, server_grpc.SNAPSHOT_PATH, server_grpc.logs, server_grpc.term, server_grpc.commit_idx, server_grpc.last_applied, server_grpc.applier)
+        self.tmp = tempfile.mkdtemp()
+        server_grpc.DB_PATH = TEST_DB_PATH
+        server_grpc.applier = DatabaseHandler(TEST_DB_PATH)
+        server_grpc.SNAPSHOT_PATH = os.path.join(self.tmp, "snapshot.db")
+        server_grpc.logs = RaftLog(os.path.join(self.tmp, "wal"), fsync=False)
+        server_grpc.term = 1
+        server_grpc.commit_idx = server_grpc.last_applied = 0
+
+    def tearDown(self):
+        server_grpc.logs.close()
+        server_grpc.applier.close()
+        server_grpc.DB_PATH, server_grpc.SNAPSHOT_PATH, server_grpc.logs, server_grpc.term, server_grpc.commit_idx, server_grpc.last_applied, server_grpc.applier = self.saved
+        server_grpc.role = server_grpc.Role.FOLLOWER
+        shutil.rmtree(self.tmp)
+        if os.path.exists(TEST_DB_PATH):
+            os.remove(TEST_DB_PATH)
+
+    @staticmethod
+    def entry(term, username):
+        return handler_pb2.Entry(term=term, create_acc=handler_pb2.CreateAccountRequest(username=username, password="pw", bio=""))
+
+    def test_follower_backs_off_then_appends_and_applies(self):
+        """Test that a follower rejects a gap or a term mismatch with a hint, truncates conflicts and applies committed entries"""
+        raft = server_grpc.RaftService()
+        server_grpc.logs.extend([self.entry(1, "a"), self.entry(1, "stale")])
+
+        # Gap: the follower only has 2 entries
+        response = raft.AppendEntries(handler_pb2.AppendEntriesRequest(term=2, prev_log_idx=4, prev_log_term=2), None)
+        self.assertFalse(response.success)
+        self.assertEqual(response.conflict_idx, 3)
+
+        # Mismatch at index 2: the whole term 1 run is reported
+        response = raft.AppendEntries(handler_pb2.AppendEntriesRequest(term=2, prev_log_idx=2, prev_log_term=2), None)
+        self.assertFalse(response.success)
+        self.assertEqual((response.conflict_term, response.conflict_idx), (1, 1))
+
+        response = raft.AppendEntries(handler_pb2.AppendEntriesRequest(
+            term=2, prev_log_idx=1, prev_log_term=1, entries=[self.entry(2, "b"), self.entry(2, "c")], commit=2), None)
+        self.assertTrue(response.success)
+        self.assertEqual(response.match_idx, 3)
+        self.assertEqual([e.create_acc.username for e in server_grpc.logs], ["a", "b", "c"])
+        self.assertEqual(server_grpc.commit_idx, 2)
+        db = DatabaseHandler(TEST_DB_PATH)
+        self.assertTrue(db.account_exists("b"))
+        self.assertFalse(db.account_exists("c"))
+
+    def test_follower_conflict_after_compaction(self):
+        """Test that a conflicting run reaching back into a compacted prefix is reported from base_index + 1"""
+        server_grpc.logs.close()
+        server_grpc.logs = RaftLog(os.path.join(self.tmp, "wal"), fsync=False, segment_bytes=200, cache=0)
+        server_grpc.logs.extend([self.entry(1, f"user{i}") for i in range(15)])
+        server_grpc.logs.compact(9)
+        base = server_grpc.logs.base_index
+        self.assertGreater(base, 1)
+
+        raft = server_grpc.RaftService()
+        response = raft.AppendEntries(handler_pb2.AppendEntriesRequest(term=2, prev_log_idx=15, prev_log_term=2), None)
+        self.assertFalse(response.success)
+        self.assertEqual((response.conflict_term, response.conflict_idx), (1, base + 1))
+
+    def test_leader_tracks_followers_and_commits_on_majority(self):
+        """Test nextIndex backoff by term and that only a majority-stored entry of the current term commits"""
+        server_grpc.logs.extend([self.entry(1, "a"), self.entry(1, "b"), self.entry(2, "c")])
+        server_grpc.term = 2
+        server_grpc.become_leader()
+        server_grpc.logs.sync()
+        peer = server_grpc.peers[0]
+        self.assertEqual(server_grpc.next_idx[peer], 4)
+        # A new leader starts its term with a no-op entry
+        self.assertIsNone(server_grpc.logs[3].WhichOneof("request"))
+
+        request = server_grpc.append_entries_request(peer)
+        self.assertEqual((request.prev_log_idx, request.prev_log_term, len(request.entries)), (3, 2, 1))
+        # The follower has term 3 entries from index 2 on, which the leader does not have: back off past them
+        server_grpc.handle_append_response(peer, request, handler_pb2.AppendEntriesResponse(term=2, success=False, conflict_term=3, conflict_idx=2))
+        self.assertEqual(server_grpc.next_idx[peer], 2)
+        request = server_grpc.append_entries_request(peer)
+        self.assertEqual([e.create_acc.username for e in request.entries], ["b", "c", ""])
+        self.assertTrue(server_grpc.handle_append_response(peer, request, handler_pb2.AppendEntriesResponse(term=2, success=True, match_idx=4)))
+        self.assertEqual((server_grpc.match_idx[peer], server_grpc.next_idx[peer]), (4, 5))
+
+        # Leader and one follower are not a majority of 5
+        server_grpc.advance_commit()
+        self.assertEqual(server_grpc.commit_idx, 0)
+        server_grpc.match_idx[server_grpc.peers[1]] = 4
+        server_grpc.advance_commit()
+        self.assertEqual(server_grpc.commit_idx, 4)
+
+        # A newer term makes the leader step down
+        self.assertFalse(server_grpc.handle_append_response(peer, request, handler_pb2.AppendEntriesResponse(term=5)))
+        self.assertEqual((server_grpc.role, server_grpc.term), (server_grpc.Role.FOLLOWER, 5))
+
+    def test_leader_drops_responses_from_earlier_terms(self):
+        """Test that a delayed success for a request sent in an earlier term does not advance matchIndex or commit"""
+        server_grpc.logs.extend([self.entry(1, "a"), self.entry(1, "b")])
+        server_grpc.term = 2
+        server_grpc.become_leader()
+        server_grpc.logs.sync()
+        peer = server_grpc.peers[0]
+        stale = handler_pb2.AppendEntriesRequest(term=1, prev_log_idx=0, prev_log_term=0)
+        self.assertFalse(server_grpc.handle_append_response(peer, stale, handler_pb2.AppendEntriesResponse(term=1, success=True, match_idx=3)))
+        self.assertEqual((server_grpc.match_idx[peer], server_grpc.next_idx[peer], server_grpc.commit_idx), (0, 3, 0))
+        self.assertEqual(server_grpc.role, server_grpc.Role.LEADER)
+
+    def test_follower_applies_committed_range_in_one_transaction(self):
+        """Test that committed entries are applied in transactions of at most APPLY_BATCH entries that also record last_applied"""
+        server_grpc.logs.extend([self.entry(1, f"user{i}") for i in range(10)])
+        server_grpc.commit_idx = 7
+        with patch.object(server_grpc, "APPLY_BATCH", 4), patch.object(server_grpc.applier, "transaction", wraps=server_grpc.applier.transaction) as transaction:
+            server_grpc.apply_committed()
+        self.assertEqual(transaction.call_count, 2)
+        self.assertEqual(server_grpc.last_applied, 7)
+        db = DatabaseHandler(TEST_DB_PATH)
+        self.assertEqual(db.last_applied(), 7)
+        self.assertTrue(db.account_exists("user6"))
+        self.assertFalse(db.account_exists("user7"))
+
+        # A failing entry rolls back its whole batch, last_applied included
+        server_grpc.commit_idx = 10
+        with patch.object(server_grpc, "apply_action", side_effect=[None, None, ValueError("bad entry")]):
+            with self.assertRaises(ValueError):
+                server_grpc.apply_committed()
+        self.assertEqual((server_grpc.last_applied, db.last_applied()), (7, 7))
+        self.assertFalse(db.account_exists("user7"))
+
+    def test_proposal_overwritten_by_new_leader_fails(self):
+        """Test that a write whose entry a new leader replaced fails instead of returning another entry's result"""
+        server_grpc.become_leader()
+        proposal = server_grpc.propose(server_grpc.OpCode.CREATE_ACCOUNT, ["lost", "pw", ""], create_acc=self.entry(1, "lost").create_acc)
+        self.assertEqual(proposal.index, 2)
+
+        raft = server_grpc.RaftService()
+        response = raft.AppendEntries(handler_pb2.AppendEntriesRequest(
+            term=2, prev_log_idx=1, prev_log_term=1, entries=[self.entry(2, "winner")], commit=2), None)
+        self.assertTrue(response.success)
+        self.assertFalse(proposal.wait(timeout=1))
+        self.assertIsNone(proposal.result)
+        db = DatabaseHandler(TEST_DB_PATH)
+        self.assertTrue(db.account_exists("winner"))
+        self.assertFalse(db.account_exists("lost"))
+
+    def test_follower_installs_snapshot(self):
+        """Test that a follower loads a streamed snapshot, replaces its conflicting log and replicates after it"""
+        DatabaseHandler(TEST_DB_PATH).create_account("snap", "pw", "")
+        leader_snapshot = os.path.join(self.tmp, "leader.db")
+        snapshot.create(TEST_DB_PATH, leader_snapshot, 5, 2)
+        os.remove(TEST_DB_PATH)
+        database_setup(TEST_DB_PATH)
+        server_grpc.logs.append(self.entry(1, "stale"))
+
+        with open(leader_snapshot, "rb") as f:
+            chunks = [handler_pb2.InstallSnapshotRequest(term=2, leader_addr="leader", last_idx=5, last_term=2, offset=offset, data=data, done=done)
+                      for offset, data, done in snapshot.chunks(f, 1024)]
+        self.assertGreater(len(chunks), 1)
+        raft = server_grpc.RaftService()
+        self.assertTrue(raft.InstallSnapshot(iter(chunks), None).success)
+        self.assertTrue(DatabaseHandler(TEST_DB_PATH).account_exists("snap"))
+        self.assertEqual(DatabaseHandler(TEST_DB_PATH).last_applied(), 5)
+        self.assertEqual((len(server_grpc.logs), server_grpc.logs.base_index, server_grpc.commit_idx, server_grpc.last_applied), (5, 5, 5, 5))
+        self.assertEqual(snapshot.read_meta(server_grpc.SNAPSHOT_PATH), (5, 2))
+
+        response = raft.AppendEntries(handler_pb2.AppendEntriesRequest(
+            term=2, prev_log_idx=5, prev_log_term=2, entries=[self.entry(2, "after")], commit=6), None)
+        self.assertTrue(response.success)
+        self.assertTrue(DatabaseHandler(TEST_DB_PATH).account_exists("after"))
+
+    def test_leader_snapshots_and_compacts(self):
+        """Test that a snapshot covers the committed state and a follower behind the compacted log is sent it instead"""
+        # Default segment size: everything is still in the active segment
+        server_grpc.logs = RaftLog(os.path.join(self.tmp, "default"), fsync=False)
+        server_grpc.logs.extend([self.entry(1, f"user{i}") for i in range(10)])
+        server_grpc.logs.sync()
+        server_grpc.become_leader()
+        server_grpc.last_applied = 10
+        # Uncommitted state is never snapshotted
+        self.assertFalse(server_grpc.take_snapshot())
+        server_grpc.commit_idx = 10
+        # Compaction moves base_index, so it must not run in the middle of a replication round
+        compact = server_grpc.logs.compact
+        def locked_compact(index):
+            self.assertTrue(server_grpc.raft_lock._is_owned())
+            compact(index)
+        with patch.object(server_grpc.logs, "compact", locked_compact):
+            self.assertTrue(server_grpc.take_snapshot())
+        self.assertEqual(snapshot.read_meta(server_grpc.SNAPSHOT_PATH), (10, 1))
+        self.assertEqual(server_grpc.logs.base_index, 10)
+
+        peer = server_grpc.peers[0]
+        server_grpc.next_idx[peer] = 1
+        self.assertIsNone(server_grpc.append_entries_request(peer))
+        server_grpc.next_idx[peer] = server_grpc.logs.base_index + 1
+        self.assertIsNotNone(server_grpc.append_entries_request(peer))
+
+class TestFanOut(unittest.TestCase):
+    def send_after(self, delays):
+        """Fake raft_call: peer i answers with success after delays[i] seconds"""
+        def send(peer, method, request):
+            future = futures.Future()
+            delay = delays[server_grpc.peers.index(peer)]
+            threading.Timer(delay, future.set_result, [handler_pb2.VoteResponse(success=True)]).start()
+            return future
+        return send
+
+    def test_majority_does_not_wait_for_stragglers(self):
+        """Test that a round is decided by the first majority and a peer still in flight is skipped by the next round"""
+        answered = []
+        on_response = lambda peer, request, response: answered.append(peer) or response.success
+        start = time.monotonic()
+        fan_out = server_grpc.FanOut("Vote", lambda peer: handler_pb2.VoteRequest(), on_response, send=self.send_after([0, 0.01, 1, 1]))
+        self.assertTrue(fan_out.wait(timeout=2))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(len(answered), 2)
+
+        sent = []
+        server_grpc.FanOut("Vote", lambda peer: sent.append(peer), on_response, send=self.send_after([0, 0, 0, 0])).wait(timeout=2)
+        self.assertEqual(sent, server_grpc.peers[:2])
+
+    def test_failed_peers_end_the_round(self):
+        """Test that a round without a majority ends once every RPC has failed"""
+        def send(peer, method, request):
+            raise ConnectionError("unreachable")
+        fan_out = server_grpc.FanOut("AppendEntries", lambda peer: None, lambda *args: True, send=send)
+        self.assertFalse(fan_out.wait(timeout=2))
+        self.assertEqual(fan_out.acks, 1)
+
+    def test_failed_request_frees_the_peer(self):
+        """Test that a peer whose request could not be built is not left marked in flight for later rounds"""
+        def make_request(peer):
+            raise IndexError("compacted")
+        fan_out = server_grpc.FanOut("AppendEntries", make_request, lambda *args: True)
+        self.assertFalse(fan_out.wait(timeout=2))
+        sent = []
+        server_grpc.FanOut("AppendEntries", lambda peer: sent.append(peer), lambda *args: True)
+        self.assertEqual(sent, server_grpc.peers)
+
 def test_receive_message_stream(self):
     """Test receiving messages via stream without hanging."""
     self.service.CreateAccount(handler_pb2.CreateAccountRequest(username="receiver", password="pass", bio="test"), None)
@@ -0,0 +1,68 @@
+import unittest
+import sys
+import os
+import time
+from concurrent import futures
+import grpc
+from google.protobuf import empty_pb2
+# Adjust path to ensure tests can import the peer channel manager
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import handler_pb2
+import handler_pb2_grpc
+from peer_channels import PeerChannels, SERVER_OPTIONS
+
+class Raft(handler_pb2_grpc.RaftServicer):
+    def GetLeader(self, request, context):
+        return handler_pb2.GetLeaderResponse(leader_addr="leader")
+
+class TestPeerChannels(unittest.TestCase):
+
+    def setUp(self):
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=2), options=SERVER_OPTIONS)
+        handler_pb2_grpc.add_RaftServicer_to_server(Raft(), self.server)
+        self.peer = f"127.0.0.1:{self.server.add_insecure_port('127.0.0.1:0')}"
+        self.server.start()
+        self.channels = PeerChannels()
+
+    def tearDown(self):
+        self.channels.close()
+        self.server.stop(0)
+
+    def call(self):
+        """GetLeader through the manager, recording its outcome; returns the response or None on failure"""
+        future = self.channels.stub(self.peer).GetLeader.future(empty_pb2.Empty(), timeout=1)
+        try:
+            return future.result()
+        except grpc.RpcError:
+            return None
+        finally:
+            self.channels.record(self.peer, future)
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_channel_is_reused(self):
+        """Test that every RPC to a peer goes over the one channel opened for it"""
+        self.assertIs(self.channels.stub(self.peer), self.channels.stub(self.peer))
+        for _ in range(3):
+            self.assertEqual(self.call().leader_addr, "leader")
+        self.wait_for(lambda: self.channels.health()[self.peer]["state"] == "READY")
+        health = self.channels.health()[self.peer]
+        self.assertEqual((health["opened"], health["connects"], health["rpc_ok"]), (1, 1, 3))
+
+    def test_lost_peer_is_counted(self):
+        """Test that a peer going away shows up as a disconnect and failed RPCs"""
+        self.call()
+        self.wait_for(lambda: self.channels.health()[self.peer]["state"] == "READY")
+        self.server.stop(0).wait()
+        self.wait_for(lambda: self.channels.health()[self.peer].get("disconnects"))
+        self.assertIsNone(self.call())
+        health = self.channels.health()[self.peer]
+        self.assertEqual(health["rpc_failed"], 1)
+        self.assertEqual(health["rpc_unavailable"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
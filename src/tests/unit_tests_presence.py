@@ -0,0 +1,97 @@
+import unittest
+import sys
+import os
+import struct
+import socket
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+# Adjust path to ensure tests can import presence
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from presence import PresenceRegistry, RemoteClient, IPC_OFFLINE, IPC_MAX_DATAGRAM
+from database import DatabaseHandler
+from utils import OpCode, ResponseCode, database_setup
+import server_handler
+
+class TestPresenceRegistry(unittest.TestCase):
+
+    def setUp(self):
+        """Set up two workers' registries in one process"""
+        port = 40000 + os.getpid() % 20000
+        self.workers = [PresenceRegistry(port, worker_id, 2) for worker_id in range(2)]
+
+    def tearDown(self):
+        for registry in self.workers:
+            registry.close()
+
+    def sync(self):
+        """Deliver pending datagrams, as the selector loop would"""
+        for registry in self.workers:
+            registry.process_events(None)
+
+    def test_login_is_visible_to_other_workers(self):
+        """Test that a login on one worker maps to a RemoteClient on the other"""
+        client = MagicMock()
+        self.workers[0]["amy"] = client
+        self.sync()
+        self.assertIs(self.workers[0]["amy"], client)
+        remote = self.workers[1].get("amy")
+        self.assertIsInstance(remote, RemoteClient)
+        self.assertEqual(remote.worker_id, 0)
+        # Only local users are iterated
+        self.assertEqual(list(self.workers[1]), [])
+
+    def test_forwarded_push_is_queued_locally(self):
+        """Test that a push to a remote user is queued on the owning worker's connection"""
+        client = MagicMock()
+        self.workers[0]["amy"] = client
+        self.sync()
+        self.workers[1]["amy"]._queue_send(b"frame")
+        self.sync()
+        client._queue_send.assert_called_once_with(b"frame")
+        self.assertEqual(self.workers[0].metrics["remote_pushes"], 1)
+
+    def test_logout(self):
+        """Test that a logout removes the user everywhere, ignoring stale logouts"""
+        self.workers[0]["amy"] = MagicMock()
+        self.sync()
+        del self.workers[0]["amy"]
+        self.sync()
+        self.assertNotIn("amy", self.workers[1])
+
+        # A late logout from worker 0 must not hide amy's newer login on worker 1
+        self.workers[1]["amy"] = MagicMock()
+        self.sync()
+        self.workers[1].send(0, IPC_OFFLINE, "amy", struct.pack(">H", 0))
+        self.sync()
+        self.assertIsInstance(self.workers[0]["amy"], RemoteClient)
+
+    def test_oversize_push_is_refused(self):
+        """Test that a frame too large for one datagram is refused instead of sent"""
+        self.workers[0]["amy"] = MagicMock()
+        self.sync()
+        with self.assertRaises(ValueError):
+            self.workers[1]["amy"]._queue_send(b"x" * IPC_MAX_DATAGRAM)
+
+    def test_failed_forward_stores_message_once(self):
+        """Test that a push that cannot be forwarded leaves one undelivered copy of the message, not two"""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        db_path = os.path.join(tmp, "test.db")
+        database_setup(db_path)
+        db = DatabaseHandler(db_path)
+        db.create_account("bob", "pw", "")
+        db.create_account("amy", "pw", "")
+        self.workers[0]["amy"] = MagicMock()
+        self.sync()
+
+        sender = server_handler.Message(MagicMock(), MagicMock(spec=socket.socket), ("127.0.0.1", 65432), db_path=db_path, active_clients=self.workers[1])
+        sender._header = {"content_encoding": "utf-8", "content_length": 0, "opcode": OpCode.SEND_MSG.value}
+        with patch.object(self.workers[1], "send", side_effect=BlockingIOError):
+            result = sender.send_message("bob", "amy", "hello")
+        self.assertEqual(result["status_code"], ResponseCode.SUCCESS.value)
+        self.assertEqual((db.count_messages("amy", False), db.count_messages("amy", True)), (1, 0))
+        self.assertEqual(sender.metrics["failed_pushes"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+# Adjust path to ensure tests can import the Raft log
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import handler_pb2
+from raft_log import RaftLog, SEGMENT_SUFFIX
+
+def entry(term, username):
+    return handler_pb2.Entry(term=term, create_acc=handler_pb2.CreateAccountRequest(username=username, password="pw", bio=""))
+
+class TestRaftLog(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def names(self, log):
+        return [e.create_acc.username for e in log]
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.dir) if name.endswith(SEGMENT_SUFFIX))
+
+    def test_segments_and_recovery(self):
+        """Test that entries rotate across segments and are recovered in order, with their terms, after a restart"""
+        log = RaftLog(self.dir, segment_bytes=200, cache=2)
+        for i in range(20):
+            log.append(entry(1 + i // 10, f"user{i}"))
+        log.sync()
+        log.close()
+        self.assertGreater(len(self.segments()), 1)
+
+        log = RaftLog(self.dir, segment_bytes=200, cache=2)
+        self.assertEqual((len(log), log.durable), (20, 20))
+        self.assertEqual(self.names(log), [f"user{i}" for i in range(20)])
+        self.assertEqual((log.term(0), log.term(10), log.term(11)), (0, 1, 2))
+        self.assertEqual(self.names(log[5:8]), ["user5", "user6", "user7"])
+        log.close()
+
+    def test_torn_tail_is_dropped(self):
+        """Test that a record cut short by a crash is dropped on recovery and the log continues after it"""
+        log = RaftLog(self.dir)
+        log.extend([entry(1, "a"), entry(1, "b")])
+        log.close()
+        path = os.path.join(self.dir, self.segments()[-1])
+        os.truncate(path, os.path.getsize(path) - 3)
+
+        log = RaftLog(self.dir)
+        self.assertEqual(self.names(log), ["a"])
+        log.append(entry(2, "c"))
+        log.close()
+        self.assertEqual(self.names(RaftLog(self.dir)), ["a", "c"])
+
+    def test_truncate_suffix(self):
+        """Test that del logs[i:] removes the conflicting suffix across segments, on disk as well"""
+        log = RaftLog(self.dir, segment_bytes=200, cache=3)
+        log.extend([entry(1, f"user{i}") for i in range(12)])
+        del log[4:]
+        self.assertEqual(len(log), 4)
+        log.append(entry(2, "new"))
+        self.assertEqual(self.names(log), ["user0", "user1", "user2", "user3", "new"])
+        with self.assertRaises(ValueError):
+            del log[1:2]
+        log.close()
+        self.assertEqual(self.names(RaftLog(self.dir)), ["user0", "user1", "user2", "user3", "new"])
+
+    def test_sync_batches_fsync(self):
+        """Test that one fsync covers every entry appended since the last and a repeated sync is free"""
+        log = RaftLog(self.dir)
+        with patch("raft_log.os.fsync") as fsync:
+            for i in range(50):
+                log.append(entry(1, f"user{i}"))
+            self.assertEqual(log.durable, 0)
+            log.sync()
+            log.sync()
+            self.assertEqual(fsync.call_count, 1)
+            self.assertEqual(log.durable, 50)
+        log.close()
+
+    def test_compact_and_reset(self):
+        """Test that compaction drops whole segments, keeps the base term and survives a restart, and reset starts over"""
+        log = RaftLog(self.dir, segment_bytes=200, cache=0)
+        log.extend([entry(1 + i // 5, f"user{i}") for i in range(15)])
+        log.compact(9)
+        self.assertGreater(log.base_index, 0)
+        self.assertLessEqual(log.base_index, 9)
+        self.assertEqual(log.term(log.base_index), 1 + (log.base_index - 1) // 5)
+        with self.assertRaises(IndexError):
+            log[log.base_index - 1]
+        self.assertEqual(log[14].create_acc.username, "user14")
+        base = log.base_index
+        log.close()
+
+        log = RaftLog(self.dir, segment_bytes=200, cache=0)
+        self.assertEqual((len(log), log.base_index), (15, base))
+        log.reset(20, 4)
+        self.assertEqual((len(log), log.base_index, log.term(20)), (20, 20, 4))
+        log.append(entry(5, "after"))
+        log.close()
+        log = RaftLog(self.dir)
+        self.assertEqual((len(log), log.term(20), log[20].create_acc.username), (21, 4, "after"))
+        log.close()
+
+    def test_compact_within_segment(self):
+        """Test that with the default segment size a snapshot still moves base_index to its index and frees the entries
+        before it, and the entries after it survive a restart"""
+        log = RaftLog(self.dir)
+        log.extend([entry(1 + i // 10, f"user{i}") for i in range(25)])
+        log.sync()
+        log.compact(18)
+        self.assertEqual((log.base_index, log.term(18), len(log)), (18, 2, 25))
+        self.assertEqual(self.segments(), [f"{19:020d}{SEGMENT_SUFFIX}"])
+        with self.assertRaises(IndexError):
+            log.term(17)
+        log.append(entry(3, "after"))
+        log.compact(26)
+        self.assertEqual((log.base_index, len(log)), (26, 26))
+        log.append(entry(3, "last"))
+        log.close()
+
+        log = RaftLog(self.dir)
+        self.assertEqual((log.base_index, len(log), log[26].create_acc.username), (26, 27, "last"))
+        log.close()
+
+    def test_interrupted_compaction_keeps_entries(self):
+        """Test that a crash after a segment's records were copied but before the base moved leaves the log as it was"""
+        log = RaftLog(self.dir)
+        log.extend([entry(1, f"user{i}") for i in range(10)])
+        log.sync()
+        with patch.object(log, "_write_base", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                log.compact(6)
+        log.close()
+        self.assertEqual(len(self.segments()), 2)
+
+        log = RaftLog(self.dir)
+        self.assertEqual((log.base_index, len(log)), (0, 10))
+        self.assertEqual(self.names(log), [f"user{i}" for i in range(10)])
+        self.assertEqual(len(self.segments()), 1)
+        log.close()
+
+if __name__ == '__main__':
+    unittest.main()
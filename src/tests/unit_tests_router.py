@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import socket
+from unittest.mock import MagicMock
+# Adjust path to ensure tests can import the router
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import ResponseCode, OpCode
+from router import ROUTER, RequestRouter, LatencyStats
+import server_handler
+
+class TestRequestRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.ctx = MagicMock()
+        self.ctx.db.account_exists.return_value = True
+        self.ctx.db.list_accounts.return_value = {"status_code": ResponseCode.SUCCESS.value, "data": []}
+
+    def test_every_request_opcode_is_routed(self):
+        """Test that every client request opcode has a handler"""
+        unrouted = {OpCode.RECEIVE_MSG, OpCode.MATCH, OpCode.CONNECT, OpCode.PING}
+        for opcode in OpCode:
+            if opcode not in unrouted:
+                self.assertIn(opcode.value, ROUTER._routes, opcode.name)
+
+    def test_schema_rejects_bad_arguments(self):
+        """Test that wrong argument counts and types are answered with BAD_REQUEST without touching the database"""
+        bad = {"status_code": ResponseCode.BAD_REQUEST.value}
+        for opcode, args in ((OpCode.ACCOUNT_EXISTS, []), (OpCode.ACCOUNT_EXISTS, ["amy", "bob"]),
+                             (OpCode.READ_MSG_DELIVERED, ["amy", "5"]), (OpCode.READ_MSG_DELIVERED, ["amy", True]),
+                             (OpCode.DELETE_MSG, ["amy", 3]), (OpCode.MATCH, ["amy"]), (99, [])):
+            with self.subTest(opcode=opcode, args=args):
+                self.assertEqual(ROUTER.dispatch(getattr(opcode, "value", opcode), self.ctx, args), bad)
+        self.ctx.db.fetch_messages_delivered.assert_not_called()
+        self.ctx.db.delete_messages.assert_not_called()
+
+    def test_variadic_and_context_handlers(self):
+        """Test variadic arguments and that login and send go through the front end's context"""
+        ROUTER.dispatch(OpCode.LIST_ACCOUNTS.value, self.ctx, ["a", "m"])
+        self.ctx.db.list_accounts.assert_called_once_with("am")
+        self.assertEqual(ROUTER.dispatch(OpCode.ACCOUNT_EXISTS.value, self.ctx, ["amy"]),
+                         {"status_code": ResponseCode.ACCOUNT_EXISTS.value})
+
+        self.ctx.db.login_account.return_value = {"status_code": ResponseCode.SUCCESS.value, "data": [0]}
+        ROUTER.dispatch(OpCode.LOGIN_ACCOUNT.value, self.ctx, ["amy", "pw"])
+        self.ctx.on_login.assert_called_once_with("amy")
+        ROUTER.dispatch(OpCode.SEND_MSG.value, self.ctx, ["amy", "bob", "hi"])
+        self.ctx.send_message.assert_called_once_with("amy", "bob", "hi")
+
+    def test_timing_hooks(self):
+        """Test that hooks see every dispatch with its operation name and status code"""
+        router = RequestRouter()
+        router.route(OpCode.STARTING)(lambda ctx: {"status_code": ResponseCode.SUCCESS.value})
+        with self.assertRaises(ValueError):
+            router.route(OpCode.STARTING)(lambda ctx: None)
+        calls = []
+        stats = LatencyStats()
+        router.add_hook(lambda *call: calls.append(call))
+        router.add_hook(stats)
+        router.dispatch(OpCode.STARTING.value, self.ctx, [])
+        router.dispatch(OpCode.STARTING.value, self.ctx, [])
+        self.assertEqual([(name, code) for name, _, code in calls], [("STARTING", ResponseCode.SUCCESS.value)] * 2)
+        self.assertEqual(stats.summary()["STARTING"][0], 2)
+
+    def test_write_classification(self):
+        """Test that exactly the operations that change the database are classified as writes"""
+        writes = {OpCode.CREATE_ACCOUNT, OpCode.DELETE_ACCOUNT, OpCode.DELETE_MSG, OpCode.SEND_MSG, OpCode.READ_MSG_UNDELIVERED}
+        for opcode in OpCode:
+            with self.subTest(opcode=opcode.name):
+                self.assertEqual(ROUTER.is_write(opcode), opcode in writes)
+
+    def test_socket_handler_uses_router(self):
+        """Test that the socket server stub answers through the router"""
+        message = server_handler.Message(MagicMock(), MagicMock(spec=socket.socket), ("127.0.0.1", 65432), db_path=None, active_clients={})
+        message.db = self.ctx.db
+        self.assertEqual(message._generate_action(OpCode.ACCOUNT_EXISTS.value, ["amy"]),
+                         {"status_code": ResponseCode.ACCOUNT_EXISTS.value})
+        self.assertEqual(message._generate_action(OpCode.MATCH.value, ["amy"]),
+                         {"status_code": ResponseCode.BAD_REQUEST.value})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import sys
+import os
+import socket
+from unittest.mock import MagicMock, patch
+# Adjust path to ensure tests can import the timer wheel
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from timer_wheel import TimerWheel
+from utils import OpCode
+import client_handler
+import server_handler
+
+class TestTimerWheel(unittest.TestCase):
+
+    def test_expiry_order_and_resolution(self):
+        """Test that timers expire on their tick, in deadline order"""
+        wheel = TimerWheel(tick=1.0, span=10)
+        wheel.schedule("b", 2)
+        t0 = wheel._time
+        wheel.schedule("a", 1)
+        wheel.schedule("c", 2.5)
+        self.assertEqual(len(wheel), 3)
+        self.assertEqual(wheel.advance(t0 + 0.5), [])
+        self.assertEqual(wheel.advance(t0 + 1), ["a"])
+        self.assertEqual(wheel.advance(t0 + 3), ["b", "c"])
+        self.assertEqual(len(wheel), 0)
+        self.assertIsNone(wheel.timeout())
+
+    def test_delays_longer_than_the_wheel(self):
+        """Test that a timer past one revolution waits for the right lap"""
+        wheel = TimerWheel(tick=1.0, span=3)
+        wheel.schedule("late", 10)
+        t0 = wheel._time
+        self.assertEqual(wheel.advance(t0 + 9), [])
+        self.assertEqual(wheel.advance(t0 + 10), ["late"])
+
+class TestIdleConnections(unittest.TestCase):
+
+    def setUp(self):
+        self.selector = MagicMock()
+        self.sock = MagicMock(spec=socket.socket)
+        self.active_clients = {}
+        self.message = server_handler.Message(self.selector, self.sock, ("127.0.0.1", 65432), db_path=None, active_clients=self.active_clients)
+        self.message.username = "amy"
+        self.active_clients["amy"] = self.message
+        self.start = self.message.last_activity
+
+    @patch.object(server_handler, "IDLE_TIMEOUT", 90)
+    @patch.object(server_handler, "PING_INTERVAL", 30)
+    def test_ping_then_close(self):
+        """Test that a silent client is pinged once, then closed and removed from active clients"""
+        self.assertEqual(self.message.check_idle(self.start + 10), 20)
+        self.assertEqual(self.message.check_idle(self.start + 30), 60)
+        self.assertEqual(len(self.message._send_queue), 1)
+        # No second ping for the same silence
+        self.message.check_idle(self.start + 60)
+        self.assertEqual(len(self.message._send_queue), 1)
+
+        incoming_queue = MagicMock()
+        client = client_handler.Message(MagicMock(), MagicMock(), None, None, incoming_queue)
+        client._recv_buffer += self.message._send_queue[0]
+        client._drain_frames()
+        # The client answers the ping itself instead of passing it to the GUI
+        incoming_queue.put.assert_not_called()
+        self.assertTrue(client._send_buffer)
+
+        self.assertIsNone(self.message.check_idle(self.start + 90))
+        self.assertIsNone(self.message.sock)
+        self.assertEqual(self.active_clients, {})
+        self.assertEqual(self.message.metrics["idle_closed"], 1)
+
+    @patch.object(server_handler, "IDLE_TIMEOUT", 90)
+    @patch.object(server_handler, "PING_INTERVAL", 30)
+    def test_activity_resets_deadline(self):
+        """Test that data from the client pushes the deadline back and a pong gets no response"""
+        self.message.check_idle(self.start + 30)
+        self.message.last_activity = self.start + 40
+        self.assertEqual(self.message.check_idle(self.start + 50), 20)
+        self.message._header = {"content_encoding": "utf-8", "content_length": 0, "opcode": OpCode.PING.value}
+        self.message._process_frame(b"")
+        self.assertEqual(len(self.message._send_queue), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import sys
+import os
+import queue
+import selectors
+import shutil
+import socket
+import tempfile
+import threading
+from collections import Counter
+# Adjust path to ensure tests can import the TLS helpers
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import OpCode
+import tls
+import client_handler
+import server_handler
+
+@unittest.skipUnless(shutil.which("openssl"), "Needs the openssl CLI for a self-signed certificate")
+class TestTLS(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.cert, cls.key = tls.generate_self_signed(os.path.join(cls.tmp, "server.crt"), os.path.join(cls.tmp, "server.key"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp)
+
+    def setUp(self):
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.sel = selectors.DefaultSelector()
+        self.metrics = Counter()
+
+    def tearDown(self):
+        self.listener.close()
+        self.sel.close()
+
+    def serve_one(self, done):
+        """Accept one connection the way server.py does and run its events until done is set"""
+        conn, addr = self.listener.accept()
+        conn.setblocking(False)
+        conn = tls.server_context(self.cert, self.key).wrap_socket(conn, server_side=True, do_handshake_on_connect=False)
+        handler = server_handler.Message(self.sel, conn, addr, db_path=None, active_clients={}, metrics=self.metrics)
+        self.sel.register(conn, selectors.EVENT_READ, data=handler)
+        while not done.is_set() and handler.sock is not None:
+            for key, mask in self.sel.select(timeout=0.05):
+                try:
+                    key.data.process_events(mask)
+                except RuntimeError:
+                    # Client closed the connection
+                    handler.close()
+        if handler.sock is not None:
+            handler.close()
+
+    def request(self, sessions):
+        """Connect, send a STARTING request and return (response, resumed)"""
+        done = threading.Event()
+        server = threading.Thread(target=self.serve_one, args=(done,))
+        server.start()
+        try:
+            incoming = queue.Queue()
+            sock = sessions.connect("127.0.0.1", self.port, tls.client_context(self.cert), timeout=5)
+            with sock:
+                stub = client_handler.Message(None, sock, None, None, incoming)
+                sock.sendall(stub._package_request({"content_encoding": "utf-8", "content": {"args": []}, "opcode": OpCode.STARTING.value}))
+                while incoming.empty():
+                    stub._recv_buffer += sock.recv(4096)
+                    stub._drain_frames()
+                sessions.save("127.0.0.1", self.port, sock)
+                return incoming.get(), sock.session_reused
+        finally:
+            done.set()
+            server.join()
+
+    def test_contexts_are_shared(self):
+        """Test that connections share one context per certificate, which holds the session state"""
+        self.assertIs(tls.server_context(self.cert, self.key), tls.server_context(self.cert, self.key))
+        self.assertIs(tls.client_context(self.cert), tls.client_context(self.cert))
+
+    def test_handshake_and_resumption(self):
+        """Test that the non-blocking server handshake works and a reconnect resumes the saved session"""
+        sessions = tls.SessionCache()
+        response, resumed = self.request(sessions)
+        self.assertEqual(response["opcode"], OpCode.STARTING.value)
+        self.assertFalse(resumed)
+        self.assertEqual(len(sessions), 1)
+
+        response, resumed = self.request(sessions)
+        self.assertEqual(response["opcode"], OpCode.STARTING.value)
+        self.assertTrue(resumed)
+        self.assertEqual(self.metrics["tls_full_handshakes"], 1)
+        self.assertEqual(self.metrics["tls_resumed"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
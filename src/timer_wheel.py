@@ -0,0 +1,74 @@
+import math
+import time
+
+class TimerWheel:
+    """ Hashed timing wheel for per-connection timers in the server event loop.
+
+    Time is split into ticks and the wheel has one slot per tick. A timer is appended to the slot its deadline falls
+    in, so scheduling is O(1). Advancing the wheel visits only the slots of the ticks that passed, so when the wheel
+    spans the longest delay in use (no timer needs more than one revolution) each tick costs O(expired).
+
+    Timers cannot be cancelled. Owners check on expiry whether the timer still matters (e.g. the connection is
+    already closed) and ignore it if not.
+
+    Methods:
+    - schedule(self, item, delay): Expire item about delay seconds from now (to within one tick).
+    - advance(self, now=None): Move the wheel to now and return the expired items.
+    - timeout(self, now=None): Seconds until the next tick, or None if no timers are pending.
+    """
+    def __init__(self, tick=1.0, span=None):
+        """
+        :param tick: Timer resolution in seconds.
+        :param span: Longest delay (seconds) to cover in one revolution. Defaults to 512 ticks.
+        """
+        self.tick = tick
+        n_slots = math.ceil(span / tick) + 1 if span else 512
+        self._slots = [[] for _ in range(n_slots)]
+        self._cursor = 0 # Slot of the current tick
+        self._time = time.monotonic() # Start of the current tick
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def schedule(self, item, delay):
+        """Expire item about delay seconds from now. Deadlines are rounded to tick boundaries."""
+        if not self._count:
+            # Nothing pending: restart the current tick instead of replaying the idle ones
+            self._time = time.monotonic()
+        ticks = max(1, math.ceil(delay / self.tick))
+        n_slots = len(self._slots)
+        # [remaining revolutions, item]
+        self._slots[(self._cursor + ticks) % n_slots].append([(ticks - 1) // n_slots, item])
+        self._count += 1
+
+    def advance(self, now=None):
+        """Move the wheel forward to now and return the items whose timers expired, in deadline order."""
+        if now is None:
+            now = time.monotonic()
+        expired = []
+        n_slots = len(self._slots)
+        while self._time + self.tick <= now:
+            self._time += self.tick
+            self._cursor = (self._cursor + 1) % n_slots
+            slot = self._slots[self._cursor]
+            if not slot:
+                continue
+            pending = []
+            for entry in slot:
+                if entry[0] == 0:
+                    expired.append(entry[1])
+                else:
+                    entry[0] -= 1
+                    pending.append(entry)
+            self._slots[self._cursor] = pending
+        self._count -= len(expired)
+        return expired
+
+    def timeout(self, now=None):
+        """Seconds until the next tick, or None if no timers are pending (block indefinitely)."""
+        if not self._count:
+            return None
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self._time + self.tick - now)
@@ -0,0 +1,144 @@
+import os
+import ssl
+import socket
+import subprocess
+import threading
+import yaml
+import logging
+import grpc
+from grpc.experimental.session_cache import ssl_session_cache_lru
+
+# Load configuration
+yaml_path = "config.yaml"
+with open(yaml_path, "r") as y:
+    config = yaml.safe_load(y)
+
+# Defaults
+TLS_ENABLED = config.get("tls", False)
+TLS_CERT = config.get("tls_cert", "../certs/server.crt")
+TLS_KEY = config.get("tls_key", "../certs/server.key")
+TLS_CA = config.get("tls_ca", TLS_CERT) # A self-signed certificate is its own CA
+TLS_TICKETS = config.get("tls_session_tickets", 2) # TLS 1.3 tickets sent per full handshake
+TLS_SESSION_CACHE = config.get("tls_session_cache", 1024) # Client sessions kept for resumption
+
+# One context per certificate, shared by every connection
+_server_contexts = {}
+_client_contexts = {}
+_lock = threading.Lock()
+
+def generate_self_signed(cert_path=TLS_CERT, key_path=TLS_KEY, hostname="localhost", days=365):
+    """Write a self-signed certificate and key for local testing, valid for hostname and 127.0.0.1. Needs the openssl CLI."""
+    for path in (cert_path, key_path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    cmd = ["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes",
+           "-keyout", key_path, "-out", cert_path, "-days", str(days), "-subj", f"/CN={hostname}",
+           "-addext", f"subjectAltName=DNS:{hostname},IP:127.0.0.1"]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.error(f"Failed to generate a self-signed certificate: {e}")
+        raise
+    return cert_path, key_path
+
+def server_context(certfile=TLS_CERT, keyfile=TLS_KEY):
+    """Return the shared server SSLContext for a certificate.
+
+    Session state lives in the context: the session-ID cache and the ticket keys clients resume with. Every connection
+    must use the same context, and server workers must fork after it is created, or reconnects get full handshakes."""
+    key = (certfile, keyfile)
+    with _lock:
+        context = _server_contexts.get(key)
+        if context is None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.minimum_version = ssl.TLSVersion.TLSv1_2
+            context.load_cert_chain(certfile, keyfile)
+            context.num_tickets = TLS_TICKETS
+            _server_contexts[key] = context
+    return context
+
+def client_context(cafile=TLS_CA):
+    """Return the shared client SSLContext trusting cafile."""
+    with _lock:
+        context = _client_contexts.get(cafile)
+        if context is None:
+            context = ssl.create_default_context(cafile=cafile)
+            context.minimum_version = ssl.TLSVersion.TLSv1_2
+            _client_contexts[cafile] = context
+    return context
+
+class SessionCache:
+    """ Client-side TLS sessions by server address, so reconnects resume instead of running a full handshake.
+
+    With TLS 1.3 the server sends session tickets after the handshake, so a session can only be saved once the client
+    has read from the connection (e.g. after the first response).
+
+    Methods:
+    - connect(self, host, port, context=None, timeout=None): Open a TLS connection, resuming a saved session if any.
+    - save(self, host, port, sock): Save the connection's session for the next connect.
+    """
+    def __init__(self, capacity=TLS_SESSION_CACHE):
+        self.capacity = capacity
+        self._sessions = {} # (host, port) -> ssl.SSLSession, oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def connect(self, host, port, context=None, timeout=None):
+        """Open a TLS connection and complete the handshake (blocking). sock.session_reused tells whether it resumed."""
+        context = client_context() if context is None else context
+        with self._lock:
+            session = self._sessions.get((host, port))
+        raw = socket.create_connection((host, port), timeout)
+        try:
+            return context.wrap_socket(raw, server_hostname=host, session=session)
+        except Exception:
+            raw.close()
+            raise
+
+    def save(self, host, port, sock):
+        """Save the connection's session, if the server made it resumable."""
+        session = sock.session
+        if session is None or not (session.has_ticket or session.id):
+            return
+        with self._lock:
+            self._sessions.pop((host, port), None)
+            self._sessions[(host, port)] = session
+            while len(self._sessions) > self.capacity:
+                del self._sessions[next(iter(self._sessions))]
+
+def grpc_server_credentials(certfile=TLS_CERT, keyfile=TLS_KEY):
+    """Server credentials for grpc.Server.add_secure_port."""
+    with open(keyfile, "rb") as k, open(certfile, "rb") as c:
+        return grpc.ssl_server_credentials([(k.read(), c.read())])
+
+_grpc_credentials = {}
+_grpc_session_cache = None
+
+def _grpc_secure_args(cafile):
+    """Shared channel credentials for cafile and the options that share the session cache."""
+    global _grpc_session_cache
+    with _lock:
+        credentials = _grpc_credentials.get(cafile)
+        if credentials is None:
+            with open(cafile, "rb") as f:
+                credentials = _grpc_credentials[cafile] = grpc.ssl_channel_credentials(root_certificates=f.read())
+        if _grpc_session_cache is None:
+            _grpc_session_cache = ssl_session_cache_lru(TLS_SESSION_CACHE)
+    return credentials, [("grpc.ssl_session_cache", _grpc_session_cache)]
+
+def grpc_channel(target, enabled=TLS_ENABLED, cafile=TLS_CA, options=()):
+    """Open a gRPC channel to target, over TLS when enabled, with extra channel options. Secure channels share one
+    credentials object per CA and one LRU session cache, so reconnecting channels resume their TLS sessions."""
+    if not enabled:
+        return grpc.insecure_channel(target, options=list(options))
+    credentials, secure_options = _grpc_secure_args(cafile)
+    return grpc.secure_channel(target, credentials, options=secure_options + list(options))
+
+def grpc_aio_channel(target, enabled=TLS_ENABLED, cafile=TLS_CA):
+    """asyncio (grpc.aio) version of grpc_channel."""
+    if not enabled:
+        return grpc.aio.insecure_channel(target)
+    credentials, options = _grpc_secure_args(cafile)
+    return grpc.aio.secure_channel(target, credentials, options=options)
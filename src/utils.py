@@ -4,6 +4,7 @@ import struct
 import handler_pb2
 import handler_pb2_grpc
 import time
+import logging
 
 class ResponseCode(Enum):
     """Enumeration of server response codes."""
@@ -43,33 +44,30 @@ class OpCode(Enum):
     RECEIVE_MSG = 11
     MATCH = 12
     CONNECT = 13
-
-def apply_action(request, db_path):
-    """Apply a write action to local database upon request from leader"""
-
-    # Import inside to avoid circular import error
-    from database import DatabaseHandler
-    db = DatabaseHandler(db_path)
+    PING = 14 # Server -> client keepalive; the client answers with a PING request, which gets no response
+
+def apply_action(request, db):
+    """Apply a write action to the local database (a DatabaseHandler) upon request from leader. Only writes are logged
+    (router.ROUTER.is_write)"""
+    if request.WhichOneof("request") is None:
+        # No-op entry a new leader appends to commit earlier terms
+        return
     if request.HasField("create_acc"):
         db.create_account(request.create_acc.username, request.create_acc.password, request.create_acc.bio)
     elif request.HasField("delete_acc"):
-        db.delete_account(request.delete_acc.username)
+        db.delete_account(request.delete_acc.username, request.delete_acc.password)
     elif request.HasField("delete_msg"):
-        db.delete_messages(request.delete_msg.username, request.delete_msg.message_id_lst)
+        db.delete_messages(request.delete_msg.username, list(request.delete_msg.message_id_lst))
     elif request.HasField("fetch_unread"):
-        db.fetch_messages_unread(request.fetch_unread.username, request.fetch_unread.num)
+        # Reading unread messages marks them delivered
+        db.fetch_messages_undelivered(request.fetch_unread.username, request.fetch_unread.num)
     elif request.HasField("send_msg"):
-        delivered = 1
-        db.insert_message(request.send_msg.sender, request.send_msg.receiver, request.send_msg.content, request.timestamp, delivered)
-    elif request.HasField("receive_msg"):
-        pass
-    elif request.HasField("connect"):
-        pass
+        # The leader logged whether the receiver got the message pushed, so every replica marks it the same way
+        db.insert_message(request.send_msg.sender, request.send_msg.receiver, request.send_msg.content, request.send_msg.timestamp, request.send_msg.delivered)
     else:
+        logging.error(f"Unknown action code: {request}")
         raise ValueError(f"Unknown action code: {request}")
 
-    pass
-
 def database_setup(db_path):
     """Creates the database and tables if they don't exist."""
     conn = sqlite3.connect(db_path)
@@ -91,6 +89,10 @@ def database_setup(db_path):
                    timestamp INTEGER,
                    delivered INTEGER)''')
 
+    # Last Raft log index applied, updated in the same transaction as the entries (see DatabaseHandler.save_applied)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS raft_applied (
+                   last_applied INTEGER)''')
+
     # Save (commit) the changes
     conn.commit()
     conn.close()